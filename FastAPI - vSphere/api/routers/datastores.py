@@ -6,6 +6,7 @@ from services.vsphere.datastore_info import (
     get_datastores_by_type, 
     get_datastores_by_accessible
 )
+from services.capacity_forecast import forecast_datastores
 
 router = APIRouter(
     prefix="/datastores",
@@ -22,6 +23,29 @@ def read_datastores():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/forecast")
+def read_datastores_forecast(threshold_percent: float = 90.0, history_days: int = 30, confidence: float = 0.95):
+    """
+    Forecast days until full and days until threshold_percent used per datastore, most urgent first
+    
+    Args:
+        threshold_percent: Usage percent to project towards
+        history_days: Days of stored snapshots the growth trend is fitted on
+        confidence: Confidence level of the returned bounds
+    """
+    try:
+        forecasts = forecast_datastores(threshold_percent, history_days, confidence)
+        return {
+            "threshold_percent": threshold_percent,
+            "history_days": history_days,
+            "confidence": confidence,
+            "datastores": forecasts
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{datastore_name}")
 def read_datastore(datastore_name: str):
     """
@@ -1,24 +1,64 @@
+import json
 from fastapi import APIRouter, HTTPException
-from services.insert_db import store_monitoring_data, get_historical_data, get_metrics_history
+from fastapi.responses import StreamingResponse
+from services.insert_db import (
+    get_historical_data,
+    get_metrics_history,
+    stream_historical_data,
+    stream_metrics_history
+)
+from services.analytics import metric_analytics
+from services.scheduler import collection_scheduler, get_collection_runs, get_collection_run
+from utils.pagination import next_cursor
+from app.config import settings
 
 router = APIRouter(
     prefix="/history",
     tags=["Historical Data"]
 )
 
-@router.post("/store")
-def store_current_data():
+@router.post("/store", status_code=202)
+def store_current_data(data_class: str = "all"):
+    """
+    Trigger a collection run now and return its run ID without waiting for it
+    
+    Args:
+        data_class: What to collect ('all', 'inventory', 'metrics')
+    """
+    try:
+        return collection_scheduler.trigger(data_class)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/runs")
+def list_collection_runs(data_class: str = None, limit: int = 50):
+    """
+    Get recent collection runs with their duration, row counts and failures
+    """
+    try:
+        return get_collection_runs(data_class, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/runs/{run_id}")
+def read_collection_run(run_id: int):
     """
-    Store current monitoring data in the database
+    Get the status of a single collection run
     """
     try:
-        result = store_monitoring_data()
-        return result
+        run = get_collection_run(run_id)
+        if run is None:
+            raise HTTPException(status_code=404, detail=f"Collection run {run_id} not found")
+        return run
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/data/{data_type}")
-def get_historical_monitoring_data(data_type: str, entity_name: str = None, limit: int = 100):
+def get_historical_monitoring_data(data_type: str, entity_name: str = None, limit: int = 100, cursor: str = None):
     """
     Get historical monitoring data by type
     
@@ -26,78 +66,149 @@ def get_historical_monitoring_data(data_type: str, entity_name: str = None, limi
         data_type: Type of data ('cluster', 'host', 'datastore', 'vm')
         entity_name: Optional specific entity name
         limit: Maximum number of records to return
+        cursor: Opaque cursor from a previous page's `next_cursor`
     """
     try:
         if data_type not in ['cluster', 'host', 'datastore', 'vm']:
             raise HTTPException(status_code=400, detail="Invalid data_type. Must be one of: cluster, host, datastore, vm")
         
-        data = get_historical_data(data_type, entity_name, limit)
+        data = get_historical_data(data_type, entity_name, limit, cursor)
         return {
             "data_type": data_type,
             "entity_name": entity_name,
             "limit": limit,
             "records_count": len(data),
+            "next_cursor": next_cursor(data, limit),
             "data": data
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/data/{data_type}/export")
+def export_historical_monitoring_data(data_type: str, entity_name: str = None):
+    """
+    Stream all historical monitoring data of a type as newline-delimited JSON
+    
+    Args:
+        data_type: Type of data ('cluster', 'host', 'datastore', 'vm')
+        entity_name: Optional specific entity name
+    """
+    if data_type not in ['cluster', 'host', 'datastore', 'vm']:
+        raise HTTPException(status_code=400, detail="Invalid data_type. Must be one of: cluster, host, datastore, vm")
+    
+    records = stream_historical_data(data_type, entity_name)
+    return StreamingResponse(
+        (json.dumps(record) + "\n" for record in records),
+        media_type="application/x-ndjson",
+        headers={'Content-Disposition': f'attachment; filename="history_{data_type}.ndjson"'}
+    )
+
 @router.get("/metrics")
-def get_historical_metrics(metric_type: str = None, limit: int = 100):
+def get_historical_metrics(metric_type: str = None, limit: int = 100, cursor: str = None):
     """
     Get historical system metrics
     
     Args:
         metric_type: Optional specific metric type ('cpu_usage', 'memory_usage', 'storage_usage')
         limit: Maximum number of records to return
+        cursor: Opaque cursor from a previous page's `next_cursor`
     """
     try:
         if metric_type and metric_type not in ['cpu_usage', 'memory_usage', 'storage_usage']:
             raise HTTPException(status_code=400, detail="Invalid metric_type. Must be one of: cpu_usage, memory_usage, storage_usage")
         
-        metrics = get_metrics_history(metric_type, limit)
+        metrics = get_metrics_history(metric_type, limit, cursor)
         return {
             "metric_type": metric_type,
             "limit": limit,
             "records_count": len(metrics),
+            "next_cursor": next_cursor(metrics, limit),
             "metrics": metrics
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/metrics/export")
+def export_historical_metrics(metric_type: str = None):
+    """
+    Stream all historical system metrics as newline-delimited JSON
+    
+    Args:
+        metric_type: Optional specific metric type ('cpu_usage', 'memory_usage', 'storage_usage')
+    """
+    if metric_type and metric_type not in ['cpu_usage', 'memory_usage', 'storage_usage']:
+        raise HTTPException(status_code=400, detail="Invalid metric_type. Must be one of: cpu_usage, memory_usage, storage_usage")
+    
+    records = stream_metrics_history(metric_type)
+    return StreamingResponse(
+        (json.dumps(record) + "\n" for record in records),
+        media_type="application/x-ndjson",
+        headers={'Content-Disposition': 'attachment; filename="metrics_history.ndjson"'}
+    )
+
 @router.get("/metrics/summary")
-def get_metrics_summary():
+def get_metrics_summary(window_hours: int = None, threshold: float = None):
     """
-    Get a summary of historical metrics with latest values and trends
+    Get a summary of system-wide metrics with latest values, trends, anomalies and forecasts
+    
+    Args:
+        window_hours: Trailing window of history to analyze (defaults to ANALYTICS_WINDOW_HOURS)
+        threshold: Usage percent the forecast projects towards (defaults to ANALYTICS_FORECAST_THRESHOLD)
     """
     try:
-        # Get latest metrics for each type
-        cpu_metrics = get_metrics_history('cpu_usage', 10)
-        memory_metrics = get_metrics_history('memory_usage', 10)
-        storage_metrics = get_metrics_history('storage_usage', 10)
+        analysis = metric_analytics.analyze(
+            "system",
+            window_hours or settings.ANALYTICS_WINDOW_HOURS,
+            threshold if threshold is not None else settings.ANALYTICS_FORECAST_THRESHOLD
+        ).get("system", {})
         
-        summary = {
-            "cpu_usage": {
-                "latest": cpu_metrics[0]['value'] if cpu_metrics else 0,
-                "trend": "stable",  # Could be calculated based on historical data
-                "history": cpu_metrics
-            },
-            "memory_usage": {
-                "latest": memory_metrics[0]['value'] if memory_metrics else 0,
-                "trend": "stable",
-                "history": memory_metrics
-            },
-            "storage_usage": {
-                "latest": storage_metrics[0]['value'] if storage_metrics else 0,
-                "trend": "stable",
-                "history": storage_metrics
+        summary = {}
+        for metric_type in ['cpu_usage', 'memory_usage', 'storage_usage']:
+            # history keeps its original shape: the last 10 full metric rows, newest first
+            history = get_metrics_history(metric_type, 10)
+            summary[metric_type] = {
+                **(analysis.get(metric_type) or {"latest": history[0]['value'] if history else 0, "trend": "stable"}),
+                "history": history
             }
-        }
         
         return summary
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/{scope}")
+def get_metrics_analytics(scope: str, entity_name: str = None, window_hours: int = None, threshold: float = None):
+    """
+    Get trend, EWMA, anomaly and time-to-threshold analytics per entity
+    
+    Args:
+        scope: 'system', 'cluster', 'host' or 'datastore'
+        entity_name: Optional specific entity name
+        window_hours: Trailing window of history to analyze (defaults to ANALYTICS_WINDOW_HOURS)
+        threshold: Usage percent the forecast projects towards (defaults to ANALYTICS_FORECAST_THRESHOLD)
+    """
+    try:
+        window_hours = window_hours or settings.ANALYTICS_WINDOW_HOURS
+        return {
+            "scope": scope,
+            "window_hours": window_hours,
+            "entities": metric_analytics.analyze(
+                scope,
+                window_hours,
+                threshold if threshold is not None else settings.ANALYTICS_FORECAST_THRESHOLD,
+                entity_name
+            )
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,194 @@
+from fastapi import APIRouter, HTTPException, Depends, Response
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Optional
+from app.database import get_db, get_read_db
+from models.ip_pool import IPPool, IPAllocation
+from services import ipam
+from services.ipam import IPAMConflict
+
+IPAM_ALLOCATIONS_MAX_LIMIT = 10000
+
+router = APIRouter(
+    prefix="/ipam",
+    tags=["IPAM"]
+)
+
+def _pool_or_404(db: Session, pool_id: int, for_update: bool = False) -> IPPool:
+    pool = ipam.get_pool(db, pool_id, for_update=for_update)
+    if pool is None:
+        raise HTTPException(status_code=404, detail="IP pool not found")
+    return pool
+
+@router.get("/pools")
+def list_pools(db: Session = Depends(get_read_db)):
+    """List IP pools with their size and free address count"""
+    try:
+        return [ipam.pool_to_dict(pool) for pool in db.query(IPPool).order_by(IPPool.id)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/pools")
+def create_pool(payload: dict, db: Session = Depends(get_db)):
+    """
+    Create an IP pool
+
+    Body: {"name", "cidr", "gateway"?, "range_start"?, "range_end"?, "description"?}.
+    The range defaults to every usable host of the CIDR; the gateway is reserved.
+    """
+    try:
+        pool = ipam.create_pool(
+            db,
+            name=payload.get("name"),
+            cidr=payload.get("cidr"),
+            gateway=payload.get("gateway"),
+            range_start=payload.get("range_start"),
+            range_end=payload.get("range_end"),
+            description=payload.get("description"),
+        )
+        db.commit()
+        db.refresh(pool)
+        return ipam.pool_to_dict(pool)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IPAMConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/pools/{pool_id}")
+def get_pool(pool_id: int, db: Session = Depends(get_read_db)):
+    """Get one IP pool with its usage and the lowest free address"""
+    pool = _pool_or_404(db, pool_id)
+    return {**ipam.pool_to_dict(pool), "next_free": ipam.first_free(pool)}
+
+@router.delete("/pools/{pool_id}")
+def delete_pool(pool_id: int, db: Session = Depends(get_db)):
+    """Delete an IP pool that no workorder holds addresses from"""
+    pool = _pool_or_404(db, pool_id, for_update=True)
+    if pool.vni_workorder_id is not None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"IP pool belongs to VNI workorder {pool.vni_workorder_id}; delete or reject the VNI workorder instead"
+        )
+    try:
+        ipam.drop_pool(db, pool)
+        db.commit()
+        return {"message": "IP pool deleted", "id": pool_id}
+    except IPAMConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/pools/{pool_id}/allocations")
+def list_allocations(
+    response: Response,
+    pool_id: int,
+    owner_type: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = 1000,
+    db: Session = Depends(get_read_db)
+):
+    """
+    List the allocated addresses of a pool in address order
+
+    Pass the last address of a page as `after` (also sent in the X-Next-After
+    header) to get the next one.
+    """
+    if limit <= 0 or limit > IPAM_ALLOCATIONS_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {IPAM_ALLOCATIONS_MAX_LIMIT}")
+    pool = _pool_or_404(db, pool_id)
+    try:
+        query = db.query(IPAllocation).filter(IPAllocation.pool_id == pool.id)
+        if owner_type:
+            query = query.filter(IPAllocation.owner_type == owner_type)
+        if after:
+            query = query.filter(IPAllocation.offset > ipam.offset_of(pool, after))
+        allocations = query.order_by(IPAllocation.offset).limit(limit).all()
+        if len(allocations) == limit:
+            response.headers["X-Next-After"] = allocations[-1].address
+        return [ipam.allocation_to_dict(allocation) for allocation in allocations]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/pools/{pool_id}/reservations")
+def reserve_addresses(pool_id: int, payload: dict, db: Session = Depends(get_db)):
+    """
+    Reserve addresses of a pool so they are never handed to a workorder
+
+    Body: {"addresses": [...]} for specific addresses, or {"count": N,
+    "contiguous"?: bool} for the next N free ones; "note" is optional. All
+    addresses are reserved in one transaction, or none are.
+    """
+    note = payload.get("note")
+    addresses = payload.get("addresses")
+    count = payload.get("count")
+    if not addresses and not count:
+        raise HTTPException(status_code=400, detail="Provide 'addresses' or 'count'")
+    pool = _pool_or_404(db, pool_id, for_update=True)
+    try:
+        if addresses:
+            if not isinstance(addresses, list):
+                raise ValueError("'addresses' must be a list")
+            allocations = ipam.claim(db, pool, addresses, [(ipam.RESERVED, None, note)] * len(addresses))
+        else:
+            if not isinstance(count, int):
+                raise ValueError("'count' must be an integer")
+            allocations = ipam.allocate(db, pool, count, ipam.RESERVED, note=note,
+                                        contiguous=bool(payload.get("contiguous")))
+        db.commit()
+        return {
+            "pool_id": pool.id,
+            "reserved": len(allocations),
+            "addresses": [allocation.address for allocation in allocations],
+        }
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IPAMConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="IP pool changed concurrently; retry")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/pools/{pool_id}/allocations/{address}")
+def release_address(pool_id: int, address: str, db: Session = Depends(get_db)):
+    """Release a reserved address (workorder addresses are released by deleting or updating the workorder)"""
+    pool = _pool_or_404(db, pool_id, for_update=True)
+    try:
+        offset = ipam.offset_of(pool, address)
+        allocation = db.query(IPAllocation).filter(
+            IPAllocation.pool_id == pool.id, IPAllocation.offset == offset
+        ).first()
+        if allocation is None:
+            raise HTTPException(status_code=404, detail=f"{address} is not allocated")
+        if allocation.owner_type != ipam.RESERVED:
+            raise HTTPException(
+                status_code=409,
+                detail=f"{address} is allocated to {allocation.owner_type} {allocation.owner_id}"
+            )
+        ipam.release(db, pool, [allocation])
+        db.commit()
+        return {"message": "Address released", "address": allocation.address}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="IP pool changed concurrently; retry")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
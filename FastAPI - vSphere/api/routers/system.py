@@ -1,10 +1,14 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
 from utils.safe_math import safe_div
 from services.vsphere.connection import test_connection
 from services.vsphere.cluster_info import get_clusters_info
 from services.vsphere.host_info import get_hosts_info
 from services.vsphere.datastore_info import get_datastores_info
 from services.vsphere.vm_info import get_vms_info
+from services.capacity_forecast import forecast_datastores
+from app.config import settings
+from app.metrics import metrics
 
 router = APIRouter(
     prefix="/system",
@@ -22,6 +26,20 @@ def health_check():
         "version": "1.0.0"
     }
 
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """
+    Internal service metrics in the Prometheus text exposition format
+    """
+    return metrics.render_prometheus()
+
+@router.get("/metrics/snapshot")
+def read_metrics_snapshot():
+    """
+    Internal service metrics as JSON
+    """
+    return metrics.snapshot()
+
 @router.get("/connection/test")
 def test_vsphere_connection():
     """
@@ -80,6 +98,15 @@ def get_system_overview():
         free_storage_gb = sum(ds['free_space_gb'] for ds in datastores)
         used_storage_gb = sum(ds['used_space_gb'] for ds in datastores)
         
+        # Growth-aware storage alert; history may be unavailable when the database is down
+        try:
+            filling_soon = len([
+                f for f in forecast_datastores()
+                if f['days_until_full'] is not None and f['days_until_full'] <= settings.STORAGE_FORECAST_ALERT_DAYS
+            ])
+        except Exception:
+            filling_soon = None
+        
         return {
             "connection_status": connection_status,
             "summary": {
@@ -109,7 +136,8 @@ def get_system_overview():
                 "hosts_disconnected": total_hosts - connected_hosts,
                 "hosts_powered_off": total_hosts - powered_on_hosts,
                 "vms_stopped": stopped_vms,
-                "low_storage": len([ds for ds in datastores if ds['free_space_gb'] < 100])  # Less than 100GB free
+                "low_storage": len([ds for ds in datastores if ds['free_space_gb'] < 100]),  # Less than 100GB free
+                "storage_filling_soon": filling_soon  # Forecast full within STORAGE_FORECAST_ALERT_DAYS
             }
         }
         
@@ -1,29 +1,86 @@
-from fastapi import APIRouter, HTTPException, Depends, Path
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Response, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, get_read_db
 from models.vni_workorder import VNIWorkOrder
-from services.vsphere.vni_operations import VNIOperations
+from schemas.vni_workorder import VNIWorkOrderOut, VNIWorkOrderDetail
+from services.vsphere.vni_operations import VNIOperations, workorder_vni_config
+from services.cidr_index import cidr_index, parse_cidr, check_addresses, RELEASED_STATUSES
+from services import ipam
+from services.ipam import IPAMConflict
+from services.vni_import import import_vni_workbook
+from services.vni_jobs import vni_jobs, get_latest_job, get_vni_workorder_jobs, get_job as get_vni_job_by_id
+from services.vni_excel import (
+    stream_vni_workorders_xlsx, cached_vni_workorder_xlsx, render_vni_workorder_xlsx, XLSX_MEDIA_TYPE
+)
+from utils.pagination import apply_keyset, encode_cursor
 from datetime import datetime
+import ipaddress
 import json
 import os
-import tempfile
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 
 router = APIRouter(
     prefix="/vni-workorders",
     tags=["VNI WorkOrders"]
 )
 
-@router.post("/")
+def _check_vni_network(config: dict, exclude_id: Optional[int] = None):
+    """
+    Reject a VNI subnet that is malformed, has addresses outside it, or overlaps another VNI workorder
+
+    Call while holding cidr_index.lock and keep holding it until the row is
+    committed and synced, so concurrent requests cannot claim the same subnet.
+    """
+    try:
+        network = parse_cidr(config.get("cidr"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    errors = check_addresses(network, config.get("gateway"), config.get("first_ip"), config.get("last_ip"))
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "Invalid VNI addressing", "errors": errors})
+    conflicts = cidr_index.conflicts(network, exclude_id)
+    if conflicts:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "CIDR overlaps the subnet of another VNI workorder", "conflicts": conflicts}
+        )
+
+def _sync_vni_pool(db: Session, vni_workorder: VNIWorkOrder, drop: bool = False):
+    """
+    Create, reshape or drop the IPAM pool of a VNI workorder's first_ip..last_ip range
+
+    Runs in the caller's transaction, which is rolled back when the pool
+    cannot follow (invalid addressing, overlap, addresses still in use).
+    """
+    try:
+        if drop:
+            ipam.drop_vni_pool(db, vni_workorder.id)
+        else:
+            db.flush()
+            ipam.sync_vni_pool(db, vni_workorder)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IPAMConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="IP pool changed concurrently; retry")
+
+@router.post("/", response_model=VNIWorkOrderOut)
 def create_vni_workorder(
     vni_workorder: dict,
     db: Session = Depends(get_db)
 ):
-    """Create a new VNI workorder"""
+    """Create a new VNI workorder
+
+    When first_ip and last_ip are omitted, IPAM picks the lowest run of
+    number_of_ips free addresses of the CIDR (skipping the gateway). The
+    range becomes an IP pool that workorders can draw addresses from.
+    """
     print("Received VNI workorder:", vni_workorder)
     try:
         # Parse dates
@@ -45,57 +102,52 @@ def create_vni_workorder(
         else:
             deadline = datetime.utcnow()
         
-        new_vni_order = VNIWorkOrder(
-            owner=vni_workorder["owner"],
-            requested_date=requested_date,
-            requested_by=vni_workorder["requested_by"],
-            virtual_machines=vni_workorder.get("virtual_machines", []),
-            deadline=deadline,
-            project=vni_workorder["project"],
-            t0_gw=vni_workorder["t0_gw"],
-            t1_gw=vni_workorder["t1_gw"],
-            description=vni_workorder["description"],
-            vni_name=vni_workorder["vni_name"],
-            cidr=vni_workorder["cidr"],
-            subnet_mask=vni_workorder["subnet_mask"],
-            gateway=vni_workorder["gateway"],
-            first_ip=vni_workorder["first_ip"],
-            last_ip=vni_workorder["last_ip"],
-            number_of_ips=vni_workorder["number_of_ips"],
-            status="pending",
-            notes=vni_workorder.get("notes"),
-            priority=vni_workorder.get("priority", "normal"),
-            assigned_to=vni_workorder.get("assigned_to")
-        )
-        
-        db.add(new_vni_order)
-        db.commit()
-        db.refresh(new_vni_order)
+        if not vni_workorder.get("first_ip") or not vni_workorder.get("last_ip"):
+            try:
+                first_ip, last_ip = ipam.plan_vni_range(
+                    vni_workorder.get("cidr"), vni_workorder.get("gateway"), vni_workorder.get("number_of_ips")
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            vni_workorder = {**vni_workorder, "first_ip": first_ip, "last_ip": last_ip}
+        
+        with cidr_index.lock:
+            _check_vni_network(vni_workorder)
+            if not vni_workorder.get("number_of_ips"):
+                first_ip, last_ip = (ipaddress.ip_address(vni_workorder[key].strip()) for key in ("first_ip", "last_ip"))
+                vni_workorder = {**vni_workorder, "number_of_ips": int(last_ip) - int(first_ip) + 1}
+            new_vni_order = VNIWorkOrder(
+                owner=vni_workorder["owner"],
+                requested_date=requested_date,
+                requested_by=vni_workorder["requested_by"],
+                virtual_machines=vni_workorder.get("virtual_machines", []),
+                deadline=deadline,
+                project=vni_workorder["project"],
+                t0_gw=vni_workorder["t0_gw"],
+                t1_gw=vni_workorder["t1_gw"],
+                description=vni_workorder["description"],
+                vni_name=vni_workorder["vni_name"],
+                cidr=vni_workorder["cidr"],
+                subnet_mask=vni_workorder["subnet_mask"],
+                gateway=vni_workorder["gateway"],
+                first_ip=vni_workorder["first_ip"],
+                last_ip=vni_workorder["last_ip"],
+                number_of_ips=vni_workorder["number_of_ips"],
+                status="pending",
+                notes=vni_workorder.get("notes"),
+                priority=vni_workorder.get("priority", "normal"),
+                assigned_to=vni_workorder.get("assigned_to")
+            )
+            
+            db.add(new_vni_order)
+            _sync_vni_pool(db, new_vni_order)
+            db.commit()
+            db.refresh(new_vni_order)
+            cidr_index.sync(new_vni_order.id, new_vni_order.cidr, new_vni_order.status)
         
-        return {
-            "id": new_vni_order.id,
-            "owner": new_vni_order.owner,
-            "requested_date": new_vni_order.requested_date.isoformat(),
-            "requested_by": new_vni_order.requested_by,
-            "virtual_machines": new_vni_order.virtual_machines,
-            "deadline": new_vni_order.deadline.isoformat(),
-            "project": new_vni_order.project,
-            "t0_gw": new_vni_order.t0_gw,
-            "t1_gw": new_vni_order.t1_gw,
-            "description": new_vni_order.description,
-            "vni_name": new_vni_order.vni_name,
-            "cidr": new_vni_order.cidr,
-            "subnet_mask": new_vni_order.subnet_mask,
-            "gateway": new_vni_order.gateway,
-            "first_ip": new_vni_order.first_ip,
-            "last_ip": new_vni_order.last_ip,
-            "number_of_ips": new_vni_order.number_of_ips,
-            "status": new_vni_order.status,
-            "created_at": new_vni_order.created_at.isoformat(),
-            "notes": new_vni_order.notes,
-            "priority": new_vni_order.priority,
-            "assigned_to": new_vni_order.assigned_to
-        }
+        return new_vni_order
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print('CREATE VNI WORKORDER ERROR:', e)
@@ -103,55 +155,159 @@ def create_vni_workorder(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/")
+@router.get("/", response_model=List[VNIWorkOrderOut])
 def get_vni_workorders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    project: Optional[str] = None,
+    owner: Optional[str] = None,
+    t0_gw: Optional[str] = None,
+    t1_gw: Optional[str] = None,
+    priority: Optional[str] = None,
+    ip: Optional[str] = None,
+    cidr: Optional[str] = None,
+    deadline_after: Optional[datetime] = None,
+    deadline_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
-    """Get all VNI workorders with optional filtering"""
+    """Get all VNI workorders with optional filtering, newest first
+    
+    `status` and `priority` take one value or a comma-separated list;
+    deadline_after / deadline_before bound the deadline (inclusive / exclusive).
+    `ip` keeps the workorders whose subnet holds that address and `cidr` the
+    ones whose subnet overlaps that block; both are answered by the in-memory
+    CIDR index, so rejected workorders (which release their subnet) never match.
+    
+    Prefer `cursor` (from the X-Next-Cursor response header) over `skip` for
+    deep pages: it seeks on (created_at, id) instead of scanning skipped rows.
+    """
     try:
         query = db.query(VNIWorkOrder)
         
-        if status:
-            query = query.filter(VNIWorkOrder.status == status)
-            
-        vni_workorders = query.offset(skip).limit(limit).all()
-        
-        return [
-            {
-                "id": wo.id,
-                "owner": wo.owner,
-                "requested_date": wo.requested_date.isoformat(),
-                "requested_by": wo.requested_by,
-                "virtual_machines": wo.virtual_machines,
-                "deadline": wo.deadline.isoformat(),
-                "project": wo.project,
-                "t0_gw": wo.t0_gw,
-                "t1_gw": wo.t1_gw,
-                "description": wo.description,
-                "vni_name": wo.vni_name,
-                "cidr": wo.cidr,
-                "subnet_mask": wo.subnet_mask,
-                "gateway": wo.gateway,
-                "first_ip": wo.first_ip,
-                "last_ip": wo.last_ip,
-                "number_of_ips": wo.number_of_ips,
-                "status": wo.status,
-                "created_at": wo.created_at.isoformat(),
-                "updated_at": wo.updated_at.isoformat(),
-                "notes": wo.notes,
-                "priority": wo.priority,
-                "assigned_to": wo.assigned_to
-            }
-            for wo in vni_workorders
-        ]
+        for column, value in ((VNIWorkOrder.status, status), (VNIWorkOrder.priority, priority)):
+            values = [v.strip() for v in value.split(",") if v.strip()] if value else []
+            if values:
+                query = query.filter(column.in_(values) if len(values) > 1 else column == values[0])
+        for column, value in ((VNIWorkOrder.project, project), (VNIWorkOrder.owner, owner),
+                              (VNIWorkOrder.t0_gw, t0_gw), (VNIWorkOrder.t1_gw, t1_gw)):
+            if value:
+                query = query.filter(column == value)
+        if deadline_after:
+            query = query.filter(VNIWorkOrder.deadline >= deadline_after)
+        if deadline_before:
+            query = query.filter(VNIWorkOrder.deadline < deadline_before)
+        if ip:
+            try:
+                address = ipaddress.ip_address(ip.strip())
+            except ValueError:
+                raise ValueError(f"Invalid IP address: {ip}")
+            query = query.filter(VNIWorkOrder.id.in_([match["vni_workorder_id"] for match in cidr_index.containing(address)]))
+        if cidr:
+            network = parse_cidr(cidr)
+            query = query.filter(VNIWorkOrder.id.in_([match["vni_workorder_id"] for match in cidr_index.conflicts(network)]))
+        
+        query = apply_keyset(query, VNIWorkOrder.created_at, VNIWorkOrder.id, cursor)
+        if skip and not cursor:
+            query = query.offset(skip)
+        vni_workorders = query.limit(limit).all()
+        if len(vni_workorders) == limit:
+            last = vni_workorders[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+        
+        return vni_workorders
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print('GET VNI WORKORDERS ERROR:', e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{vni_workorder_id}")
+@router.get("/cidr-audit")
+def audit_vni_cidrs(db: Session = Depends(get_read_db)):
+    """
+    Audit the subnets of all VNI workorders
+
+    Returns every overlapping pair from the CIDR index, plus workorders whose
+    CIDR is malformed or whose gateway / first / last IP lies outside it.
+    """
+    try:
+        invalid = []
+        rows = db.query(
+            VNIWorkOrder.id, VNIWorkOrder.cidr, VNIWorkOrder.gateway, VNIWorkOrder.first_ip,
+            VNIWorkOrder.last_ip, VNIWorkOrder.status
+        ).all()
+        for vni_id, cidr, gateway, first_ip, last_ip, status in rows:
+            if status in RELEASED_STATUSES:
+                continue
+            try:
+                errors = check_addresses(parse_cidr(cidr), gateway, first_ip, last_ip)
+            except ValueError as e:
+                errors = [str(e)]
+            if errors:
+                invalid.append({"vni_workorder_id": vni_id, "cidr": cidr, "errors": errors})
+        overlaps = cidr_index.audit()
+        return {
+            "checked": len(rows),
+            "indexed": cidr_index.size(),
+            "overlaps": overlaps,
+            "invalid": invalid,
+        }
+    except Exception as e:
+        print('AUDIT VNI CIDRS ERROR:', e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/import")
+def import_vni_workorders(
+    file: UploadFile = File(..., description="Ooredoo VNI sheet (.xlsx) as produced by export-excel"),
+    owner: Optional[str] = Form(None, description="Owner for sheets without an Owner: cell"),
+    requested_by: Optional[str] = Form(None, description="Requester for sheets without a Requested By: cell"),
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk-create VNI workorders from an uploaded Excel workbook
+
+    Every row of every sheet is validated (CIDR, gateway and range, overlaps
+    with existing subnets and earlier rows); the valid rows are inserted in
+    one transaction and the others are returned with their errors.
+    """
+    try:
+        return import_vni_workbook(db, file.file, {"owner": owner, "requested_by": requested_by})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print('IMPORT VNI WORKORDERS ERROR:', e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/queue")
+def get_vni_queue():
+    """Queued VNI jobs per T1 gateway, the gateways being changed right now and the next jobs to start"""
+    return vni_jobs.queue_state()
+
+@router.get("/export-excel")
+def export_vni_workorders_excel(
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = Query(None, alias="from"),
+    created_to: Optional[datetime] = Query(None, alias="to")
+):
+    """
+    Export many VNI workorders to one Ooredoo-styled Excel sheet, one row each
+
+    `status` takes a comma-separated list; `from` / `to` bound created_at
+    (inclusive / exclusive). The workbook is streamed while rows are read,
+    so large exports use bounded memory and no temporary files. The sheet
+    can be fed back to POST /vni-workorders/import.
+    """
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+    filename = f"vni_workorders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return StreamingResponse(
+        stream_vni_workorders_xlsx(statuses, created_from, created_to),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/{vni_workorder_id}", response_model=VNIWorkOrderDetail)
 def get_vni_workorder(
     vni_workorder_id: int = Path(..., description="The ID of the VNI workorder"),
     db: Session = Depends(get_db)
@@ -162,39 +318,14 @@ def get_vni_workorder(
         if not vni_workorder:
             raise HTTPException(status_code=404, detail="VNI workorder not found")
             
-        return {
-            "id": vni_workorder.id,
-            "owner": vni_workorder.owner,
-            "requested_date": vni_workorder.requested_date.isoformat(),
-            "requested_by": vni_workorder.requested_by,
-            "virtual_machines": vni_workorder.virtual_machines,
-            "deadline": vni_workorder.deadline.isoformat(),
-            "project": vni_workorder.project,
-            "t0_gw": vni_workorder.t0_gw,
-            "t1_gw": vni_workorder.t1_gw,
-            "description": vni_workorder.description,
-            "vni_name": vni_workorder.vni_name,
-            "cidr": vni_workorder.cidr,
-            "subnet_mask": vni_workorder.subnet_mask,
-            "gateway": vni_workorder.gateway,
-            "first_ip": vni_workorder.first_ip,
-            "last_ip": vni_workorder.last_ip,
-            "number_of_ips": vni_workorder.number_of_ips,
-            "status": vni_workorder.status,
-            "created_at": vni_workorder.created_at.isoformat(),
-            "updated_at": vni_workorder.updated_at.isoformat(),
-            "last_execution_log": vni_workorder.last_execution_log,
-            "notes": vni_workorder.notes,
-            "priority": vni_workorder.priority,
-            "assigned_to": vni_workorder.assigned_to
-        }
+        return vni_workorder
     except HTTPException:
         raise
     except Exception as e:
         print('GET VNI WORKORDER ERROR:', e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/{vni_workorder_id}")
+@router.put("/{vni_workorder_id}", response_model=VNIWorkOrderOut)
 def update_vni_workorder(
     vni_workorder_id: int,
     vni_workorder_update: dict,
@@ -206,45 +337,32 @@ def update_vni_workorder(
         if not vni_workorder:
             raise HTTPException(status_code=404, detail="VNI workorder not found")
         
-        # Update fields
-        for field, value in vni_workorder_update.items():
-            if hasattr(vni_workorder, field):
-                if field in ["requested_date", "deadline"] and value:
-                    try:
-                        value = datetime.fromisoformat(value)
-                    except Exception:
-                        value = datetime.utcnow()
-                setattr(vni_workorder, field, value)
-        
-        vni_workorder.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(vni_workorder)
+        with cidr_index.lock:
+            config = {**workorder_vni_config(vni_workorder), **{
+                key: value for key, value in vni_workorder_update.items() if key in ("cidr", "gateway", "first_ip", "last_ip")
+            }}
+            status = vni_workorder_update.get("status", vni_workorder.status)
+            reclaimed = vni_workorder.status in RELEASED_STATUSES
+            if status not in RELEASED_STATUSES and (reclaimed or config != workorder_vni_config(vni_workorder)):
+                _check_vni_network(config, exclude_id=vni_workorder.id)
+            
+            # Update fields
+            for field, value in vni_workorder_update.items():
+                if hasattr(vni_workorder, field):
+                    if field in ["requested_date", "deadline"] and value:
+                        try:
+                            value = datetime.fromisoformat(value)
+                        except Exception:
+                            value = datetime.utcnow()
+                    setattr(vni_workorder, field, value)
+            
+            vni_workorder.updated_at = datetime.utcnow()
+            _sync_vni_pool(db, vni_workorder)
+            db.commit()
+            db.refresh(vni_workorder)
+            cidr_index.sync(vni_workorder.id, vni_workorder.cidr, vni_workorder.status)
         
-        return {
-            "id": vni_workorder.id,
-            "owner": vni_workorder.owner,
-            "requested_date": vni_workorder.requested_date.isoformat(),
-            "requested_by": vni_workorder.requested_by,
-            "virtual_machines": vni_workorder.virtual_machines,
-            "deadline": vni_workorder.deadline.isoformat(),
-            "project": vni_workorder.project,
-            "t0_gw": vni_workorder.t0_gw,
-            "t1_gw": vni_workorder.t1_gw,
-            "description": vni_workorder.description,
-            "vni_name": vni_workorder.vni_name,
-            "cidr": vni_workorder.cidr,
-            "subnet_mask": vni_workorder.subnet_mask,
-            "gateway": vni_workorder.gateway,
-            "first_ip": vni_workorder.first_ip,
-            "last_ip": vni_workorder.last_ip,
-            "number_of_ips": vni_workorder.number_of_ips,
-            "status": vni_workorder.status,
-            "created_at": vni_workorder.created_at.isoformat(),
-            "updated_at": vni_workorder.updated_at.isoformat(),
-            "notes": vni_workorder.notes,
-            "priority": vni_workorder.priority,
-            "assigned_to": vni_workorder.assigned_to
-        }
+        return vni_workorder
     except HTTPException:
         raise
     except Exception as e:
@@ -263,9 +381,14 @@ def approve_vni_workorder(
         if not vni_workorder:
             raise HTTPException(status_code=404, detail="VNI workorder not found")
         
-        vni_workorder.status = "approved"
-        vni_workorder.updated_at = datetime.utcnow()
-        db.commit()
+        with cidr_index.lock:
+            if vni_workorder.status in RELEASED_STATUSES:
+                _check_vni_network(workorder_vni_config(vni_workorder), exclude_id=vni_workorder.id)
+            vni_workorder.status = "approved"
+            vni_workorder.updated_at = datetime.utcnow()
+            _sync_vni_pool(db, vni_workorder)
+            db.commit()
+            cidr_index.sync(vni_workorder.id, vni_workorder.cidr, vni_workorder.status)
         
         return {"message": "VNI workorder approved successfully", "status": "approved"}
     except HTTPException:
@@ -288,7 +411,9 @@ def reject_vni_workorder(
         
         vni_workorder.status = "rejected"
         vni_workorder.updated_at = datetime.utcnow()
+        _sync_vni_pool(db, vni_workorder)
         db.commit()
+        cidr_index.sync(vni_workorder.id, vni_workorder.cidr, vni_workorder.status)
         
         return {"message": "VNI workorder rejected successfully", "status": "rejected"}
     except HTTPException:
@@ -311,14 +436,19 @@ def update_vni_workorder_status(
             raise HTTPException(status_code=404, detail="VNI workorder not found")
         
         new_status = status_update.get("status")
-        valid_statuses = ["pending", "approved", "rejected", "draft", "executing", "completed", "failed"]
+        valid_statuses = ["pending", "approved", "rejected", "draft", "queued", "executing", "completed", "failed"]
         
         if new_status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
         
-        vni_workorder.status = new_status
-        vni_workorder.updated_at = datetime.utcnow()
-        db.commit()
+        with cidr_index.lock:
+            if vni_workorder.status in RELEASED_STATUSES and new_status not in RELEASED_STATUSES:
+                _check_vni_network(workorder_vni_config(vni_workorder), exclude_id=vni_workorder.id)
+            vni_workorder.status = new_status
+            vni_workorder.updated_at = datetime.utcnow()
+            _sync_vni_pool(db, vni_workorder)
+            db.commit()
+            cidr_index.sync(vni_workorder.id, vni_workorder.cidr, vni_workorder.status)
         
         return {"message": f"VNI workorder status updated to {new_status}", "status": new_status}
     except HTTPException:
@@ -328,12 +458,18 @@ def update_vni_workorder_status(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/{vni_workorder_id}/execute")
+@router.post("/{vni_workorder_id}/execute", status_code=202)
 def execute_vni_workorder(
     vni_workorder_id: int,
     db: Session = Depends(get_db)
 ):
-    """Execute a VNI workorder using the VNI operations service"""
+    """
+    Queue an approved VNI workorder for segment creation
+
+    The segment is created on the VNI worker pool; changes to the same T1
+    gateway run one after the other. Poll /vni-workorders/{id}/status or
+    /vni-workorders/jobs/{job_id} for progress.
+    """
     try:
         vni_workorder = db.query(VNIWorkOrder).filter(VNIWorkOrder.id == vni_workorder_id).first()
         if not vni_workorder:
@@ -342,32 +478,10 @@ def execute_vni_workorder(
         if vni_workorder.status != "approved":
             raise HTTPException(status_code=400, detail="VNI workorder must be approved before execution")
         
-        # Update status to executing
-        vni_workorder.status = "executing"
-        vni_workorder.updated_at = datetime.utcnow()
-        vni_workorder.last_execution_log = f"Execution started at {datetime.utcnow().isoformat()}"
-        db.commit()
-        
-        # Use VNI operations service
-        vni_ops = VNIOperations()
-        
-        # Prepare VNI configuration
-        vni_config = {
-            "vni_name": vni_workorder.vni_name,
-            "cidr": vni_workorder.cidr,
-            "gateway": vni_workorder.gateway,
-            "t0_gw": vni_workorder.t0_gw,
-            "t1_gw": vni_workorder.t1_gw,
-            "description": vni_workorder.description,
-            "project": vni_workorder.project,
-            "subnet_mask": vni_workorder.subnet_mask,
-            "first_ip": vni_workorder.first_ip,
-            "last_ip": vni_workorder.last_ip,
-            "number_of_ips": vni_workorder.number_of_ips
-        }
-        
         # Validate configuration
-        validation_result = vni_ops.validate_vni_config(vni_config)
+        validation_result = VNIOperations().validate_vni_config(
+            workorder_vni_config(vni_workorder), exclude_id=vni_workorder.id
+        )
         if not validation_result["valid"]:
             vni_workorder.status = "failed"
             vni_workorder.last_execution_log = f"Validation failed: {', '.join(validation_result['errors'])}"
@@ -375,25 +489,13 @@ def execute_vni_workorder(
             db.commit()
             raise HTTPException(status_code=400, detail=f"VNI configuration validation failed: {', '.join(validation_result['errors'])}")
         
-        # Create VNI
-        result = vni_ops.create_vni(vni_config)
-        
-        if result["success"]:
-            vni_workorder.status = "completed"
-            vni_workorder.last_execution_log = f"VNI '{vni_workorder.vni_name}' created successfully at {datetime.utcnow().isoformat()}. VNI ID: {result.get('vni_id', 'N/A')}"
-        else:
-            vni_workorder.status = "failed"
-            vni_workorder.last_execution_log = f"VNI creation failed: {result.get('message', 'Unknown error')}"
-        
-        vni_workorder.updated_at = datetime.utcnow()
-        db.commit()
-        
+        job, = vni_jobs.enqueue(db, [vni_workorder])
         return {
-            "message": result.get("message", "VNI workorder execution completed"),
-            "status": vni_workorder.status,
+            "message": "VNI workorder execution queued",
+            "id": vni_workorder_id,
             "vni_name": vni_workorder.vni_name,
-            "vni_id": result.get("vni_id"),
-            "execution_log": vni_workorder.last_execution_log
+            "job_id": job["job_id"],
+            "status": job["status"]
         }
     except HTTPException:
         raise
@@ -402,6 +504,62 @@ def execute_vni_workorder(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/execute-batch", status_code=202)
+def execute_vni_workorders_batch(payload: dict, db: Session = Depends(get_db)):
+    """
+    Queue many approved VNI workorders at once
+
+    Body: {"ids": [...]}. Workorders that are not approved are reported and
+    skipped. Queued workorders of the same T1 gateway are written together
+    in hierarchical PATCH calls of up to NSX_BATCH_SIZE segments.
+    """
+    ids = payload.get("ids")
+    if not ids or not isinstance(ids, list):
+        raise HTTPException(status_code=400, detail="Provide 'ids' as a non-empty list")
+    try:
+        vni_workorders = db.query(VNIWorkOrder).filter(VNIWorkOrder.id.in_(ids)).order_by(VNIWorkOrder.id).all()
+        skipped = [
+            {"id": wo.id, "status": wo.status, "error": "VNI workorder must be approved before execution"}
+            for wo in vni_workorders if wo.status != "approved"
+        ]
+        approved = [wo for wo in vni_workorders if wo.status == "approved"]
+        jobs = vni_jobs.enqueue(db, approved) if approved else []
+        found = {wo.id for wo in vni_workorders}
+        return {
+            "queued": len(jobs),
+            "jobs": [{"id": job["vni_workorder_id"], "job_id": job["job_id"], "t1_gw": job["t1_gw"]} for job in jobs],
+            "skipped": skipped,
+            "not_found": [i for i in ids if i not in found]
+        }
+    except Exception as e:
+        print('EXECUTE VNI WORKORDERS BATCH ERROR:', e)
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+def get_vni_job(job_id: int):
+    job = get_vni_job_by_id(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/position")
+def get_vni_job_position(job_id: int):
+    """
+    Where a queued VNI job stands: its position in the predicted start order,
+    its position among its T1 gateway's jobs, and an estimated start time from
+    the observed duration of recent NSX changes. `queue` is null once the job
+    has started.
+    """
+    job = get_vni_job_by_id(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job, "queue": vni_jobs.position(job_id) if job["status"] == "queued" else None}
+
+@router.get("/{vni_workorder_id}/jobs")
+def list_vni_workorder_jobs(vni_workorder_id: int, limit: int = 20):
+    return get_vni_workorder_jobs(vni_workorder_id, limit)
+
 @router.delete("/{vni_workorder_id}")
 def delete_vni_workorder(
     vni_workorder_id: int,
@@ -413,8 +571,10 @@ def delete_vni_workorder(
         if not vni_workorder:
             raise HTTPException(status_code=404, detail="VNI workorder not found")
         
+        _sync_vni_pool(db, vni_workorder, drop=True)
         db.delete(vni_workorder)
         db.commit()
+        cidr_index.remove(vni_workorder_id)
         
         return {"message": "VNI workorder deleted successfully"}
     except HTTPException:
@@ -453,7 +613,7 @@ def get_vni_workorder_status(
         if not vni_workorder:
             raise HTTPException(status_code=404, detail="VNI workorder not found")
         
-        return {"status": vni_workorder.status}
+        return {"status": vni_workorder.status, "job": get_latest_job(vni_workorder_id)}
     except HTTPException:
         raise
     except Exception as e:
@@ -463,139 +623,36 @@ def get_vni_workorder_status(
 @router.get("/{vni_workorder_id}/export-excel")
 def export_vni_workorder_excel(
     vni_workorder_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Export VNI workorder to Excel with Ooredoo styling"""
+    """
+    Export VNI workorder to Excel with Ooredoo styling
+
+    The sheet is rendered in memory and kept in an LRU cache keyed on
+    (id, updated_at), so repeated downloads of an unchanged workorder are
+    served without rendering or touching the disk.
+    """
     try:
-        vni_workorder = db.query(VNIWorkOrder).filter(VNIWorkOrder.id == vni_workorder_id).first()
-        if not vni_workorder:
-            raise HTTPException(status_code=404, detail="VNI workorder not found")
-        
-        # Create a new workbook and select the active sheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "VNI Configuration"
-        
-        # Define colors based on the image (red and white theme)
-        red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-        white_fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-        red_font = Font(color="FF0000", bold=True, size=14)
-        white_font = Font(color="FFFFFF", bold=True, size=12)
-        black_font = Font(color="000000", size=11)
-        bold_black_font = Font(color="000000", bold=True, size=11)
-        
-        # Define borders
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Center alignment
-        center_alignment = Alignment(horizontal='center', vertical='center')
-        left_alignment = Alignment(horizontal='left', vertical='center')
-        
-        # Row 1: Ooredoo logo and header info
-        ws.merge_cells('A1:K1')
-        ooredoo_cell = ws['A1']
-        ooredoo_cell.value = "ooredoo"
-        ooredoo_cell.font = red_font
-        ooredoo_cell.alignment = left_alignment
-        
-        # Row 2-6: Information block (Owner, Requested Date, etc.)
-        info_labels = ["Owner:", "Requested Date:", "Requested By:", "Virtual Machines:", "Dead Line :"]
-        info_values = [
-            vni_workorder.owner,
-            vni_workorder.requested_date.strftime("%m/%d/%Y") if vni_workorder.requested_date else "",
-            vni_workorder.requested_by,
-            str(len(vni_workorder.virtual_machines)) if vni_workorder.virtual_machines else "0",
-            vni_workorder.deadline.strftime("%m/%d/%Y") if vni_workorder.deadline else ""
-        ]
-        
-        for i, (label, value) in enumerate(zip(info_labels, info_values)):
-            row = i + 2
-            # Label cell (red background, white text)
-            label_cell = ws[f'A{row}']
-            label_cell.value = label
-            label_cell.fill = red_fill
-            label_cell.font = white_font
-            label_cell.alignment = left_alignment
-            label_cell.border = thin_border
-            
-            # Value cell (white background, black text)
-            value_cell = ws[f'B{row}']
-            value_cell.value = value
-            value_cell.fill = white_fill
-            value_cell.font = black_font
-            value_cell.alignment = left_alignment
-            value_cell.border = thin_border
-        
-        # Row 7: Main title "Création VNI"
-        ws.merge_cells('A7:K7')
-        title_cell = ws['A7']
-        title_cell.value = "Création VNI"
-        title_cell.fill = red_fill
-        title_cell.font = white_font
-        title_cell.alignment = center_alignment
-        
-        # Row 8: Table headers
-        headers = ["Projet", "t0-gw", "t1-gw", "Description", "vni name", "CIDR", "Masque", "gateway", "first Ip", "last IP", "number"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=8, column=col)
-            cell.value = header
-            cell.fill = red_fill
-            cell.font = white_font
-            cell.alignment = center_alignment
-            cell.border = thin_border
-        
-        # Row 9: Data row
-        data_values = [
-            vni_workorder.project,
-            vni_workorder.t0_gw,
-            vni_workorder.t1_gw,
-            vni_workorder.description,
-            vni_workorder.vni_name,
-            vni_workorder.cidr,
-            vni_workorder.subnet_mask,
-            vni_workorder.gateway,
-            vni_workorder.first_ip,
-            vni_workorder.last_ip,
-            str(vni_workorder.number_of_ips)
-        ]
-        
-        for col, value in enumerate(data_values, 1):
-            cell = ws.cell(row=9, column=col)
-            cell.value = value
-            cell.fill = white_fill
-            cell.font = black_font
-            cell.alignment = center_alignment
-            cell.border = thin_border
-            
-            # Make gateway bold
-            if col == 8:  # gateway column
-                cell.font = bold_black_font
-        
-        # Set column widths
-        column_widths = [15, 12, 12, 15, 40, 15, 15, 15, 12, 12, 8]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(col)].width = width
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            wb.save(tmp_file.name)
-            tmp_file_path = tmp_file.name
-        
-        # Return the file
-        filename = f"VNI_Configuration_{vni_workorder.vni_name}_{vni_workorder.id}.xlsx"
-        return FileResponse(
-            path=tmp_file_path,
-            filename=filename,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        updated_at = db.query(VNIWorkOrder.updated_at).filter(VNIWorkOrder.id == vni_workorder_id).scalar()
+        cached = cached_vni_workorder_xlsx(vni_workorder_id, updated_at) if updated_at else None
+        if cached:
+            filename, data = cached
+        else:
+            vni_workorder = db.query(VNIWorkOrder).filter(VNIWorkOrder.id == vni_workorder_id).first()
+            if not vni_workorder:
+                raise HTTPException(status_code=404, detail="VNI workorder not found")
+            filename, data = render_vni_workorder_xlsx(vni_workorder)
+        
+        return StreamingResponse(
+            iter((data,)),
+            media_type=XLSX_MEDIA_TYPE,
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Content-Length': str(len(data))
+            }
         )
     except HTTPException:
         raise
     except Exception as e:
         print('EXPORT VNI WORKORDER EXCEL ERROR:', e)
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,95 +1,163 @@
-from fastapi import APIRouter, HTTPException, Depends, Path
+from fastapi import APIRouter, HTTPException, Depends, Path, Response, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from sqlalchemy.orm.exc import StaleDataError
+from typing import List, Optional
+from app.database import get_db, get_read_db
 from models.workorder import WorkOrder
+from schemas.workorder import WorkOrderOut, WorkOrderDetail
 from datetime import datetime
-import os
-import subprocess
-import tempfile
-import shutil
 import json
+import logging
 from services.vsphere.cluster_info import get_resource_pools_info
 from services.vsphere.connection import get_folders_info, get_datacenters_info
+from app.config import settings
+from services.placement import placement_engine, PlacementError
+from services.drift import drift_reconciler
+from services import ipam
+from services.ipam import IPAMConflict
+from models.ip_pool import IPPool
+from services.job_logs import job_logs, follow_job_log
+from services.job_priority import parse_priority
+from services.workorder_jobs import workorder_jobs, get_job, get_latest_job, get_workorder_jobs, get_batch
+from utils.pagination import apply_keyset, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+WORKORDER_LIST_MAX_LIMIT = 1000
 
 router = APIRouter(
     prefix="/workorders",
     tags=["WorkOrders"]
 )
 
-@router.post("/")
+def _parse_deadline(value) -> Optional[datetime]:
+    """An ISO 8601 deadline, or None when it is empty"""
+    if not value or isinstance(value, datetime):
+        return value or None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError("deadline must be an ISO 8601 datetime")
+
+def _build_workorder(workorder: dict) -> WorkOrder:
+    """Map a create payload (general/resources sections plus flat fields) onto a WorkOrder"""
+    requested_at = workorder.get("requested_at")
+    if requested_at:
+        try:
+            created_at = datetime.fromisoformat(requested_at)
+        except Exception:
+            created_at = datetime.utcnow()
+    else:
+        created_at = datetime.utcnow()
+    disk_value = workorder["resources"].get("disk") if "resources" in workorder else None
+    disks_value = workorder.get("disks", None)
+    if not disks_value and disk_value:
+        disks_value = [{"size": disk_value, "provisioning": "thin"}]
+    nics_value = workorder.get("nics", None)
+    network_id_value = workorder.get("network_id", None)
+    if not nics_value and network_id_value:
+        nics_value = [{"network_id": network_id_value}]
+    return WorkOrder(
+        name=workorder["general"]["name"],
+        os=workorder["general"]["os"],
+        host_version=workorder["general"]["hostVersion"],
+        cpu=workorder["resources"]["cpu"],
+        ram=workorder["resources"]["ram"],
+        disk=disk_value,
+        status="pending",
+        created_at=created_at,
+        host_id=workorder.get("host_id", None),
+        vm_id=workorder.get("vm_id", None),
+        datastore_id=workorder.get("datastore_id", None),
+        disks=disks_value,
+        nics=nics_value,
+        resource_pool_id=workorder.get("resource_pool_id", None),
+        ip_pool_id=workorder.get("ip_pool_id", None),
+        template_id=workorder.get("template_id", None),
+        hostname=workorder.get("hostname", None),
+        ip=workorder.get("ip", None),
+        netmask=workorder.get("netmask", None),
+        gateway=workorder.get("gateway", None),
+        domain=workorder.get("domain", None),
+        hardware_version=workorder.get("hardware_version", None),
+        scsi_controller_type=workorder.get("scsi_controller_type", None),
+        folder_id=workorder.get("folder_id", None),
+        network_id=workorder.get("network_id", None),
+        datacenter_name=workorder.get("datacenter_name", "Ooredoo - Datacenter"),
+        priority=parse_priority(workorder.get("priority")),
+        deadline=_parse_deadline(workorder.get("deadline")),
+    )
+
+def _placement_inventory():
+    """
+    Load the placement inventory before reservation_lock is taken
+
+    Returns None when enforcement is off or the inventory cannot be loaded;
+    the check is then skipped rather than blocking provisioning on a vCenter read.
+    """
+    if not settings.PLACEMENT_ENFORCE:
+        return None
+    try:
+        return placement_engine.inventory()
+    except Exception as e:
+        logger.warning(f"Placement check skipped: {str(e)}")
+        return None
+
+def _check_placement(orders: List[WorkOrder], inventory):
+    """Refuse execution with 409 when orders would overcommit their host or datastore"""
+    if inventory is None:
+        return
+    try:
+        placement_engine.check_fit(orders, inventory)
+    except PlacementError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "violations": e.violations})
+    except Exception as e:
+        logger.warning(f"Placement check skipped: {str(e)}")
+
+def _validate_workorder(workorder) -> Optional[str]:
+    """Return why a create payload is unusable, or None if it is valid"""
+    if not isinstance(workorder, dict):
+        return "WorkOrder must be an object"
+    general = workorder.get("general")
+    resources = workorder.get("resources")
+    if not isinstance(general, dict) or not isinstance(resources, dict):
+        return "Missing 'general' or 'resources' section"
+    for key in ("name", "os", "hostVersion"):
+        if not general.get(key):
+            return f"Missing general.{key}"
+    for key in ("cpu", "ram"):
+        value = resources.get(key)
+        if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+            return f"resources.{key} must be a positive integer"
+    disk = resources.get("disk")
+    if not isinstance(disk, (int, float)) or isinstance(disk, bool) or disk <= 0:
+        return "resources.disk must be a positive number"
+    return None
+
+@router.post("/", response_model=WorkOrderOut)
 def create_workorder(
     workorder: dict,
     db: Session = Depends(get_db)
 ):
     print("Received workorder:", workorder)  
     try:
-        requested_at = workorder.get("requested_at")
-        if requested_at:
-            try:
-                created_at = datetime.fromisoformat(requested_at)
-            except Exception:
-                created_at = datetime.utcnow()
-        else:
-            created_at = datetime.utcnow()
-        disk_value = workorder["resources"].get("disk") if "resources" in workorder else None
-        disks_value = workorder.get("disks", None)
-        if not disks_value and disk_value:
-            disks_value = [{"size": disk_value, "provisioning": "thin"}]
-        nics_value = workorder.get("nics", None)
-        network_id_value = workorder.get("network_id", None)
-        if not nics_value and network_id_value:
-            nics_value = [{"network_id": network_id_value}]
-        new_order = WorkOrder(
-            name=workorder["general"]["name"],
-            os=workorder["general"]["os"],
-            host_version=workorder["general"]["hostVersion"],
-            cpu=workorder["resources"]["cpu"],
-            ram=workorder["resources"]["ram"],
-            disk=disk_value,
-            status="pending",
-            created_at=created_at,
-            host_id=workorder.get("host_id", None),
-            vm_id=workorder.get("vm_id", None),
-            datastore_id=workorder.get("datastore_id", None),
-            disks=disks_value,
-            nics=nics_value,
-            resource_pool_id=workorder.get("resource_pool_id", None),
-            ip_pool_id=workorder.get("ip_pool_id", None),
-            template_id=workorder.get("template_id", None),
-            hostname=workorder.get("hostname", None),
-            ip=workorder.get("ip", None),
-            netmask=workorder.get("netmask", None),
-            gateway=workorder.get("gateway", None),
-            domain=workorder.get("domain", None),
-            hardware_version=workorder.get("hardware_version", None),
-            scsi_controller_type=workorder.get("scsi_controller_type", None),
-            folder_id=workorder.get("folder_id", None),
-            network_id=workorder.get("network_id", None),
-            datacenter_name=workorder.get("datacenter_name", "Ooredoo - Datacenter"),
-        )
+        new_order = _build_workorder(workorder)
         db.add(new_order)
+        db.flush()
+        ipam.assign_workorders(db, [new_order])
         db.commit()
         db.refresh(new_order)
-        return {
-            "id": new_order.id,
-            "name": new_order.name,
-            "os": new_order.os,
-            "host_version": new_order.host_version,
-            "cpu": new_order.cpu,
-            "ram": new_order.ram,
-            "disk": new_order.disk,
-            "status": new_order.status,
-            "created_at": new_order.created_at.isoformat(),
-            "host_id": new_order.host_id,
-            "vm_id": new_order.vm_id,
-            "datastore_id": new_order.datastore_id,
-            "disks": new_order.disks,
-            "nics": new_order.nics,
-            "resource_pool_id": new_order.resource_pool_id,
-            "ip_pool_id": new_order.ip_pool_id,
-            "datacenter_name": new_order.datacenter_name,
-        }
+        return new_order
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IPAMConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="IP pool changed concurrently; retry")
     except Exception as e:
         import traceback
         print('CREATE WORKORDER ERROR:', e)
@@ -97,46 +165,231 @@ def create_workorder(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/")
-def list_workorders(db: Session = Depends(get_db), limit: int = 5):
+@router.get("/", response_model=List[WorkOrderOut])
+def list_workorders(
+    response: Response,
+    db: Session = Depends(get_read_db),
+    limit: int = 5,
+    cursor: str = None,
+    status: Optional[str] = None,
+    host_id: Optional[str] = None,
+    datastore_id: Optional[str] = None,
+    os: Optional[str] = None,
+    datacenter_name: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    order: str = "desc"
+):
+    """
+    List workorders, newest first unless `order=asc`
+
+    `status` takes one status or a comma-separated list (e.g. pending,approved);
+    created_after / created_before bound created_at (inclusive / exclusive).
+    Pages are seeked by (created_at, id); when more rows remain, the cursor for
+    the next page is returned in the X-Next-Cursor response header. Status,
+    host, datastore, OS and datacenter filters are served by their own indexes.
+    """
     try:
-        orders = db.query(WorkOrder).order_by(WorkOrder.created_at.desc()).limit(limit).all()
-        return [
-            {
-                "id": o.id,
-                "name": o.name,
-                "os": o.os,
-                "host_version": o.host_version,
-                "cpu": o.cpu,
-                "ram": o.ram,
-                "disk": o.disk,
-                "status": o.status,
-                "created_at": o.created_at.isoformat(),
-                "host_id": o.host_id,
-                "vm_id": o.vm_id,
-                "datastore_id": o.datastore_id,
-                "disks": o.disks,
-                "nics": o.nics,
-                "resource_pool_id": o.resource_pool_id,
-                "ip_pool_id": o.ip_pool_id,
-                "template_id": o.template_id,
-                "hostname": o.hostname,
-                "ip": o.ip,
-                "netmask": o.netmask,
-                "gateway": o.gateway,
-                "domain": o.domain,
-                "hardware_version": o.hardware_version,
-                "scsi_controller_type": o.scsi_controller_type,
-                "folder_id": o.folder_id,
-                "network_id": o.network_id,
-                "datacenter_name": o.datacenter_name,
-            }
-            for o in orders
-        ]
+        if not 1 <= limit <= WORKORDER_LIST_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {WORKORDER_LIST_MAX_LIMIT}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        query = db.query(WorkOrder)
+        statuses = [value.strip() for value in status.split(",") if value.strip()] if status else []
+        if statuses:
+            query = query.filter(WorkOrder.status.in_(statuses) if len(statuses) > 1 else WorkOrder.status == statuses[0])
+        if host_id:
+            query = query.filter(WorkOrder.host_id == host_id)
+        if datastore_id:
+            query = query.filter(WorkOrder.datastore_id == datastore_id)
+        if os:
+            query = query.filter(WorkOrder.os == os)
+        if datacenter_name:
+            query = query.filter(WorkOrder.datacenter_name == datacenter_name)
+        if created_after:
+            query = query.filter(WorkOrder.created_at >= created_after)
+        if created_before:
+            query = query.filter(WorkOrder.created_at < created_before)
+        query = apply_keyset(query, WorkOrder.created_at, WorkOrder.id, cursor, descending=order == "desc")
+        orders = query.limit(limit).all()
+        if len(orders) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(orders[-1].created_at, orders[-1].id)
+        return orders
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/drift")
+def get_workorder_drift(refresh: bool = False):
+    """
+    Executed workorders whose VM is missing, differs from the requested cpu/ram/disk, or is orphaned
+
+    Returns the last background reconciliation (every DRIFT_RECONCILE_INTERVAL
+    seconds); `refresh=true` reconciles now.
+    """
+    try:
+        return drift_reconciler.report(refresh)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/placement")
+def recommend_placement(payload: dict):
+    """
+    Rank host/datastore pairs for one VM
+
+    Body: {"cpu": 2, "ram": 4, "disk": 40, "datacenter_name": "...", "limit": 5}
+    """
+    try:
+        return placement_engine.recommend(
+            payload["cpu"], payload["ram"], payload.get("disk", 0),
+            limit=payload.get("limit", 5), datacenter_name=payload.get("datacenter_name")
+        )
+    except (KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid placement request: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/placement/batch")
+def recommend_batch_placement(payload: dict, db: Session = Depends(get_read_db)):
+    """
+    Assign many VMs at once
+
+    Body: {"workorder_ids": [...]} to place stored workorders, or
+    {"workorders": [{"key": "web-1", "cpu": 2, "ram": 4, "disk": 40}, ...]}.
+    """
+    try:
+        if payload.get("workorder_ids"):
+            orders = db.query(WorkOrder).filter(WorkOrder.id.in_(payload["workorder_ids"])).all()
+            requests = [{"key": order.id, "cpu": order.cpu, "ram": order.ram, "disk": order.disk or 0} for order in orders]
+        else:
+            requests = [
+                {"key": item.get("key", index), "cpu": item["cpu"], "ram": item["ram"], "disk": item.get("disk", 0)}
+                for index, item in enumerate(payload.get("workorders") or [])
+            ]
+        if not requests:
+            raise HTTPException(status_code=400, detail="Nothing to place")
+        return placement_engine.place_batch(requests, datacenter_name=payload.get("datacenter_name"))
+    except HTTPException:
+        raise
+    except (KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid placement request: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch")
+def create_workorders_batch(
+    payload: dict,
+    db: Session = Depends(get_db)
+):
+    """
+    Validate and insert many workorders in one transaction
+
+    Body: {"workorders": [<same payload as POST /workorders/>, ...]}. Nothing
+    is inserted if any entry is invalid; the errors are returned per index.
+    Workorders drawing from an IP pool get their addresses in the same
+    transaction, in one bitmap pass per pool.
+    """
+    workorders = payload.get("workorders")
+    if not isinstance(workorders, list) or not workorders:
+        raise HTTPException(status_code=400, detail="'workorders' must be a non-empty list")
+    if len(workorders) > settings.WORKORDER_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {settings.WORKORDER_BATCH_MAX_SIZE} workorders per batch")
+
+    errors = []
+    for index, workorder in enumerate(workorders):
+        error = _validate_workorder(workorder)
+        if error:
+            errors.append({"index": index, "error": error})
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "Invalid workorders", "errors": errors})
+
+    try:
+        new_orders = [_build_workorder(workorder) for workorder in workorders]
+        db.add_all(new_orders)
+        db.flush()
+        ipam.assign_workorders(db, new_orders)
+        db.commit()
+        return {
+            "created": len(new_orders),
+            "workorders": [
+                {"id": order.id, "name": order.name, "status": order.status, "ip": order.ip}
+                for order in new_orders
+            ]
+        }
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IPAMConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="IP pool changed concurrently; retry")
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/{workorder_id}")
+@router.post("/batch/execute", status_code=202)
+def execute_workorders_batch(
+    payload: dict,
+    db: Session = Depends(get_db)
+):
+    """
+    Queue approved workorders as one batch
+
+    Body: {"workorder_ids": [...], "concurrency": 5, "group": false}. At most
+    `concurrency` executions of the batch run at once; with `group` true,
+    workorders in the same datacenter share one for_each Terraform apply.
+    Follow progress with GET /workorders/batch/{batch_id}.
+    """
+    workorder_ids = payload.get("workorder_ids")
+    if not isinstance(workorder_ids, list) or not workorder_ids:
+        raise HTTPException(status_code=400, detail="'workorder_ids' must be a non-empty list")
+    if len(workorder_ids) > settings.WORKORDER_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {settings.WORKORDER_BATCH_MAX_SIZE} workorders per batch")
+    concurrency = payload.get("concurrency", settings.WORKORDER_WORKERS)
+    if not isinstance(concurrency, int) or concurrency <= 0:
+        raise HTTPException(status_code=400, detail="'concurrency' must be a positive integer")
+
+    unique_ids = list(dict.fromkeys(workorder_ids))
+    orders = {order.id: order for order in db.query(WorkOrder).filter(WorkOrder.id.in_(unique_ids)).all()}
+    missing = [workorder_id for workorder_id in unique_ids if workorder_id not in orders]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "WorkOrders not found", "ids": missing})
+    not_approved = [
+        workorder_id for workorder_id in unique_ids
+        if not orders[workorder_id].status or orders[workorder_id].status.lower() != "approved"
+    ]
+    if not_approved:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "WorkOrders must be approved before execution", "ids": not_approved}
+        )
+    inventory = _placement_inventory()
+    with placement_engine.reservation_lock:
+        _check_placement([orders[workorder_id] for workorder_id in unique_ids], inventory)
+        try:
+            batch = workorder_jobs.enqueue_batch(
+                db, [orders[workorder_id] for workorder_id in unique_ids], concurrency, bool(payload.get("group", False))
+            )
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+    return {"message": "WorkOrder batch queued", **batch}
+
+@router.get("/batch/{batch_id}")
+def get_workorder_batch(batch_id: int):
+    batch = get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@router.put("/{workorder_id}", response_model=WorkOrderDetail)
 def update_workorder(
     workorder_id: int,
     workorder_update: dict,
@@ -145,42 +398,44 @@ def update_workorder(
     order = db.query(WorkOrder).filter(WorkOrder.id == workorder_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="WorkOrder not found")
+    try:
+        if "priority" in workorder_update:
+            workorder_update["priority"] = parse_priority(workorder_update["priority"])
+        if "deadline" in workorder_update:
+            workorder_update["deadline"] = _parse_deadline(workorder_update["deadline"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pool_changed = "ip_pool_id" in workorder_update and str(workorder_update["ip_pool_id"]) != str(order.ip_pool_id)
+    # addresses from an IPAM pool are dropped when leaving or joining one; legacy vCenter pools keep theirs
+    ipam_pool_changed = pool_changed and (
+        ipam.pool_id_of(order.ip_pool_id) is not None or ipam.pool_id_of(workorder_update["ip_pool_id"]) is not None
+    )
+    readdress = pool_changed or ("ip" in workorder_update and workorder_update["ip"] != order.ip)
     # Update all fields, including new ones
     for key, value in workorder_update.items():
         if hasattr(order, key):
             setattr(order, key, value)
-    db.commit()
+    try:
+        if readdress:
+            # hand the old address back and take the new one in the same transaction
+            if ipam_pool_changed:
+                for key in ("ip", "netmask", "gateway"):
+                    if key not in workorder_update:
+                        setattr(order, key, None)
+            ipam.release_owner(db, "workorder", order.id)
+            ipam.assign_workorders(db, [order])
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IPAMConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="IP pool changed concurrently; retry")
     db.refresh(order)
-    return {
-        "id": order.id,
-        "name": order.name,
-        "os": order.os,
-        "host_version": order.host_version,
-        "cpu": order.cpu,
-        "ram": order.ram,
-        "disk": order.disk,
-        "status": order.status,
-        "created_at": order.created_at.isoformat(),
-        "host_id": order.host_id,
-        "vm_id": order.vm_id,
-        "datastore_id": order.datastore_id,
-        "disks": order.disks,
-        "nics": order.nics,
-        "resource_pool_id": order.resource_pool_id,
-        "ip_pool_id": order.ip_pool_id,
-        "template_id": order.template_id,
-        "hostname": order.hostname,
-        "ip": order.ip,
-        "netmask": order.netmask,
-        "gateway": order.gateway,
-        "domain": order.domain,
-        "hardware_version": order.hardware_version,
-        "scsi_controller_type": order.scsi_controller_type,
-        "folder_id": order.folder_id,
-        "network_id": order.network_id,
-        "last_execution_log": order.last_execution_log,
-        "datacenter_name": order.datacenter_name,
-    }
+    return order
 
 @router.post("/{workorder_id}/approve")
 def approve_workorder(
@@ -195,110 +450,64 @@ def approve_workorder(
     db.refresh(order)
     return {"message": "WorkOrder approved", "id": order.id, "status": order.status}
 
-@router.post("/{workorder_id}/execute")
+@router.post("/{workorder_id}/execute", status_code=202)
 def execute_workorder(
     workorder_id: int,
     db: Session = Depends(get_db)
 ):
+    """
+    Queue an approved workorder for provisioning
+
+    Terraform runs on the background worker pool; poll /workorders/{id}/status
+    or /workorders/jobs/{job_id} for progress.
+    """
     order = db.query(WorkOrder).filter(WorkOrder.id == workorder_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="WorkOrder not found")
     if not order.status or order.status.lower() != "approved":
         raise HTTPException(status_code=400, detail="WorkOrder must be approved before execution")
+    inventory = _placement_inventory()
+    with placement_engine.reservation_lock:
+        _check_placement([order], inventory)
+        try:
+            job = workorder_jobs.enqueue(db, order)
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+    return {"message": "WorkOrder execution queued", "id": order.id, "job_id": job["job_id"], "status": job["status"]}
 
-    nics_value = order.nics
-    if not nics_value and order.network_name:
-        nics_value = [{"network_name": order.network_name, "ip": getattr(order, "ip", "")}]
-    if not nics_value:
-        nics_value = [{"network_name": "VM Network", "ip": getattr(order, "ip", "")}]
-
-    tfvars_content = f"""
-    vm_name = \"{order.name}\"\n"""
-    datacenter_name = (getattr(order, 'datacenter_name', None) or 'Datacenter').strip()
-    tfvars_content += f'datacenter_name = "{datacenter_name}"\n'
-    if order.template_id:
-        tfvars_content += f'template_id = "{order.template_id}"\n'
-    else:
-        tfvars_content += f'os = "{order.os}"\n'
-        if order.hardware_version:
-            tfvars_content += f'hardware_version = "{order.hardware_version}"\n'
-        if order.scsi_controller_type:
-            tfvars_content += f'scsi_controller_type = "{order.scsi_controller_type}"\n'
-        if nics_value:
-            tfvars_content += f'nics = {json.dumps(nics_value)}\n'
-    tfvars_content += f'cpu = {order.cpu}\n'
-    tfvars_content += f'ram = {order.ram}\n'
-    if order.host_id:
-        tfvars_content += f'host_system_id = "{order.host_id}"\n'
-    if order.resource_pool_id:
-        tfvars_content += f'resource_pool_id = "{order.resource_pool_id}"\n'
-    if order.ip_pool_id:
-        tfvars_content += f'ip_pool_id = "{order.ip_pool_id}"\n'
-    if order.folder_id:
-        tfvars_content += f'folder = "{order.folder_id}"\n'
-    if order.datastore_id:
-        tfvars_content += f'datastore_id = "{order.datastore_id}"\n'
-    if order.hostname:
-        tfvars_content += f'hostname = "{order.hostname}"\n'
-    if order.ip:
-        tfvars_content += f'ip = "{order.ip}"\n'
-    if order.netmask:
-        tfvars_content += f'netmask = "{order.netmask}"\n'
-    if order.gateway:
-        tfvars_content += f'gateway = "{order.gateway}"\n'
-    if order.domain:
-        tfvars_content += f'domain = "{order.domain}"\n'
-    log_lines = ["--- TFVARS CONTENT ---", tfvars_content]
-
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".tfvars", delete=False) as tfvars_file:
-        tfvars_file.write(tfvars_content)
-        tfvars_path = tfvars_file.name
-
-    terraform_bin = os.environ.get('TERRAFORM_PATH') or shutil.which('terraform') or r'D:\terraform\terraform.exe'
-    if not terraform_bin:
-        raise HTTPException(status_code=500, detail="Terraform binary not found. Set TERRAFORM_PATH env variable or add terraform to PATH.")
+@router.post("/{workorder_id}/cancel")
+def cancel_workorder(
+    workorder_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Cancel a workorder's queued or running execution
 
+    A running Terraform process group is interrupted and killed if it does not
+    stop within WORKORDER_KILL_GRACE seconds; the job's final status is
+    visible at /workorders/jobs/{job_id} once it has wound down.
+    """
+    order = db.query(WorkOrder).filter(WorkOrder.id == workorder_id).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="WorkOrder not found")
     try:
-        tf_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../Terraform - vSphere'))
-        env = os.environ.copy()
-        env["TF_VAR_vsphere_user"] = "administrator@vsphere.local"  
-        env["TF_VAR_vsphere_password"] = "Jess24793920@"     
-        env["TF_VAR_vsphere_server"] = "172.19.3.36"        
-        result_init = subprocess.run([
-            terraform_bin, "init"
-        ], cwd=tf_dir, capture_output=True, text=True, env=env)
-        log_lines.append("--- TERRAFORM INIT STDOUT ---")
-        log_lines.append(result_init.stdout)
-        log_lines.append("--- TERRAFORM INIT STDERR ---")
-        log_lines.append(result_init.stderr)
-        if result_init.returncode != 0:
-            order.status = "failed"
-            order.last_execution_log = "\n".join(log_lines)
-            db.commit()
-            db.refresh(order)
-            raise Exception(f"Terraform init failed: {result_init.stderr}")
-        result_apply = subprocess.run([
-            terraform_bin, "apply", "-auto-approve", f"-var-file={tfvars_path}"
-        ], cwd=tf_dir, capture_output=True, text=True, env=env)
-        log_lines.append("--- TERRAFORM APPLY STDOUT ---")
-        log_lines.append(result_apply.stdout)
-        log_lines.append("--- TERRAFORM APPLY STDERR ---")
-        log_lines.append(result_apply.stderr)
-        if result_apply.returncode != 0:
-            order.status = "failed"
-            order.last_execution_log = "\n".join(log_lines)
-            db.commit()
-            db.refresh(order)
-            raise Exception(f"Terraform apply failed: {result_apply.stderr}")
-        order.status = "executed"
-        order.last_execution_log = "\n".join(log_lines)
-        db.commit()
-        db.refresh(order)
-        return {"message": "WorkOrder executed and VM provisioned", "output": result_apply.stdout, "id": order.id}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        os.remove(tfvars_path)
+        job = workorder_jobs.cancel(workorder_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    message = "WorkOrder execution cancelling" if job["cancelling"] else "WorkOrder execution cancelled"
+    return {"message": message, "id": workorder_id, **job}
+
+@router.get("/jobs/{job_id}")
+def get_workorder_job(job_id: int):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{workorder_id}/jobs")
+def list_workorder_jobs(workorder_id: int, limit: int = 20):
+    return get_workorder_jobs(workorder_id, limit)
 
 @router.delete("/{workorder_id}")
 def delete_workorder(
@@ -308,6 +517,10 @@ def delete_workorder(
     order = db.query(WorkOrder).filter(WorkOrder.id == workorder_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="WorkOrder not found")
+    job = get_latest_job(workorder_id)
+    if job and job["status"] in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="WorkOrder has an active execution; cancel it first")
+    ipam.release_owner(db, "workorder", order.id)
     db.delete(order)
     db.commit()
     return {"message": "WorkOrder deleted", "id": workorder_id}
@@ -317,25 +530,72 @@ def get_workorder_log(workorder_id: int, db: Session = Depends(get_db)):
     order = db.query(WorkOrder).filter(WorkOrder.id == workorder_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="WorkOrder not found")
+    job = get_latest_job(workorder_id)
+    if job and job["status"] == "running":
+        buffer = job_logs.get(job["job_id"])
+        if buffer is not None:
+            return {"log": buffer.tail(settings.JOB_LOG_TAIL_LINES), "job_id": job["job_id"], "running": True}
     return {"log": order.last_execution_log or ""}
 
+@router.get("/{workorder_id}/log/stream")
+def stream_workorder_log(
+    workorder_id: int,
+    job_id: int = None,
+    after: int = 0,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Follow a workorder's execution log as Server-Sent Events
+
+    Each event carries one output line with its line number as the event id,
+    so reconnecting clients resume via Last-Event-ID. Streams the latest job
+    unless `job_id` is given, and ends with an `end` event holding the job's
+    final status.
+    """
+    job = get_job(job_id) if job_id else get_latest_job(workorder_id)
+    if not job or job["workorder_id"] != workorder_id:
+        raise HTTPException(status_code=404, detail="No execution found for this WorkOrder")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+
+    def events():
+        for line in follow_job_log(job["job_id"], after):
+            if line is None:
+                yield ": keep-alive\n\n"
+                continue
+            number, text = line
+            yield f"id: {number}\ndata: {text}\n\n"
+        final = get_job(job["job_id"]) or {}
+        yield f"event: end\ndata: {json.dumps({'job_id': job['job_id'], 'status': final.get('status')})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{workorder_id}/status")
 def get_workorder_status(workorder_id: int, db: Session = Depends(get_db)):
     order = db.query(WorkOrder).filter(WorkOrder.id == workorder_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="WorkOrder not found")
-    return {"status": order.status} 
+    return {"status": order.status, "job": get_latest_job(workorder_id)}
+
 
 @router.get("/resource-pools")
 def list_resource_pools():
     return get_resource_pools_info()
 
 @router.get("/ip-pools")
-def list_ip_pools():
-    return [
-        {"id": "ippool-1", "name": "Office LAN", "description": "192.168.1.0/24"},
-        {"id": "ippool-2", "name": "DMZ", "description": "10.0.0.0/24"},
-    ] 
+def list_ip_pools(db: Session = Depends(get_read_db)):
+    """IPAM pools a workorder can take its address from (pass the id as ip_pool_id)"""
+    try:
+        return [
+            {**ipam.pool_to_dict(pool), "id": str(pool.id), "description": pool.description or pool.cidr}
+            for pool in db.query(IPPool).order_by(IPPool.id)
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/folders")
 def list_folders():
@@ -346,4 +606,16 @@ def list_datacenters():
     try:
         return get_datacenters_info()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+# Declared last so the static GET routes above (/resource-pools, /folders, ...) match first
+@router.get("/{workorder_id}", response_model=WorkOrderDetail)
+def get_workorder(
+    workorder_id: int = Path(..., description="The ID of the workorder"),
+    db: Session = Depends(get_db)
+):
+    """Get a single workorder by primary key"""
+    order = db.get(WorkOrder, workorder_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="WorkOrder not found")
+    return order
@@ -1,13 +1,59 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, Numeric, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, Numeric, ForeignKey, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
 from datetime import datetime
+import time
 from app.config import settings
+from app.metrics import metrics
 from models.workorder import WorkOrder
 
-# Create database engine
-engine = create_engine(settings.get_database_url())
+metrics.describe("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection")
+
+def _timed_pool(pool_class, pool_name):
+    """
+    Build a pool class that records how long each checkout waits for a connection
+    """
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                metrics.observe("db_pool_checkout_wait_seconds", time.perf_counter() - start, {"pool": pool_name})
+    
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+def _pool_options():
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Create database engines; the read engine is the primary unless a replica is configured
+engine = create_engine(settings.get_database_url(), poolclass=_timed_pool(QueuePool, "primary"), **_pool_options())
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(settings.get_read_database_url(), poolclass=_timed_pool(QueuePool, "read"), **_pool_options())
+else:
+    read_engine = engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+def _collect_pool_metrics(registry):
+    pools = {"primary": engine.pool}
+    if read_engine is not engine:
+        pools["read"] = read_engine.pool
+    for name, pool in pools.items():
+        registry.set_gauge("db_pool_checked_out", pool.checkedout(), {"pool": name})
+        registry.set_gauge("db_pool_size", pool.size(), {"pool": name})
+        registry.set_gauge("db_pool_checked_in", pool.checkedin(), {"pool": name})
+
+metrics.register_collector(_collect_pool_metrics)
 
 # Create base class for models
 Base = declarative_base()
@@ -95,6 +141,10 @@ class MonitoringData(Base):
     entity_name = Column(String, index=True)
     data_json = Column(Text)  # Store JSON data as text
     
+    __table_args__ = (
+        Index("ix_monitoring_data_type_timestamp_id", "data_type", "timestamp", "id"),
+    )
+    
 class SystemMetrics(Base):
     __tablename__ = "system_metrics"
     
@@ -104,6 +154,24 @@ class SystemMetrics(Base):
     value = Column(Float)
     unit = Column(String)  # 'percent', 'mhz', 'gb'
     description = Column(String)
+    
+    __table_args__ = (
+        Index("ix_system_metrics_type_timestamp_id", "metric_type", "timestamp", "id"),
+    )
+
+class CollectionRun(Base):
+    __tablename__ = "collection_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    data_class = Column(String, nullable=False)  # 'metrics', 'inventory', 'all'
+    trigger = Column(String, nullable=False)  # 'schedule', 'manual'
+    status = Column(String, default="queued")  # queued, running, succeeded, failed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Float)
+    records_stored = Column(JSON)
+    error = Column(Text)
 
 # Create tables
 Base.metadata.create_all(bind=engine)
@@ -117,3 +185,44 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """
+    Get a database session bound to the read replica (or the primary when none is configured)
+    
+    Use for history and listing queries only; rows written moments ago may not be visible yet.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def session_scope():
+    """
+    Transactional session for background jobs and services
+    
+    Commits when the block succeeds, rolls back on any exception and always
+    returns the connection to the pool.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@contextmanager
+def read_session_scope():
+    """
+    Read-only session on the read replica for background jobs and services
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
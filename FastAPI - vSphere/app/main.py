@@ -1,7 +1,17 @@
+import logging
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import clusters, hosts, datastores, vms, system, history, workorders, networks, vni_workorders
+from api.routers import clusters, hosts, datastores, vms, system, history, workorders, networks, vni_workorders, ipam
 from app.config import settings
+from services.scheduler import collection_scheduler
+from services.workorder_jobs import workorder_jobs
+from services.vni_jobs import vni_jobs
+from services.drift import drift_reconciler
+from services.cidr_index import cidr_index
+from services.terraform_runner import prime_plugin_cache
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.API_TITLE,
@@ -30,6 +40,28 @@ app.include_router(history.router)
 app.include_router(workorders.router)
 app.include_router(networks.router)
 app.include_router(vni_workorders.router)
+app.include_router(ipam.router)
+
+@app.on_event("startup")
+def start_background_services():
+    if settings.HISTORY_SCHEDULER_ENABLED:
+        collection_scheduler.start()
+    workorder_jobs.start()
+    vni_jobs.start()
+    drift_reconciler.start()
+    try:
+        cidr_index.rebuild()
+    except Exception as e:
+        logger.error(f"Failed to build the VNI CIDR index: {str(e)}")
+    if settings.TERRAFORM_PRIME_CACHE:
+        threading.Thread(target=prime_plugin_cache, name="terraform-cache-prime", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_background_services():
+    collection_scheduler.stop()
+    workorder_jobs.stop()
+    vni_jobs.stop()
+    drift_reconciler.stop()
 
 @app.get("/")
 def root():
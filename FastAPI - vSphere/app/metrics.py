@@ -0,0 +1,133 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry (counters, gauges, histograms)
+
+    Rendered in the Prometheus text exposition format by /system/metrics, so it
+    can be scraped without pulling in a client library.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._gauges: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], Dict] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[["MetricsRegistry"], None]] = []
+
+    def describe(self, name: str, help_text: str):
+        """Attach a HELP line to a metric name"""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[Dict[str, str]] = None):
+        """Increment a counter"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        """Set a gauge to an absolute value"""
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = float(value)
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None, buckets=DEFAULT_BUCKETS):
+        """Record one observation in a histogram"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = {"buckets": buckets, "counts": [0] * len(buckets), "count": 0, "sum": 0.0, "max": 0.0}
+                self._histograms[key] = hist
+            for i, bound in enumerate(hist["buckets"]):
+                if value <= bound:
+                    hist["counts"][i] += 1
+            hist["count"] += 1
+            hist["sum"] += value
+            hist["max"] = max(hist["max"], value)
+
+    def register_collector(self, collector: Callable[["MetricsRegistry"], None]):
+        """Register a callback that refreshes gauges right before each snapshot"""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict:
+        """
+        Get all metrics as plain dicts
+
+        Returns:
+            dict: counters, gauges and histograms keyed by metric name
+        """
+        self._collect()
+        with self._lock:
+            return {
+                "counters": _group(self._counters),
+                "gauges": _group(self._gauges),
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(labels),
+                            "count": hist["count"],
+                            "sum": hist["sum"],
+                            "max": hist["max"],
+                            "mean": hist["sum"] / hist["count"] if hist["count"] else 0.0,
+                        }
+                        for (hist_name, labels), hist in self._histograms.items() if hist_name == name
+                    ]
+                    for name in {name for name, _ in self._histograms}
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        self._collect()
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({name for name, _ in series}):
+                    self._header(lines, name, kind)
+                    for (series_name, labels), value in series.items():
+                        if series_name == name:
+                            lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self._histograms}):
+                self._header(lines, name, "histogram")
+                for (series_name, labels), hist in self._histograms.items():
+                    if series_name != name:
+                        continue
+                    for bound, count in zip(hist["buckets"], hist["counts"]):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def _collect(self):
+        for collector in self._collectors:
+            try:
+                collector(self)
+            except Exception:
+                pass
+
+def _label_key(labels: Optional[Dict[str, str]]) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+def _group(series: Dict[Tuple[str, tuple], float]) -> Dict[str, list]:
+    grouped: Dict[str, list] = {}
+    for (name, labels), value in series.items():
+        grouped.setdefault(name, []).append({"labels": dict(labels), "value": value})
+    return grouped
+
+metrics = MetricsRegistry()
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, LargeBinary, Index, UniqueConstraint
+from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime
+
+Base = declarative_base()
+
+class IPPool(Base):
+    __tablename__ = "ip_pools"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True)
+    description = Column(Text)
+    cidr = Column(String, nullable=False)
+    gateway = Column(String)
+    range_start = Column(String, nullable=False)  # first allocatable address
+    range_end = Column(String, nullable=False)  # last allocatable address
+    size = Column(Integer, nullable=False)  # addresses in range_start..range_end
+    allocated = Column(Integer, nullable=False, default=0)
+    bitmap = Column(LargeBinary, nullable=False)  # bit i set = range_start + i is taken
+    next_free = Column(Integer, nullable=False, default=0)  # no free address below this offset
+    vni_workorder_id = Column(Integer, unique=True)  # set for the pool of a VNI workorder's subnet
+    version = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # concurrent allocations from the same pool fail with StaleDataError instead of overwriting each other
+    __mapper_args__ = {"version_id_col": version}
+
+class IPAllocation(Base):
+    __tablename__ = "ip_allocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pool_id = Column(Integer, nullable=False)
+    offset = Column(Integer, nullable=False)  # position in the pool bitmap
+    address = Column(String, nullable=False)
+    owner_type = Column(String, nullable=False)  # workorder, reserved
+    owner_id = Column(Integer)
+    note = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("pool_id", "offset", name="uq_ip_allocations_pool_id_offset"),
+        Index("ix_ip_allocations_owner", "owner_type", "owner_id"),
+    )
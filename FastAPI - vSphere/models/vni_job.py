@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime
+
+Base = declarative_base()
+
+class VNIJob(Base):
+    __tablename__ = "vni_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vni_workorder_id = Column(Integer, nullable=False)
+    t1_gw = Column(String, nullable=False)  # jobs of the same T1 gateway run one change at a time
+    status = Column(String, default="queued")  # queued, running, succeeded, failed
+    segment_id = Column(String)  # NSX segment written by the job
+    batch_size = Column(Integer)  # segments sent in the same NSX call
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    error = Column(Text)
+
+    __table_args__ = (
+        Index("ix_vni_jobs_vni_workorder_id_id", "vni_workorder_id", "id"),
+        Index("ix_vni_jobs_status", "status"),
+    )
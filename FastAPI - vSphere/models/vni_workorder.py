@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -30,7 +30,7 @@ class VNIWorkOrder(Base):
     number_of_ips = Column(Integer, nullable=False)
     
     # Status and tracking
-    status = Column(String, default="pending")  # pending, approved, executing, completed, failed
+    status = Column(String, default="pending")  # pending, approved, queued, executing, completed, failed
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_execution_log = Column(Text, nullable=True)
@@ -38,4 +38,15 @@ class VNIWorkOrder(Base):
     # Additional metadata
     notes = Column(Text, nullable=True)
     priority = Column(String, default="normal")  # low, normal, high, critical
-    assigned_to = Column(String, nullable=True) 
\ No newline at end of file
+    assigned_to = Column(String, nullable=True) 
+
+    __table_args__ = (
+        Index("ix_vni_workorders_created_at_id", "created_at", "id"),
+        Index("ix_vni_workorders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_vni_workorders_project_created_at_id", "project", "created_at", "id"),
+        Index("ix_vni_workorders_owner_created_at_id", "owner", "created_at", "id"),
+        Index("ix_vni_workorders_t1_gw_created_at_id", "t1_gw", "created_at", "id"),
+        Index("ix_vni_workorders_t0_gw", "t0_gw"),
+        Index("ix_vni_workorders_priority_created_at_id", "priority", "created_at", "id"),
+        Index("ix_vni_workorders_deadline", "deadline"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -34,4 +34,15 @@ class WorkOrder(Base):
     scsi_controller_type = Column(String)
     folder_id = Column(String)
     network_id = Column(String)
-    datacenter_name = Column(String) 
\ No newline at end of file
+    datacenter_name = Column(String) 
+    priority = Column(String, default="normal")  # low, normal, high, critical
+    deadline = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_workorders_created_at_id", "created_at", "id"),
+        Index("ix_workorders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_workorders_host_id", "host_id"),
+        Index("ix_workorders_datastore_id", "datastore_id"),
+        Index("ix_workorders_os", "os"),
+        Index("ix_workorders_datacenter_name", "datacenter_name"),
+    )
@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, Index
+from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime
+
+Base = declarative_base()
+
+class WorkOrderBatch(Base):
+    __tablename__ = "workorder_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    total = Column(Integer, nullable=False)
+    concurrency = Column(Integer, nullable=False)
+    grouped = Column(Boolean, default=False)  # compatible VMs share one for_each apply
+
+class WorkOrderJob(Base):
+    __tablename__ = "workorder_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    workorder_id = Column(Integer, nullable=False)
+    batch_id = Column(Integer)
+    group_key = Column(String)  # workspace shared by the jobs of one grouped apply
+    status = Column(String, default="queued")  # queued, running, succeeded, failed, cancelled
+    phase = Column(String)  # current step while running, e.g. init, apply, clone
+    progress = Column(Integer)  # percent complete, reported by native clone tasks
+    pid = Column(Integer)  # terraform process group while a command runs, reaped after a crash
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    init_seconds = Column(Float)
+    init_skipped = Column(Boolean)
+    apply_seconds = Column(Float)
+    log = Column(Text)
+    error = Column(Text)
+
+    __table_args__ = (
+        Index("ix_workorder_jobs_workorder_id_id", "workorder_id", "id"),
+        Index("ix_workorder_jobs_status", "status"),
+        Index("ix_workorder_jobs_batch_id", "batch_id"),
+    )
+
+class JobLogChunk(Base):
+    __tablename__ = "job_log_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, nullable=False)
+    first_line = Column(Integer, nullable=False)  # 1-based number of the chunk's first line
+    line_count = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_job_log_chunks_job_id_first_line", "job_id", "first_line"),
+    )
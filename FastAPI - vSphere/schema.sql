@@ -94,8 +94,23 @@ create table workorders (
    scsi_controller_type varchar,
    folder_id            varchar,
    network_id           varchar,
-   datacenter_name      varchar
+   datacenter_name      varchar,
+   priority             varchar default 'normal',
+   deadline             timestamp
 );
+create index ix_workorders_created_at_id on workorders ( created_at, id );
+create index ix_workorders_status_created_at_id on workorders ( status, created_at, id );
+create index ix_workorders_host_id on workorders ( host_id );
+create index ix_workorders_datastore_id on workorders ( datastore_id );
+create index ix_workorders_os on workorders ( os );
+create index ix_workorders_datacenter_name on workorders ( datacenter_name );
+
+-- Upgrade a workorders table created before priority, deadline and the datastore and OS indexes existed
+alter table workorders
+   add column if not exists priority varchar default 'normal',
+   add column if not exists deadline timestamp;
+create index if not exists ix_workorders_datastore_id on workorders ( datastore_id );
+create index if not exists ix_workorders_os on workorders ( os );
 
 -- 6. Monitoring Data Table
 create table monitoring_data (
@@ -105,6 +120,7 @@ create table monitoring_data (
    entity_name varchar,
    data_json   text
 );
+create index ix_monitoring_data_type_timestamp_id on monitoring_data ( data_type, timestamp, id );
 
 -- 7. System Metrics Table
 create table system_metrics (
@@ -115,6 +131,7 @@ create table system_metrics (
    unit        varchar,              -- 'percent', 'mhz', 'gb'
    description varchar
 );
+create index ix_system_metrics_type_timestamp_id on system_metrics ( metric_type, timestamp, id );
 
 -- 8. Networks Table (optional, if you want to persist networks)
 create table networks (
@@ -153,4 +170,130 @@ create table vni_workorders (
    notes             text,
    priority          varchar default 'normal',
    assigned_to       varchar
-);
\ No newline at end of file
+);
+create index ix_vni_workorders_created_at_id on vni_workorders ( created_at, id );
+create index ix_vni_workorders_status_created_at_id on vni_workorders ( status, created_at, id );
+create index ix_vni_workorders_project_created_at_id on vni_workorders ( project, created_at, id );
+create index ix_vni_workorders_owner_created_at_id on vni_workorders ( owner, created_at, id );
+create index ix_vni_workorders_t1_gw_created_at_id on vni_workorders ( t1_gw, created_at, id );
+create index ix_vni_workorders_t0_gw on vni_workorders ( t0_gw );
+create index ix_vni_workorders_priority_created_at_id on vni_workorders ( priority, created_at, id );
+create index ix_vni_workorders_deadline on vni_workorders ( deadline );
+
+-- 10. Collection Runs Table (history scheduler audit)
+create table collection_runs (
+   id             serial primary key,
+   data_class     varchar not null,   -- 'metrics', 'inventory', 'all'
+   trigger        varchar not null,   -- 'schedule', 'manual'
+   status         varchar default 'queued',
+   created_at     timestamp default current_timestamp,
+   started_at     timestamp,
+   finished_at    timestamp,
+   duration_ms    float,
+   records_stored jsonb,
+   error          text
+);
+
+-- 11. Workorder Batches Table (bulk execution)
+create table workorder_batches (
+   id            serial primary key,
+   created_at    timestamp default current_timestamp,
+   total         int not null,
+   concurrency   int not null,
+   grouped       boolean default false
+);
+
+-- 12. Workorder Jobs Table (asynchronous workorder execution)
+create table workorder_jobs (
+   id            serial primary key,
+   workorder_id  int not null
+      references workorders ( id )
+         on delete cascade,
+   batch_id      int
+      references workorder_batches ( id )
+         on delete set null,
+   group_key     varchar,
+   status        varchar default 'queued',   -- queued, running, succeeded, failed, cancelled
+   phase         varchar,
+   progress      int,
+   pid           int,
+   created_at    timestamp default current_timestamp,
+   started_at    timestamp,
+   finished_at   timestamp,
+   init_seconds  float,
+   init_skipped  boolean,
+   apply_seconds float,
+   log           text,
+   error         text
+);
+create index ix_workorder_jobs_workorder_id_id on workorder_jobs ( workorder_id, id );
+create index ix_workorder_jobs_status on workorder_jobs ( status );
+create index ix_workorder_jobs_batch_id on workorder_jobs ( batch_id );
+
+-- 13. Job Log Chunks Table (streamed terraform output)
+create table job_log_chunks (
+   id          serial primary key,
+   job_id      int not null
+      references workorder_jobs ( id )
+         on delete cascade,
+   first_line  int not null,
+   line_count  int not null,
+   content     text not null,
+   created_at  timestamp default current_timestamp
+);
+create index ix_job_log_chunks_job_id_first_line on job_log_chunks ( job_id, first_line );
+
+-- 14. IP Pools Table (IPAM; one allocation bit per address of the range)
+create table ip_pools (
+   id                serial primary key,
+   name              varchar not null unique,
+   description       text,
+   cidr              varchar not null,
+   gateway           varchar,
+   range_start       varchar not null,
+   range_end         varchar not null,
+   size              int not null,
+   allocated         int not null default 0,
+   bitmap            bytea not null,
+   next_free         int not null default 0,
+   vni_workorder_id  int unique
+      references vni_workorders ( id )
+         on delete cascade,
+   version           int not null,
+   created_at        timestamp default current_timestamp,
+   updated_at        timestamp default current_timestamp
+);
+
+-- 15. IP Allocations Table (who holds each taken address)
+create table ip_allocations (
+   id          serial primary key,
+   pool_id     int not null
+      references ip_pools ( id )
+         on delete cascade,
+   "offset"    int not null,
+   address     varchar not null,
+   owner_type  varchar not null,   -- workorder, reserved
+   owner_id    int,
+   note        varchar,
+   created_at  timestamp default current_timestamp,
+   constraint uq_ip_allocations_pool_id_offset unique ( pool_id, "offset" )
+);
+create index ix_ip_allocations_owner on ip_allocations ( owner_type, owner_id );
+
+-- 16. VNI Jobs Table (queued NSX segment creation)
+create table vni_jobs (
+   id                serial primary key,
+   vni_workorder_id  int not null
+      references vni_workorders ( id )
+         on delete cascade,
+   t1_gw             varchar not null,
+   status            varchar default 'queued',   -- queued, running, succeeded, failed
+   segment_id        varchar,
+   batch_size        int,
+   created_at        timestamp default current_timestamp,
+   started_at        timestamp,
+   finished_at       timestamp,
+   error             text
+);
+create index ix_vni_jobs_vni_workorder_id_id on vni_jobs ( vni_workorder_id, id );
+create index ix_vni_jobs_status on vni_jobs ( status );
@@ -0,0 +1,43 @@
+"""
+VNI WorkOrder Schemas
+Response models serialized straight from VNIWorkOrder rows
+"""
+
+from datetime import datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+class VNIWorkOrderOut(BaseModel):
+    """A VNI workorder as returned by create, list and update routes"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    owner: str
+    requested_date: datetime
+    requested_by: str
+    virtual_machines: Optional[List[Any]] = None
+    deadline: datetime
+    project: str
+    t0_gw: str
+    t1_gw: str
+    description: str
+    vni_name: str
+    cidr: str
+    subnet_mask: str
+    gateway: str
+    first_ip: str
+    last_ip: str
+    number_of_ips: int
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    notes: Optional[str] = None
+    priority: Optional[str] = None
+    assigned_to: Optional[str] = None
+
+class VNIWorkOrderDetail(VNIWorkOrderOut):
+    """A single VNI workorder, with its last execution log"""
+
+    last_execution_log: Optional[str] = None
@@ -0,0 +1,49 @@
+"""
+WorkOrder Schemas
+Response models serialized straight from WorkOrder rows
+"""
+
+from datetime import datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+class WorkOrderOut(BaseModel):
+    """A workorder as returned by the create and list routes"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    os: str
+    host_version: str
+    cpu: int
+    ram: int
+    disk: float
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    host_id: Optional[str] = None
+    vm_id: Optional[str] = None
+    datastore_id: Optional[str] = None
+    disks: Optional[List[Any]] = None
+    nics: Optional[List[Any]] = None
+    resource_pool_id: Optional[str] = None
+    ip_pool_id: Optional[str] = None
+    template_id: Optional[str] = None
+    hostname: Optional[str] = None
+    ip: Optional[str] = None
+    netmask: Optional[str] = None
+    gateway: Optional[str] = None
+    domain: Optional[str] = None
+    hardware_version: Optional[str] = None
+    scsi_controller_type: Optional[str] = None
+    folder_id: Optional[str] = None
+    network_id: Optional[str] = None
+    datacenter_name: Optional[str] = None
+    priority: Optional[str] = None
+    deadline: Optional[datetime] = None
+
+class WorkOrderDetail(WorkOrderOut):
+    """A single workorder, with its last execution log"""
+
+    last_execution_log: Optional[str] = None
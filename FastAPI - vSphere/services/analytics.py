@@ -0,0 +1,357 @@
+"""
+Metric Analytics Service
+Trend, EWMA, anomaly and time-to-threshold computation over stored metric history
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.database import read_session_scope, SystemMetrics, Cluster, Host, Datastore
+
+SCOPES = ("system", "cluster", "host", "datastore")
+
+# Rows timestamped this long before the newest one read are read again, so rows committed out of order are not missed
+REFRESH_OVERLAP_SECONDS = 120
+
+def linear_trend(times: np.ndarray, values: np.ndarray) -> Dict:
+    """
+    Least-squares fit of value against time
+
+    Args:
+        times: Sample times in epoch seconds
+        values: Sample values
+
+    Returns:
+        Dict with slope_per_hour, fitted_latest (fitted value at the last sample) and r_squared
+    """
+    if len(values) < 2:
+        return {"slope_per_hour": 0.0, "fitted_latest": float(values[-1]) if len(values) else None, "r_squared": None}
+    hours = (times - times[-1]) / 3600.0
+    h_mean = hours.mean()
+    v_mean = values.mean()
+    dh = hours - h_mean
+    dv = values - v_mean
+    denom = float(np.dot(dh, dh))
+    if denom == 0:
+        return {"slope_per_hour": 0.0, "fitted_latest": float(v_mean), "r_squared": None}
+    slope = float(np.dot(dh, dv)) / denom
+    intercept = v_mean - slope * h_mean  # value at hours == 0, i.e. the last sample
+    ss_tot = float(np.dot(dv, dv))
+    residuals = dv - slope * dh
+    r_squared = 1.0 - float(np.dot(residuals, residuals)) / ss_tot if ss_tot > 0 else 1.0
+    return {"slope_per_hour": slope, "fitted_latest": float(intercept), "r_squared": r_squared}
+
+def ewma(values: np.ndarray, alpha: float, initial: Optional[float] = None) -> Optional[float]:
+    """
+    Exponentially weighted moving average of a series, continuing from `initial`
+
+    Computed in closed form so the whole series is folded in one vector op.
+    """
+    n = len(values)
+    if n == 0:
+        return initial
+    if initial is None:
+        initial, values, n = float(values[0]), values[1:], n - 1
+        if n == 0:
+            return initial
+    decay = 1.0 - alpha
+    weights = alpha * decay ** np.arange(n - 1, -1, -1)
+    return float(np.dot(weights, values) + decay ** n * initial)
+
+def rolling_zscores(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Z-score of each sample against the `window` samples before it
+
+    Samples without a full window before them get a z-score of 0.
+    """
+    n = len(values)
+    scores = np.zeros(n)
+    if n <= window or window < 2:
+        return scores
+    c1 = np.concatenate(([0.0], np.cumsum(values)))
+    c2 = np.concatenate(([0.0], np.cumsum(values * values)))
+    idx = np.arange(window, n)
+    mean = (c1[idx] - c1[idx - window]) / window
+    var = (c2[idx] - c2[idx - window]) / window - mean * mean
+    std = np.sqrt(np.clip(var, 0.0, None))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 1e-9, (values[idx] - mean) / std, 0.0)
+    scores[idx] = z
+    return scores
+
+def hours_to_threshold(current: Optional[float], slope_per_hour: float, threshold: float) -> Optional[float]:
+    """
+    Hours until a linearly trending value crosses `threshold`, or None if it never will
+    """
+    if current is None:
+        return None
+    if current >= threshold:
+        return 0.0
+    if slope_per_hour <= 0:
+        return None
+    return (threshold - current) / slope_per_hour
+
+class _Series:
+    """Samples of one metric for one entity inside the analysis window"""
+
+    __slots__ = ("ids", "times", "values", "ewma")
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.times = np.empty(0)
+        self.values = np.empty(0)
+        self.ewma = None
+
+    def extend(self, ids, times, values, alpha):
+        if len(self.times) and times[0] < self.times[-1]:
+            # a row committed late: merge it in time order and refold the average over the window
+            ids = np.concatenate((self.ids, ids))
+            times = np.concatenate((self.times, times))
+            values = np.concatenate((self.values, values))
+            order = np.lexsort((ids, times))
+            self.ids, self.times, self.values = ids[order], times[order], values[order]
+            self.ewma = ewma(self.values, alpha)
+            return
+        self.ewma = ewma(values, alpha, self.ewma)
+        self.ids = np.concatenate((self.ids, ids))
+        self.times = np.concatenate((self.times, times))
+        self.values = np.concatenate((self.values, values))
+
+    def trim(self, since: float) -> bool:
+        keep = np.searchsorted(self.times, since, side="left")
+        if keep == 0:
+            return False
+        self.ids = self.ids[keep:]
+        self.times = self.times[keep:]
+        self.values = self.values[keep:]
+        return True
+
+class _WindowCache:
+    """Per (scope, window) samples plus the last computed result"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_time: Optional[float] = None  # timestamp of the newest row read
+        self.recent_ids: Dict[int, float] = {}  # rows read inside the overlap -> timestamp
+        self.version = 0
+        self.series: Dict[tuple, _Series] = {}
+        self.results: Dict[tuple, tuple] = {}  # params -> (version, result)
+
+class MetricAnalytics:
+    """Cached, incrementally refreshed analytics over stored metric history"""
+
+    def __init__(self, alpha: float, zscore_window: int, zscore_threshold: float, trend_threshold: float):
+        self.alpha = alpha
+        self.zscore_window = zscore_window
+        self.zscore_threshold = zscore_threshold
+        self.trend_threshold = trend_threshold
+        self._lock = threading.Lock()
+        self._caches: Dict[tuple, _WindowCache] = {}
+
+    def analyze(self, scope: str, window_hours: int, threshold: float, entity_name: Optional[str] = None) -> Dict:
+        """
+        Analyze every metric of every entity in a scope over the trailing window
+
+        Only rows from the last REFRESH_OVERLAP_SECONDS before the newest row
+        already read are read again, and rows already seen are skipped; the
+        cached result is reused when no new rows arrived.
+
+        Args:
+            scope: One of 'system', 'cluster', 'host', 'datastore'
+            window_hours: Size of the trailing analysis window
+            threshold: Percent level used for the time-to-threshold forecast
+            entity_name: Optional entity to restrict the result to
+
+        Returns:
+            Dict of entity name -> metric name -> analytics
+
+        Raises:
+            ValueError: If the scope or window is invalid
+        """
+        if scope not in SCOPES:
+            raise ValueError(f"Invalid scope. Must be one of: {', '.join(SCOPES)}")
+        if window_hours <= 0:
+            raise ValueError("window_hours must be positive")
+
+        with self._lock:
+            cache = self._caches.setdefault((scope, window_hours), _WindowCache())
+
+        with cache.lock:
+            window_start = datetime.utcnow() - timedelta(hours=window_hours)
+            self._refresh(cache, scope, window_start)
+
+            params = (threshold,)
+            cached = cache.results.get(params)
+            if cached is None or cached[0] != cache.version:
+                cached = (cache.version, self._compute(cache, threshold))
+                cache.results[params] = cached
+            result = cached[1]
+
+        if entity_name is not None:
+            return {entity_name: result[entity_name]} if entity_name in result else {}
+        return result
+
+    def _refresh(self, cache: _WindowCache, scope: str, window_start: datetime):
+        since = window_start
+        if cache.last_time is not None:
+            since = max(since, datetime.utcfromtimestamp(cache.last_time - REFRESH_OVERLAP_SECONDS))
+        rows = _load_rows(scope, since)
+        changed = False
+        if rows:
+            grouped: Dict[tuple, list] = {}
+            read: Dict[int, float] = {}
+            for row_id, timestamp, entity, metric, value in rows:
+                if row_id in cache.recent_ids:
+                    continue
+                epoch = _epoch(timestamp)
+                read[row_id] = epoch
+                if value is None:
+                    continue
+                grouped.setdefault((entity, metric), []).append((row_id, epoch, float(value)))
+            # every row read moves the watermark, with or without a value
+            cache.recent_ids.update(read)
+            if read:
+                cache.last_time = max(max(read.values()), cache.last_time or 0.0)
+                horizon = cache.last_time - REFRESH_OVERLAP_SECONDS
+                cache.recent_ids = {row_id: epoch for row_id, epoch in cache.recent_ids.items() if epoch >= horizon}
+            for key, samples in grouped.items():
+                samples.sort(key=lambda sample: (sample[1], sample[0]))
+                arr = np.array(samples)
+                cache.series.setdefault(key, _Series()).extend(
+                    arr[:, 0].astype(np.int64), arr[:, 1], arr[:, 2], self.alpha
+                )
+            changed = bool(grouped)
+
+        since = _epoch(window_start)
+        for key in list(cache.series):
+            series = cache.series[key]
+            if series.trim(since):
+                changed = True
+            if len(series.values) == 0:
+                del cache.series[key]
+
+        if changed:
+            cache.version += 1
+            cache.results.clear()
+
+    def _compute(self, cache: _WindowCache, threshold: float) -> Dict:
+        result: Dict[str, Dict] = {}
+        for (entity, metric), series in cache.series.items():
+            values = series.values
+            trend = linear_trend(series.times, values)
+            slope = trend["slope_per_hour"]
+            zscores = rolling_zscores(values, self.zscore_window)
+            anomalous = np.nonzero(np.abs(zscores) >= self.zscore_threshold)[0]
+            eta_hours = hours_to_threshold(trend["fitted_latest"], slope, threshold)
+
+            if abs(slope) < self.trend_threshold:
+                direction = "stable"
+            else:
+                direction = "increasing" if slope > 0 else "decreasing"
+
+            result.setdefault(entity, {})[metric] = {
+                "latest": float(values[-1]),
+                "latest_at": _iso(series.times[-1]),
+                "points": int(len(values)),
+                "trend": direction,
+                "slope_per_hour": slope,
+                "r_squared": trend["r_squared"],
+                "ewma": series.ewma,
+                "anomalies": [
+                    {
+                        "id": int(series.ids[i]),
+                        "timestamp": _iso(series.times[i]),
+                        "value": float(values[i]),
+                        "zscore": float(zscores[i])
+                    }
+                    for i in anomalous
+                ],
+                "forecast": {
+                    "threshold": threshold,
+                    "hours_to_threshold": eta_hours,
+                    "threshold_eta": _iso(series.times[-1] + eta_hours * 3600) if eta_hours is not None else None
+                },
+                "history": [
+                    {"id": int(series.ids[i]), "timestamp": _iso(series.times[i]), "value": float(values[i])}
+                    for i in range(len(values) - 1, max(len(values) - 11, -1), -1)
+                ]
+            }
+        return result
+
+def _load_rows(scope: str, since: datetime):
+    """
+    Read (id, timestamp, entity, metric, value) rows timestamped from `since` on
+    """
+    with read_session_scope() as db:
+        if scope == "system":
+            rows = db.query(
+                SystemMetrics.id, SystemMetrics.timestamp, SystemMetrics.metric_type, SystemMetrics.value
+            ).filter(SystemMetrics.timestamp >= since).all()
+            return [(row_id, ts, "system", metric, value) for row_id, ts, metric, value in rows]
+
+        if scope == "cluster":
+            rows = db.query(
+                Cluster.id, Cluster.created_at, Cluster.name,
+                Cluster.cpu_used_mhz, Cluster.cpu_total_mhz,
+                Cluster.memory_used_gb, Cluster.memory_total_gb,
+                Cluster.storage_free_gb, Cluster.storage_total_gb
+            ).filter(Cluster.created_at >= since).all()
+            return [
+                sample
+                for row_id, ts, name, cpu_used, cpu_total, mem_used, mem_total, free, total in rows
+                for sample in (
+                    (row_id, ts, name, "cpu_usage", _percent(cpu_used, cpu_total)),
+                    (row_id, ts, name, "memory_usage", _percent(mem_used, mem_total)),
+                    (row_id, ts, name, "storage_usage", _percent(_used(total, free), total)),
+                )
+            ]
+
+        if scope == "host":
+            rows = db.query(
+                Host.id, Host.created_at, Host.name,
+                Host.cpu_used_mhz, Host.cpu_total_mhz,
+                Host.memory_used_gb, Host.memory_total_gb
+            ).filter(Host.created_at >= since).all()
+            return [
+                sample
+                for row_id, ts, name, cpu_used, cpu_total, mem_used, mem_total in rows
+                for sample in (
+                    (row_id, ts, name, "cpu_usage", _percent(cpu_used, cpu_total)),
+                    (row_id, ts, name, "memory_usage", _percent(mem_used, mem_total)),
+                )
+            ]
+
+        rows = db.query(
+            Datastore.id, Datastore.created_at, Datastore.name, Datastore.free_space_gb, Datastore.capacity_gb
+        ).filter(Datastore.created_at >= since).all()
+        return [
+            (row_id, ts, name, "storage_usage", _percent(_used(capacity, free), capacity))
+            for row_id, ts, name, free, capacity in rows
+        ]
+
+def _used(total, free):
+    if total is None or free is None:
+        return None
+    return float(total) - float(free)
+
+def _percent(used, total):
+    if used is None or not total:
+        return None
+    return float(used) / float(total) * 100
+
+def _epoch(timestamp: datetime) -> float:
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(float(epoch), tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+metric_analytics = MetricAnalytics(
+    alpha=settings.ANALYTICS_EWMA_ALPHA,
+    zscore_window=settings.ANALYTICS_ZSCORE_WINDOW,
+    zscore_threshold=settings.ANALYTICS_ZSCORE_THRESHOLD,
+    trend_threshold=settings.ANALYTICS_TREND_THRESHOLD
+)
@@ -0,0 +1,163 @@
+"""
+Datastore Capacity Forecasting Service
+Projects when datastores fill up from their stored free-space history
+"""
+
+from datetime import datetime, timedelta, timezone
+from statistics import NormalDist
+from typing import Dict, List
+
+import numpy as np
+
+from app.database import read_session_scope, Datastore
+
+# Growth below this (GB/day) is treated as flat rather than projected years out
+MIN_GROWTH_GB_PER_DAY = 1e-6
+
+def forecast_datastores(threshold_percent: float = 90.0, history_days: int = 30, confidence: float = 0.95) -> List[Dict]:
+    """
+    Forecast days until full and days until `threshold_percent` used for every datastore
+
+    The free-space trend of all datastores is fitted in one batch: samples are
+    laid out in a NaN-padded matrix (one row per datastore) and the least-squares
+    sums are taken along each row at once.
+
+    Args:
+        threshold_percent: Usage percent to project towards (e.g. 90)
+        history_days: How many days of stored snapshots to fit
+        confidence: Two-sided confidence level for the bounds (e.g. 0.95)
+
+    Returns:
+        list: One forecast per datastore, most urgent first
+
+    Raises:
+        ValueError: If a parameter is out of range
+    """
+    if not 0 < threshold_percent <= 100:
+        raise ValueError("threshold_percent must be between 0 and 100")
+    if history_days <= 0:
+        raise ValueError("history_days must be positive")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+
+    now = datetime.utcnow()
+    names, times, free, capacity = _load_history(now - timedelta(days=history_days), now)
+    if not names:
+        return []
+
+    mask = ~np.isnan(free)
+    n = mask.sum(axis=1)
+    t = np.where(mask, times, 0.0)
+    f = np.where(mask, free, 0.0)
+
+    sum_t = t.sum(axis=1)
+    sum_f = f.sum(axis=1)
+    sxx = (t * t).sum(axis=1) - sum_t * sum_t / n
+    sxy = (t * f).sum(axis=1) - sum_t * sum_f / n
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(sxx > 0, sxy / sxx, 0.0)  # GB of free space per day
+        intercept = (sum_f - slope * sum_t) / n  # fitted free space now (t == 0)
+        residuals = np.where(mask, free - (intercept[:, None] + slope[:, None] * times), 0.0)
+        dof = n - 2
+        sigma2 = np.where(dof > 0, (residuals * residuals).sum(axis=1) / dof, np.nan)
+        slope_se = np.where(sxx > 0, np.sqrt(sigma2 / sxx), np.nan)
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    growth = -slope  # GB consumed per day
+    growth_high = growth + z * slope_se
+    growth_low = growth - z * slope_se
+    fitted_free = np.clip(intercept, 0.0, capacity)
+    threshold_free = capacity * (1 - threshold_percent / 100.0)
+
+    forecasts = []
+    for i, name in enumerate(names):
+        latest_free = float(free[i][mask[i]][-1])
+        forecasts.append({
+            "name": name,
+            "capacity_gb": float(capacity[i]),
+            "free_space_gb": latest_free,
+            "usage_percent": _usage_percent(latest_free, capacity[i]),
+            "samples": int(n[i]),
+            "growth_gb_per_day": float(growth[i]),
+            "growth_gb_per_day_bounds": _bounds(growth_low[i], growth_high[i]),
+            "days_until_full": _days_until(fitted_free[i], 0.0, growth[i]),
+            "days_until_full_bounds": {
+                "earliest": _days_until(fitted_free[i], 0.0, growth_high[i]),
+                "latest": _days_until(fitted_free[i], 0.0, growth_low[i]),
+            },
+            "threshold_percent": threshold_percent,
+            "days_until_threshold": _days_until(fitted_free[i], threshold_free[i], growth[i]),
+            "days_until_threshold_bounds": {
+                "earliest": _days_until(fitted_free[i], threshold_free[i], growth_high[i]),
+                "latest": _days_until(fitted_free[i], threshold_free[i], growth_low[i]),
+            },
+        })
+
+    forecasts.sort(key=_urgency)
+    return forecasts
+
+def _load_history(since: datetime, now: datetime):
+    """
+    Load free-space history as a NaN-padded (datastore x sample) matrix
+
+    Returns:
+        tuple: (names, times in days relative to now, free GB, latest capacity GB)
+    """
+    with read_session_scope() as db:
+        rows = db.query(
+            Datastore.name, Datastore.created_at, Datastore.free_space_gb, Datastore.capacity_gb
+        ).filter(
+            Datastore.created_at >= since,
+            Datastore.free_space_gb.isnot(None),
+            Datastore.capacity_gb.isnot(None)
+        ).order_by(Datastore.name, Datastore.created_at).all()
+
+    series: Dict[str, list] = {}
+    for name, created_at, free_gb, capacity_gb in rows:
+        series.setdefault(name, []).append((created_at, float(free_gb), float(capacity_gb)))
+
+    names = list(series)
+    if not names:
+        return names, None, None, None
+    width = max(len(samples) for samples in series.values())
+    times = np.full((len(names), width), np.nan)
+    free = np.full((len(names), width), np.nan)
+    capacity = np.zeros(len(names))
+    now_epoch = _epoch(now)
+    for i, name in enumerate(names):
+        samples = series[name]
+        times[i, :len(samples)] = [(_epoch(ts) - now_epoch) / 86400.0 for ts, _, _ in samples]
+        free[i, :len(samples)] = [free_gb for _, free_gb, _ in samples]
+        capacity[i] = samples[-1][2]
+    return names, times, free, capacity
+
+def _days_until(current_free: float, target_free: float, growth_per_day: float):
+    if current_free <= target_free:
+        return 0.0
+    if not np.isfinite(growth_per_day) or growth_per_day <= MIN_GROWTH_GB_PER_DAY:
+        return None
+    return float((current_free - target_free) / growth_per_day)
+
+def _bounds(low: float, high: float):
+    if not (np.isfinite(low) and np.isfinite(high)):
+        return None
+    return {"low": float(low), "high": float(high)}
+
+def _usage_percent(free_gb: float, capacity_gb: float):
+    if not capacity_gb:
+        return None
+    return float((capacity_gb - free_gb) / capacity_gb * 100)
+
+def _urgency(forecast: Dict):
+    threshold_days = forecast["days_until_threshold"]
+    full_days = forecast["days_until_full"]
+    return (
+        threshold_days is None,
+        threshold_days if threshold_days is not None else 0.0,
+        full_days if full_days is not None else float("inf"),
+        forecast["name"],
+    )
+
+def _epoch(timestamp: datetime) -> float:
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,246 @@
+"""
+VNI CIDR Index
+In-memory index of the subnets claimed by VNI workorders for overlap, containment and gateway checks
+"""
+
+import bisect
+import ipaddress
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.database import read_session_scope
+from models.vni_workorder import VNIWorkOrder
+
+logger = logging.getLogger(__name__)
+
+# VNI workorders in these statuses no longer claim their subnet
+RELEASED_STATUSES = ("rejected",)
+
+def parse_cidr(cidr: str):
+    """
+    Parse a CIDR string into an ipaddress network
+
+    Host bits are tolerated (10.0.0.5/24 is read as 10.0.0.0/24).
+
+    Raises:
+        ValueError: If the CIDR is malformed
+    """
+    if not cidr or "/" not in cidr:
+        raise ValueError("Invalid CIDR format. Expected format: x.x.x.x/y")
+    return ipaddress.ip_network(cidr.strip(), strict=False)
+
+def _network(version: int, start: int, prefix: int):
+    network_class = ipaddress.IPv4Network if version == 4 else ipaddress.IPv6Network
+    return network_class((start, prefix))
+
+def check_addresses(network, gateway: Optional[str] = None, first_ip: Optional[str] = None,
+                    last_ip: Optional[str] = None) -> List[str]:
+    """
+    Check that the gateway and the first/last usable addresses lie inside a subnet
+
+    Returns:
+        list: Error messages, empty when everything is inside
+    """
+    errors = []
+    hosts_only = network.prefixlen < network.max_prefixlen - 1  # /31 and /32 have no network/broadcast address
+    addresses = {}
+    for field, value in (("gateway", gateway), ("first_ip", first_ip), ("last_ip", last_ip)):
+        if not value:
+            continue
+        try:
+            address = ipaddress.ip_address(value.strip())
+        except ValueError:
+            errors.append(f"Invalid {field} address: {value}")
+            continue
+        if address.version != network.version or address not in network:
+            errors.append(f"{field} {value} is outside {network}")
+        elif hosts_only and address in (network.network_address, network.broadcast_address):
+            errors.append(f"{field} {value} is the network or broadcast address of {network}")
+        else:
+            addresses[field] = address
+    if "first_ip" in addresses and "last_ip" in addresses and addresses["first_ip"] > addresses["last_ip"]:
+        errors.append(f"first_ip {first_ip} is after last_ip {last_ip}")
+    return errors
+
+class CidrIndex:
+    """
+    Subnets of VNI workorders keyed for O(log n) overlap queries
+
+    Two CIDR blocks are either disjoint or one contains the other, so a
+    new block overlaps an existing one only if that block is one of its
+    supernets or lies inside it. Supernets are found by hashing the new
+    block's network at each prefix length present in the index (at most 33
+    for IPv4); blocks inside it are a contiguous run of a list sorted by
+    start address, found with bisect.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()  # held across check-and-commit so two requests cannot claim one subnet
+        self._loaded = False
+        self._by_network: Dict[tuple, set] = {}  # (version, network int, prefix) -> VNI workorder ids
+        self._prefixes: Dict[int, Counter] = {4: Counter(), 6: Counter()}  # version -> prefix length counts
+        self._starts: Dict[int, list] = {4: [], 6: []}  # version -> sorted (start, prefix, end, id)
+        self._entries: Dict[int, tuple] = {}  # id -> (version, start, prefix, end)
+
+    def rebuild(self):
+        """Reload the index from the vni_workorders table"""
+        with read_session_scope() as db:
+            rows = db.query(VNIWorkOrder.id, VNIWorkOrder.cidr, VNIWorkOrder.status).all()
+        with self.lock:
+            self._by_network.clear()
+            self._entries.clear()
+            for version in (4, 6):
+                self._prefixes[version].clear()
+                self._starts[version] = []
+            for vni_id, cidr, status in rows:
+                self._add(vni_id, cidr, status, sort=False)
+            for version in (4, 6):
+                self._starts[version].sort()
+            self._loaded = True
+        logger.info(f"CIDR index built from {len(rows)} VNI workorders ({len(self._entries)} claiming a subnet)")
+
+    def sync(self, vni_id: int, cidr: Optional[str], status: Optional[str]):
+        """Record the current CIDR and status of a VNI workorder (after insert or update)"""
+        with self.lock:
+            self._ensure_loaded()
+            self.remove(vni_id)
+            self._add(vni_id, cidr, status)
+
+    def remove(self, vni_id: int):
+        """Forget a VNI workorder (after delete)"""
+        with self.lock:
+            entry = self._entries.pop(vni_id, None)
+            if entry is None:
+                return
+            version, start, prefix, end = entry
+            key = (version, start, prefix)
+            ids = self._by_network.get(key)
+            if ids is not None:
+                ids.discard(vni_id)
+                if not ids:
+                    del self._by_network[key]
+            self._prefixes[version][prefix] -= 1
+            if self._prefixes[version][prefix] <= 0:
+                del self._prefixes[version][prefix]
+            starts = self._starts[version]
+            position = bisect.bisect_left(starts, (start, prefix, end, vni_id))
+            if position < len(starts) and starts[position][3] == vni_id:
+                del starts[position]
+
+    def conflicts(self, network, exclude_id: Optional[int] = None) -> List[Dict]:
+        """
+        Find the indexed subnets that overlap a network
+
+        Returns:
+            list: Dicts with vni_workorder_id, cidr and relation ('same', 'contains' or 'inside')
+        """
+        with self.lock:
+            self._ensure_loaded()
+            version = network.version
+            start = int(network.network_address)
+            end = int(network.broadcast_address)
+            found = []
+            for prefix in self._prefixes[version]:
+                if prefix > network.prefixlen:
+                    continue
+                supernet = network.supernet(new_prefix=prefix) if prefix < network.prefixlen else network
+                for vni_id in self._by_network.get((version, int(supernet.network_address), prefix), ()):
+                    if vni_id != exclude_id:
+                        relation = "same" if prefix == network.prefixlen else "contains"
+                        found.append({"vni_workorder_id": vni_id, "cidr": str(supernet), "relation": relation})
+            starts = self._starts[version]
+            position = bisect.bisect_left(starts, (start, network.prefixlen + 1))
+            while position < len(starts) and starts[position][0] <= end:
+                entry_start, prefix, _, vni_id = starts[position]
+                if vni_id != exclude_id:
+                    found.append({
+                        "vni_workorder_id": vni_id,
+                        "cidr": str(_network(version, entry_start, prefix)),
+                        "relation": "inside"
+                    })
+                position += 1
+            return sorted(found, key=lambda conflict: conflict["vni_workorder_id"])
+
+    def containing(self, address) -> List[Dict]:
+        """
+        Find the indexed subnets that hold an IP address, most specific first
+
+        Only supernets can hold an address, so this is one hash lookup per
+        prefix length in use.
+
+        Returns:
+            list: Dicts with vni_workorder_id and cidr
+        """
+        with self.lock:
+            self._ensure_loaded()
+            version = address.version
+            found = []
+            for prefix in sorted(self._prefixes[version], reverse=True):
+                supernet = ipaddress.ip_network((address, prefix), strict=False)
+                for vni_id in sorted(self._by_network.get((version, int(supernet.network_address), prefix), ())):
+                    found.append({"vni_workorder_id": vni_id, "cidr": str(supernet)})
+            return found
+
+    def audit(self) -> List[Dict]:
+        """
+        List every pair of overlapping VNI subnets in one sweep over the sorted starts
+
+        Returns:
+            list: Dicts with the outer and inner VNI workorder ids and CIDRs
+        """
+        with self.lock:
+            self._ensure_loaded()
+            overlaps = []
+            for version in (4, 6):
+                open_blocks: List[tuple] = []  # enclosing blocks still open at the current start
+                for start, prefix, end, vni_id in self._starts[version]:
+                    while open_blocks and open_blocks[-1][2] < start:
+                        open_blocks.pop()
+                    for outer_start, outer_prefix, _, outer_id in open_blocks:
+                        overlaps.append({
+                            "vni_workorder_id": outer_id,
+                            "cidr": str(_network(version, outer_start, outer_prefix)),
+                            "overlapping_vni_workorder_id": vni_id,
+                            "overlapping_cidr": str(_network(version, start, prefix)),
+                        })
+                    open_blocks.append((start, prefix, end, vni_id))
+            return overlaps
+
+    def size(self) -> int:
+        with self.lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def _add(self, vni_id: int, cidr: Optional[str], status: Optional[str], sort: bool = True):
+        if status in RELEASED_STATUSES:
+            return
+        try:
+            network = parse_cidr(cidr)
+        except ValueError:
+            return  # malformed rows are reported by the audit endpoint, not indexed
+        version = network.version
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        self._entries[vni_id] = (version, start, network.prefixlen, end)
+        self._by_network.setdefault((version, start, network.prefixlen), set()).add(vni_id)
+        self._prefixes[version][network.prefixlen] += 1
+        if sort:
+            bisect.insort(self._starts[version], (start, network.prefixlen, end, vni_id))
+        else:
+            self._starts[version].append((start, network.prefixlen, end, vni_id))
+
+def describe_conflicts(conflicts: List[Dict]) -> List[str]:
+    """Human readable messages for the result of CidrIndex.conflicts"""
+    wording = {"same": "is the same subnet as", "contains": "lies inside", "inside": "contains"}
+    return [
+        f"CIDR {wording[conflict['relation']]} {conflict['cidr']} of VNI workorder {conflict['vni_workorder_id']}"
+        for conflict in conflicts
+    ]
+
+cidr_index = CidrIndex()
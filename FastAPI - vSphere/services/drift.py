@@ -0,0 +1,282 @@
+"""
+Workorder Drift Reconciliation Service
+Compares executed workorders and their Terraform state against the live vCenter VM inventory
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.database import read_session_scope
+from app.metrics import metrics
+from models.workorder import WorkOrder
+from services.terraform_runner import list_workspaces
+from services.vsphere.vm_info import get_vm_inventory
+
+logger = logging.getLogger(__name__)
+
+DRIFT_KINDS = ("missing", "drifted", "orphaned")
+
+_WORKORDER_KEY = re.compile(r"workorder-(\d+)")
+
+metrics.describe("workorder_drift", "Workorders found missing, drifted or orphaned by the last reconciliation")
+
+def parse_state(path: str, workspace_name: str) -> List[Dict]:
+    """
+    Read the vsphere_virtual_machine instances recorded in a terraform.tfstate
+
+    The workorder of an instance comes from its module key in a grouped
+    workspace (module.vm["workorder-12"]) or from the workspace name.
+
+    Returns:
+        list: One dict per VM with workorder_id, workspace, name, uuid, moid, num_cpus, memory_mb, disk_gb
+    """
+    with open(path) as state_file:
+        state = json.load(state_file)
+    default = _WORKORDER_KEY.fullmatch(workspace_name)
+    entries = []
+    for resource in state.get("resources") or []:
+        if resource.get("type") != "vsphere_virtual_machine" or resource.get("mode") != "managed":
+            continue
+        module_key = _WORKORDER_KEY.search(resource.get("module", ""))
+        for instance in resource.get("instances") or []:
+            attributes = instance.get("attributes") or {}
+            match = module_key or _WORKORDER_KEY.search(str(instance.get("index_key", ""))) or default
+            entries.append({
+                "workorder_id": int(match.group(1)) if match else None,
+                "workspace": workspace_name,
+                "name": attributes.get("name"),
+                "uuid": attributes.get("uuid"),
+                "moid": attributes.get("moid"),
+                "num_cpus": attributes.get("num_cpus"),
+                "memory_mb": attributes.get("memory"),
+                "disk_gb": sum(disk.get("size") or 0 for disk in attributes.get("disk") or []),
+            })
+    return entries
+
+class StateCache:
+    """Parsed workspace states, re-read only when a state file's mtime or size changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}  # path -> (mtime_ns, size, entries)
+
+    def load(self) -> List[Dict]:
+        """
+        Return the VM entries of every workspace state
+
+        Returns:
+            list: Entries as produced by parse_state, across all workspaces
+        """
+        seen = set()
+        entries: List[Dict] = []
+        with self._lock:
+            for name in list_workspaces():
+                path = os.path.join(settings.TERRAFORM_WORKSPACES_DIR, name, "terraform.tfstate")
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                seen.add(path)
+                cached = self._entries.get(path)
+                if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+                    try:
+                        cached = (stat.st_mtime_ns, stat.st_size, parse_state(path, name))
+                    except Exception as e:
+                        logger.warning(f"Failed to parse Terraform state {path}: {str(e)}")
+                        continue
+                    self._entries[path] = cached
+                entries.extend(cached[2])
+            for path in set(self._entries) - seen:
+                del self._entries[path]
+        return entries
+
+class DriftReconciler:
+    """Periodic reconciliation of provisioned workorders against vCenter, keeping the last report"""
+
+    def __init__(self, interval: int, disk_tolerance_gb: float):
+        """
+        Initialize the reconciler
+
+        Args:
+            interval: Seconds between background reconciliations (0 disables the loop)
+            disk_tolerance_gb: Disk size difference still reported as in sync
+        """
+        self.interval = interval
+        self.disk_tolerance_gb = disk_tolerance_gb
+        self.states = StateCache()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last: Optional[Dict] = None
+        metrics.register_collector(self._collect_metrics)
+
+    def start(self):
+        """Start the background loop if an interval is configured"""
+        if self._thread or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="workorder-drift", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def report(self, refresh: bool = False) -> Dict:
+        """
+        Get the last reconciliation report, running one first if asked or if none exists yet
+
+        Raises:
+            Exception: If the live inventory cannot be read
+        """
+        if refresh or self._last is None:
+            return self.reconcile()
+        return self._last
+
+    def reconcile(self) -> Dict:
+        """
+        Join state entries, executed workorders and live VMs through hash maps
+
+        A workorder's VM is looked up by the UUID in its state, then by the
+        managed object ID (state or the workorder's vm_id from a native clone),
+        then by name, so the whole pass is linear in the number of VMs.
+
+        Returns:
+            dict: checked_at, duration_ms, summary counts and the missing, drifted and orphaned items
+
+        Raises:
+            Exception: If the live inventory cannot be read
+        """
+        with self._run_lock:
+            started = time.perf_counter()
+            live = get_vm_inventory()
+            by_uuid = {vm["uuid"]: vm for vm in live if vm["uuid"]}
+            by_moid = {vm["moid"]: vm for vm in live}
+            by_name: Dict[str, Dict] = {}
+            for vm in live:
+                by_name.setdefault(vm["name"], vm)
+
+            state_by_workorder: Dict[int, Dict] = {}
+            unowned: List[Dict] = []
+            for entry in self.states.load():
+                if entry["workorder_id"] is None:
+                    unowned.append(entry)
+                else:
+                    state_by_workorder[entry["workorder_id"]] = entry
+
+            with read_session_scope() as db:
+                executed = {
+                    row.id: row for row in db.query(
+                        WorkOrder.id, WorkOrder.name, WorkOrder.cpu, WorkOrder.ram, WorkOrder.disk, WorkOrder.vm_id
+                    ).filter(WorkOrder.status == "executed")
+                }
+                stray_ids = [workorder_id for workorder_id in state_by_workorder if workorder_id not in executed]
+                stray_status = {}
+                for i in range(0, len(stray_ids), 1000):
+                    stray_status.update(db.query(WorkOrder.id, WorkOrder.status).filter(
+                        WorkOrder.id.in_(stray_ids[i:i + 1000])
+                    ).all())
+
+            missing, drifted, orphaned = [], [], []
+            in_sync = 0
+            for workorder_id, order in executed.items():
+                entry = state_by_workorder.get(workorder_id) or {}
+                vm = (
+                    by_uuid.get(entry.get("uuid"))
+                    or by_moid.get(entry.get("moid") or order.vm_id)
+                    or by_name.get(entry.get("name") or order.name)
+                )
+                item = {
+                    "workorder_id": workorder_id,
+                    "name": order.name,
+                    "workspace": entry.get("workspace"),
+                    "uuid": entry.get("uuid") or (vm and vm["uuid"]),
+                }
+                if vm is None:
+                    missing.append(item)
+                    continue
+                differences = self._differences(order, vm)
+                if differences:
+                    drifted.append({**item, "moid": vm["moid"], "power_state": vm["power_state"],
+                                    "differences": differences})
+                else:
+                    in_sync += 1
+
+            for workorder_id, entry in state_by_workorder.items():
+                if workorder_id not in executed:
+                    orphaned.append(self._orphan(entry, by_uuid, by_moid, stray_status.get(workorder_id)))
+            for entry in unowned:
+                orphaned.append(self._orphan(entry, by_uuid, by_moid, None))
+
+            self._last = {
+                "checked_at": datetime.utcnow().isoformat(),
+                "duration_ms": (time.perf_counter() - started) * 1000,
+                "summary": {
+                    "executed": len(executed),
+                    "live_vms": len(live),
+                    "in_sync": in_sync,
+                    "missing": len(missing),
+                    "drifted": len(drifted),
+                    "orphaned": len(orphaned),
+                },
+                "missing": missing,
+                "drifted": drifted,
+                "orphaned": orphaned,
+            }
+            return self._last
+
+    def _differences(self, order, vm: Dict) -> Dict:
+        differences = {}
+        if vm["name"] != order.name:
+            differences["name"] = {"expected": order.name, "actual": vm["name"]}
+        if vm["num_cpu"] is not None and vm["num_cpu"] != order.cpu:
+            differences["cpu"] = {"expected": order.cpu, "actual": vm["num_cpu"]}
+        if vm["memory_mb"] is not None and vm["memory_mb"] != order.ram * 1024:
+            differences["ram"] = {"expected": order.ram, "actual": vm["memory_mb"] / 1024}
+        if order.disk and abs(vm["disk_gb"] - order.disk) > self.disk_tolerance_gb:
+            differences["disk"] = {"expected": order.disk, "actual": round(vm["disk_gb"], 2)}
+        return differences
+
+    def _orphan(self, entry: Dict, by_uuid: Dict, by_moid: Dict, workorder_status: Optional[str]) -> Dict:
+        vm = by_uuid.get(entry["uuid"]) or by_moid.get(entry["moid"])
+        if entry["workorder_id"] is None:
+            reason = "No workorder key in state"
+        elif workorder_status is None:
+            reason = "WorkOrder deleted"
+        else:
+            reason = f"WorkOrder status is '{workorder_status}'"
+        return {
+            "workorder_id": entry["workorder_id"],
+            "name": entry["name"],
+            "workspace": entry["workspace"],
+            "uuid": entry["uuid"],
+            "live": vm is not None,
+            "reason": reason,
+        }
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Workorder drift reconciliation failed: {str(e)}")
+
+    def _collect_metrics(self, registry):
+        if self._last is None:
+            return
+        for kind in DRIFT_KINDS:
+            registry.set_gauge("workorder_drift", self._last["summary"][kind], labels={"kind": kind})
+
+drift_reconciler = DriftReconciler(
+    interval=settings.DRIFT_RECONCILE_INTERVAL,
+    disk_tolerance_gb=settings.DRIFT_DISK_TOLERANCE_GB
+)
@@ -1,144 +1,29 @@
 import json
 from datetime import datetime
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from app.database import Cluster, Host, Datastore, VM, MonitoringData, SystemMetrics, get_db
+from app.database import Cluster, Host, Datastore, VM, MonitoringData, SystemMetrics, session_scope, read_session_scope
 from services.vsphere.cluster_info import get_clusters_info
 from services.vsphere.host_info import get_hosts_info
 from services.vsphere.datastore_info import get_datastores_info
 from services.vsphere.vm_info import get_vms_info
 from utils.safe_math import safe_div
+from utils.pagination import apply_keyset
 
 def store_monitoring_data():
     """
-    Store current monitoring data in the PostgreSQL database
+    Store a full snapshot (inventory and system metrics) in the PostgreSQL database
     """
     try:
-        # Get database session
-        db = next(get_db())
-        
-        # Get all monitoring data
+        # Get all monitoring data before taking a connection from the pool
         clusters_data = get_clusters_info()
         hosts_data = get_hosts_info()
         datastores_data = get_datastores_info()
         vms_data = get_vms_info()
         
-        # Store clusters
-        cluster_map = {}  # To map cluster names to IDs
-        for cluster_data in clusters_data:
-            cluster = Cluster(
-                name=cluster_data['name'],
-                num_hosts=cluster_data['num_hosts'],
-                num_vms=cluster_data['num_vms'],
-                vms_running=cluster_data['vms_running'],
-                vms_stopped=cluster_data['vms_stopped'],
-                cpu_total_mhz=int(cluster_data['cpu_total_mhz']),
-                cpu_used_mhz=int(cluster_data['cpu_used_mhz']),
-                memory_total_gb=float(cluster_data['memory_total_gb']),
-                memory_used_gb=float(cluster_data['memory_used_gb']),
-                storage_total_gb=float(cluster_data['total_storage_gb']),
-                storage_free_gb=float(cluster_data['free_storage_gb']),
-                overall_status=cluster_data['overall_status']
-            )
-            db.add(cluster)
-            db.flush()  # Get the ID
-            cluster_map[cluster_data['name']] = cluster.id
-        
-        # Store hosts
-        for host_data in hosts_data:
-            host = Host(
-                name=host_data['name'],
-                ip_address=host_data.get('management_ip', 'N/A'),
-                cluster_id=cluster_map.get(host_data['cluster']),
-                cpu_model=host_data['cpu_model'],
-                cpu_cores=host_data['cpu_cores'],
-                cpu_total_mhz=int(host_data['cpu_total_mhz']),
-                cpu_used_mhz=int(host_data['cpu_used_mhz']),
-                memory_total_gb=float(host_data['memory_total_gb']),
-                memory_used_gb=float(host_data['memory_used_gb']),
-                power_state=host_data['power_state'],
-                connection_state=host_data['connection_state']
-            )
-            db.add(host)
-        
-        # Store datastores
-        for datastore_data in datastores_data:
-            # Find which cluster this datastore belongs to
-            cluster_id = None
-            for cluster_data in clusters_data:
-                for ds in cluster_data.get('datastores', []):
-                    if ds['name'] == datastore_data['name']:
-                        cluster_id = cluster_map.get(cluster_data['name'])
-                        break
-                if cluster_id:
-                    break
-            
-            datastore = Datastore(
-                name=datastore_data['name'],
-                cluster_id=cluster_id,
-                capacity_gb=float(datastore_data['capacity_gb']),
-                free_space_gb=float(datastore_data['free_space_gb']),
-                accessible=datastore_data['accessible']
-            )
-            db.add(datastore)
-        
-        # Store VMs
-        for vm_data in vms_data:
-            # Find which cluster this VM belongs to
-            cluster_id = None
-            for cluster_data in clusters_data:
-                if vm_data['name'] in [vm['name'] for vm in cluster_data.get('vms', [])]:
-                    cluster_id = cluster_map.get(cluster_data['name'])
-                    break
-            
-            vm = VM(
-                name=vm_data['name'],
-                host_name=vm_data.get('host_name', 'N/A'),
-                ip_address=', '.join(vm_data.get('ip_addresses', [])),
-                power_state=vm_data['power_state'],
-                cpu_count=vm_data['num_cpu'],
-                memory_mb=int(vm_data['memory_gb'] * 1024),  # Convert GB to MB
-                cluster_id=cluster_id
-            )
-            db.add(vm)
-        
-        # Calculate and store system metrics
-        total_cpu_mhz = sum(h['cpu_total_mhz'] for h in hosts_data)
-        used_cpu_mhz = sum(h['cpu_used_mhz'] for h in hosts_data)
-        total_memory_gb = sum(h['memory_total_gb'] for h in hosts_data)
-        used_memory_gb = sum(h['memory_used_gb'] for h in hosts_data)
-        total_storage_gb = sum(ds['capacity_gb'] for ds in datastores_data)
-        used_storage_gb = sum(ds['used_space_gb'] for ds in datastores_data)
-        
-        # CPU usage metric
-        cpu_metric = SystemMetrics(
-            metric_type='cpu_usage',
-            value=safe_div(used_cpu_mhz, total_cpu_mhz) * 100,
-            unit='percent',
-            description='Overall CPU usage across all hosts'
-        )
-        db.add(cpu_metric)
-        
-        # Memory usage metric
-        memory_metric = SystemMetrics(
-            metric_type='memory_usage',
-            value=safe_div(used_memory_gb, total_memory_gb) * 100,
-            unit='percent',
-            description='Overall memory usage across all hosts'
-        )
-        db.add(memory_metric)
-        
-        # Storage usage metric
-        storage_metric = SystemMetrics(
-            metric_type='storage_usage',
-            value=safe_div(used_storage_gb, total_storage_gb) * 100,
-            unit='percent',
-            description='Overall storage usage across all datastores'
-        )
-        db.add(storage_metric)
-        
-        # Commit all changes
-        db.commit()
-        db.close()
+        with session_scope() as db:
+            _insert_inventory(db, clusters_data, hosts_data, datastores_data, vms_data)
+            metrics_count = _insert_system_metrics(db, hosts_data, datastores_data)
         
         return {
             "status": "success",
@@ -149,17 +34,188 @@ def store_monitoring_data():
                 "hosts": len(hosts_data),
                 "datastores": len(datastores_data),
                 "vms": len(vms_data),
-                "metrics": 3
+                "metrics": metrics_count
             }
         }
         
     except Exception as e:
-        if 'db' in locals():
-            db.rollback()
-            db.close()
         raise Exception(f"Failed to store monitoring data: {str(e)}")
 
-def get_historical_data(data_type: str, entity_name: str = None, limit: int = 100):
+def store_inventory_data():
+    """
+    Store a snapshot of clusters, hosts, datastores and VMs without system metrics
+    """
+    try:
+        clusters_data = get_clusters_info()
+        hosts_data = get_hosts_info()
+        datastores_data = get_datastores_info()
+        vms_data = get_vms_info()
+        
+        with session_scope() as db:
+            _insert_inventory(db, clusters_data, hosts_data, datastores_data, vms_data)
+        
+        return {
+            "status": "success",
+            "message": "Inventory snapshot stored successfully in PostgreSQL",
+            "timestamp": datetime.utcnow().isoformat(),
+            "records_stored": {
+                "clusters": len(clusters_data),
+                "hosts": len(hosts_data),
+                "datastores": len(datastores_data),
+                "vms": len(vms_data)
+            }
+        }
+        
+    except Exception as e:
+        raise Exception(f"Failed to store inventory data: {str(e)}")
+
+def store_system_metrics():
+    """
+    Store only the system-wide CPU, memory and storage usage metrics
+    """
+    try:
+        hosts_data = get_hosts_info()
+        datastores_data = get_datastores_info()
+        
+        with session_scope() as db:
+            metrics_count = _insert_system_metrics(db, hosts_data, datastores_data)
+        
+        return {
+            "status": "success",
+            "message": "System metrics stored successfully in PostgreSQL",
+            "timestamp": datetime.utcnow().isoformat(),
+            "records_stored": {
+                "metrics": metrics_count
+            }
+        }
+        
+    except Exception as e:
+        raise Exception(f"Failed to store system metrics: {str(e)}")
+
+def _insert_inventory(db: Session, clusters_data, hosts_data, datastores_data, vms_data):
+    """
+    Bulk insert one inventory snapshot; each table is written with a single executemany
+    """
+    # Store clusters, getting their IDs back in parameter order
+    cluster_map = {}  # To map cluster names to IDs
+    if clusters_data:
+        cluster_ids = db.execute(
+            insert(Cluster).returning(Cluster.id, sort_by_parameter_order=True),
+            [
+                {
+                    "name": cluster_data['name'],
+                    "num_hosts": cluster_data['num_hosts'],
+                    "num_vms": cluster_data['num_vms'],
+                    "vms_running": cluster_data['vms_running'],
+                    "vms_stopped": cluster_data['vms_stopped'],
+                    "cpu_total_mhz": int(cluster_data['cpu_total_mhz']),
+                    "cpu_used_mhz": int(cluster_data['cpu_used_mhz']),
+                    "memory_total_gb": float(cluster_data['memory_total_gb']),
+                    "memory_used_gb": float(cluster_data['memory_used_gb']),
+                    "storage_total_gb": float(cluster_data['total_storage_gb']),
+                    "storage_free_gb": float(cluster_data['free_storage_gb']),
+                    "overall_status": cluster_data['overall_status']
+                }
+                for cluster_data in clusters_data
+            ]
+        ).scalars().all()
+        for cluster_data, cluster_id in zip(clusters_data, cluster_ids):
+            cluster_map.setdefault(cluster_data['name'], cluster_id)
+    
+    # Index datastore and VM membership once instead of rescanning every cluster per row
+    datastore_clusters = {}
+    vm_clusters = {}
+    for cluster_data in clusters_data:
+        for ds in cluster_data.get('datastores', []):
+            datastore_clusters.setdefault(ds['name'], cluster_map.get(cluster_data['name']))
+        for vm in cluster_data.get('vms', []):
+            vm_clusters.setdefault(vm['name'], cluster_map.get(cluster_data['name']))
+    
+    # Store hosts
+    if hosts_data:
+        db.execute(insert(Host), [
+            {
+                "name": host_data['name'],
+                "ip_address": host_data.get('management_ip', 'N/A'),
+                "cluster_id": cluster_map.get(host_data['cluster']),
+                "cpu_model": host_data['cpu_model'],
+                "cpu_cores": host_data['cpu_cores'],
+                "cpu_total_mhz": int(host_data['cpu_total_mhz']),
+                "cpu_used_mhz": int(host_data['cpu_used_mhz']),
+                "memory_total_gb": float(host_data['memory_total_gb']),
+                "memory_used_gb": float(host_data['memory_used_gb']),
+                "power_state": host_data['power_state'],
+                "connection_state": host_data['connection_state']
+            }
+            for host_data in hosts_data
+        ])
+    
+    # Store datastores
+    if datastores_data:
+        db.execute(insert(Datastore), [
+            {
+                "name": datastore_data['name'],
+                "cluster_id": datastore_clusters.get(datastore_data['name']),
+                "capacity_gb": float(datastore_data['capacity_gb']),
+                "free_space_gb": float(datastore_data['free_space_gb']),
+                "accessible": datastore_data['accessible']
+            }
+            for datastore_data in datastores_data
+        ])
+    
+    # Store VMs
+    if vms_data:
+        db.execute(insert(VM), [
+            {
+                "name": vm_data['name'],
+                "host_name": vm_data.get('host_name', 'N/A'),
+                "ip_address": ', '.join(vm_data.get('ip_addresses', [])),
+                "power_state": vm_data['power_state'],
+                "cpu_count": vm_data['num_cpu'],
+                "memory_mb": int(vm_data['memory_gb'] * 1024),  # Convert GB to MB
+                "cluster_id": vm_clusters.get(vm_data['name'])
+            }
+            for vm_data in vms_data
+        ])
+
+def _insert_system_metrics(db: Session, hosts_data, datastores_data):
+    """
+    Calculate and bulk insert the system-wide usage metrics
+    
+    Returns:
+        int: Number of metric rows written
+    """
+    total_cpu_mhz = sum(h['cpu_total_mhz'] for h in hosts_data)
+    used_cpu_mhz = sum(h['cpu_used_mhz'] for h in hosts_data)
+    total_memory_gb = sum(h['memory_total_gb'] for h in hosts_data)
+    used_memory_gb = sum(h['memory_used_gb'] for h in hosts_data)
+    total_storage_gb = sum(ds['capacity_gb'] for ds in datastores_data)
+    used_storage_gb = sum(ds['used_space_gb'] for ds in datastores_data)
+    
+    metrics = [
+        {
+            "metric_type": 'cpu_usage',
+            "value": safe_div(used_cpu_mhz, total_cpu_mhz) * 100,
+            "unit": 'percent',
+            "description": 'Overall CPU usage across all hosts'
+        },
+        {
+            "metric_type": 'memory_usage',
+            "value": safe_div(used_memory_gb, total_memory_gb) * 100,
+            "unit": 'percent',
+            "description": 'Overall memory usage across all hosts'
+        },
+        {
+            "metric_type": 'storage_usage',
+            "value": safe_div(used_storage_gb, total_storage_gb) * 100,
+            "unit": 'percent',
+            "description": 'Overall storage usage across all datastores'
+        }
+    ]
+    db.execute(insert(SystemMetrics), metrics)
+    return len(metrics)
+
+def get_historical_data(data_type: str, entity_name: str = None, limit: int = 100, cursor: str = None):
     """
     Retrieve historical monitoring data from database
     
@@ -167,85 +223,148 @@ def get_historical_data(data_type: str, entity_name: str = None, limit: int = 10
         data_type (str): Type of data to retrieve ('cluster', 'host', 'datastore', 'vm')
         entity_name (str): Optional specific entity name to filter by
         limit (int): Maximum number of records to return
+        cursor (str): Optional keyset cursor returned with the previous page
         
     Returns:
-        list: Historical data records
+        list: Historical data records, newest first
+        
+    Raises:
+        ValueError: If the cursor is malformed
     """
     try:
-        db = next(get_db())
-        
-        query = db.query(MonitoringData).filter(MonitoringData.data_type == data_type)
-        
-        if entity_name:
-            query = query.filter(MonitoringData.entity_name == entity_name)
-        
-        records = query.order_by(MonitoringData.timestamp.desc()).limit(limit).all()
-        
-        result = []
-        for record in records:
-            result.append({
-                "id": record.id,
-                "timestamp": record.timestamp.isoformat(),
-                "data_type": record.data_type,
-                "entity_name": record.entity_name,
-                "data": json.loads(record.data_json)
-            })
-        
-        db.close()
-        return result
+        with read_session_scope() as db:
+            query = db.query(
+                MonitoringData.id,
+                MonitoringData.timestamp,
+                MonitoringData.data_type,
+                MonitoringData.entity_name,
+                MonitoringData.data_json
+            ).filter(MonitoringData.data_type == data_type)
+            
+            if entity_name:
+                query = query.filter(MonitoringData.entity_name == entity_name)
+            
+            query = apply_keyset(query, MonitoringData.timestamp, MonitoringData.id, cursor)
+            return [_monitoring_row_to_dict(row) for row in query.limit(limit)]
         
+    except ValueError:
+        raise
     except Exception as e:
-        if 'db' in locals():
-            db.close()
         raise Exception(f"Failed to retrieve historical data: {str(e)}")
 
-def get_metrics_history(metric_type: str = None, limit: int = 100):
+def get_metrics_history(metric_type: str = None, limit: int = 100, cursor: str = None):
     """
     Retrieve historical system metrics from database
     
     Args:
         metric_type (str): Optional specific metric type to filter by
         limit (int): Maximum number of records to return
+        cursor (str): Optional keyset cursor returned with the previous page
         
     Returns:
-        list: Historical metrics records
+        list: Historical metrics records, newest first
+        
+    Raises:
+        ValueError: If the cursor is malformed
     """
     try:
-        db = next(get_db())
-        
-        query = db.query(SystemMetrics)
+        with read_session_scope() as db:
+            query = db.query(
+                SystemMetrics.id,
+                SystemMetrics.timestamp,
+                SystemMetrics.metric_type,
+                SystemMetrics.value,
+                SystemMetrics.unit,
+                SystemMetrics.description
+            )
+            
+            if metric_type:
+                query = query.filter(SystemMetrics.metric_type == metric_type)
+            
+            query = apply_keyset(query, SystemMetrics.timestamp, SystemMetrics.id, cursor)
+            return [_metric_row_to_dict(row) for row in query.limit(limit)]
         
-        if metric_type:
-            query = query.filter(SystemMetrics.metric_type == metric_type)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to retrieve metrics history: {str(e)}")
+
+def stream_historical_data(data_type: str, entity_name: str = None, batch_size: int = 1000):
+    """
+    Stream every historical monitoring record of a type, oldest first
+    
+    Rows are fetched through a server-side cursor in batches of `batch_size`,
+    so memory use stays flat regardless of how many rows are exported.
+    
+    Yields:
+        dict: One historical data record at a time
+    """
+    with read_session_scope() as db:
+        stmt = select(
+            MonitoringData.id,
+            MonitoringData.timestamp,
+            MonitoringData.data_type,
+            MonitoringData.entity_name,
+            MonitoringData.data_json
+        ).where(MonitoringData.data_type == data_type)
         
-        records = query.order_by(SystemMetrics.timestamp.desc()).limit(limit).all()
+        if entity_name:
+            stmt = stmt.where(MonitoringData.entity_name == entity_name)
         
-        result = []
-        for record in records:
-            result.append({
-                "id": record.id,
-                "timestamp": record.timestamp.isoformat(),
-                "metric_type": record.metric_type,
-                "value": record.value,
-                "unit": record.unit,
-                "description": record.description
-            })
+        stmt = stmt.order_by(MonitoringData.timestamp.asc(), MonitoringData.id.asc())
+        for row in db.execute(stmt.execution_options(yield_per=batch_size)):
+            yield _monitoring_row_to_dict(row)
+
+def stream_metrics_history(metric_type: str = None, batch_size: int = 1000):
+    """
+    Stream every historical system metric, oldest first, through a server-side cursor
+    
+    Yields:
+        dict: One metric record at a time
+    """
+    with read_session_scope() as db:
+        stmt = select(
+            SystemMetrics.id,
+            SystemMetrics.timestamp,
+            SystemMetrics.metric_type,
+            SystemMetrics.value,
+            SystemMetrics.unit,
+            SystemMetrics.description
+        )
         
-        db.close()
-        return result
+        if metric_type:
+            stmt = stmt.where(SystemMetrics.metric_type == metric_type)
         
-    except Exception as e:
-        if 'db' in locals():
-            db.close()
-        raise Exception(f"Failed to retrieve metrics history: {str(e)}")
+        stmt = stmt.order_by(SystemMetrics.timestamp.asc(), SystemMetrics.id.asc())
+        for row in db.execute(stmt.execution_options(yield_per=batch_size)):
+            yield _metric_row_to_dict(row)
+
+def _monitoring_row_to_dict(row):
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat(),
+        "data_type": row.data_type,
+        "entity_name": row.entity_name,
+        "data": json.loads(row.data_json)
+    }
+
+def _metric_row_to_dict(row):
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat(),
+        "metric_type": row.metric_type,
+        "value": row.value,
+        "unit": row.unit,
+        "description": row.description
+    }
 
 def get_clusters_from_db():
     """
     Get clusters from PostgreSQL database
     """
     try:
-        db = next(get_db())
-        clusters = db.query(Cluster).all()
+        with read_session_scope() as db:
+            clusters = db.query(Cluster).all()
         
         result = []
         for cluster in clusters:
@@ -266,10 +385,7 @@ def get_clusters_from_db():
                 "created_at": cluster.created_at.isoformat() if cluster.created_at else None
             })
         
-        db.close()
         return result
         
     except Exception as e:
-        if 'db' in locals():
-            db.close()
         raise Exception(f"Failed to retrieve clusters from database: {str(e)}")
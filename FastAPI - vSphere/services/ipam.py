@@ -0,0 +1,621 @@
+"""
+IP Address Management Service
+Persistent address pools with one allocation bitmap per pool
+"""
+
+import ipaddress
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from models.ip_pool import IPPool, IPAllocation
+from services.cidr_index import parse_cidr, check_addresses, RELEASED_STATUSES
+
+# owner_type of addresses held by hand (including a pool's gateway) rather than by a workorder
+RESERVED = "reserved"
+GATEWAY_NOTE = "gateway"
+
+_NOT_FULL = re.compile(rb"[^\xff]")
+
+class IPAMConflict(Exception):
+    """An address is already taken, a range overlaps another pool, or a pool has no room left"""
+
+class AddressBitmap:
+    """
+    Allocation bits of one pool, bit i standing for range_start + i
+
+    Bits past the end of the range are kept set so they are never handed out.
+    `hint` is the lowest offset that may be free: allocation moves it forward
+    and a release moves it back, so finding the next free address resumes
+    where the previous search stopped instead of rescanning the taken prefix.
+    """
+
+    def __init__(self, size: int, data: Optional[bytes] = None, hint: int = 0):
+        self.size = size
+        if data is None:
+            self.data = bytearray((size + 7) // 8)
+            if size % 8:
+                self.data[-1] = (0xFF << (size % 8)) & 0xFF
+        else:
+            self.data = bytearray(data)
+        self.hint = hint
+
+    def taken(self, offset: int) -> bool:
+        return bool(self.data[offset >> 3] & (1 << (offset & 7)))
+
+    def take(self, offset: int):
+        self.data[offset >> 3] |= 1 << (offset & 7)
+
+    def release(self, offset: int):
+        self.data[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+        if offset < self.hint:
+            self.hint = offset
+
+    def next_free(self, count: int) -> List[int]:
+        """
+        Take the `count` lowest free offsets
+
+        Full bytes are skipped by a regex scan in C, so a /16 pool (8 KB of
+        bits) is searched in microseconds even when nearly full.
+
+        Returns:
+            list: The offsets taken, fewer than `count` if the pool ran out
+        """
+        offsets: List[int] = []
+        position = self.hint >> 3
+        while len(offsets) < count:
+            match = _NOT_FULL.search(self.data, position)
+            if match is None:
+                break
+            position = match.start()
+            byte = self.data[position]
+            while byte != 0xFF and len(offsets) < count:
+                bit = (~byte & (byte + 1)).bit_length() - 1  # lowest clear bit
+                byte |= 1 << bit
+                offsets.append(position * 8 + bit)
+            self.data[position] = byte
+        if offsets:
+            self.hint = offsets[-1] + 1
+        return offsets
+
+    def find_run(self, count: int) -> Optional[int]:
+        """
+        Find the lowest offset starting `count` consecutive free addresses
+
+        The free bits are read as one integer and ANDed with themselves shifted
+        by doubling steps, leaving a bit set only where a whole run starts, so
+        the search costs O(log count) big-integer operations.
+        """
+        if count <= 0 or count > self.size:
+            return None
+        free = ~int.from_bytes(self.data, "little") & ((1 << self.size) - 1)
+        run = 1
+        while run < count and free:
+            step = min(run, count - run)
+            free &= free >> step
+            run += step
+        if not free:
+            return None
+        return (free & -free).bit_length() - 1
+
+def _usable_range(network) -> Tuple:
+    if network.prefixlen < network.max_prefixlen - 1:  # /31 and /32 have no network/broadcast address
+        return network.network_address + 1, network.broadcast_address - 1
+    return network.network_address, network.broadcast_address
+
+def _check_range(cidr: str, gateway: Optional[str], range_start: Optional[str], range_end: Optional[str]):
+    """
+    Validate a pool's addressing and resolve its allocatable range
+
+    Returns:
+        tuple: (network, first address, last address, size)
+
+    Raises:
+        ValueError: If the CIDR is malformed, an address lies outside it, or the range is too large
+    """
+    network = parse_cidr(cidr)
+    errors = check_addresses(network, gateway, range_start, range_end)
+    if errors:
+        raise ValueError("; ".join(errors))
+    usable_first, usable_last = _usable_range(network)
+    first = ipaddress.ip_address(range_start.strip()) if range_start else usable_first
+    last = ipaddress.ip_address(range_end.strip()) if range_end else usable_last
+    if first > last:
+        raise ValueError(f"Range start {first} is after range end {last}")
+    size = int(last) - int(first) + 1
+    if size > settings.IPAM_MAX_POOL_SIZE:
+        raise ValueError(f"Range {first}-{last} has {size} addresses; at most {settings.IPAM_MAX_POOL_SIZE} per pool")
+    return network, first, last, size
+
+def _check_overlap(db: Session, first, last, exclude_id: Optional[int] = None):
+    rows = db.query(IPPool.id, IPPool.name, IPPool.range_start, IPPool.range_end)
+    overlap = find_overlap(
+        [(name, start, end) for pool_id, name, start, end in rows if pool_id != exclude_id], first, last
+    )
+    if overlap:
+        raise IPAMConflict(overlap)
+
+def manual_pool_ranges(db: Session) -> List[Tuple[str, str, str]]:
+    """
+    (name, range_start, range_end) of the pools not owned by a VNI workorder
+
+    VNI pools lie inside their workorder's subnet, which the CIDR index keeps
+    disjoint, so bulk VNI creation only has to check new ranges against these.
+    """
+    return db.query(IPPool.name, IPPool.range_start, IPPool.range_end).filter(
+        IPPool.vni_workorder_id.is_(None)
+    ).all()
+
+def find_overlap(ranges: Sequence[Tuple[str, str, str]], first, last) -> Optional[str]:
+    """
+    Describe the first of (name, range_start, range_end) that overlaps first..last
+
+    Returns:
+        str: The conflict message, or None when nothing overlaps
+    """
+    for name, start, end in ranges:
+        start, end = ipaddress.ip_address(start), ipaddress.ip_address(end)
+        if start.version == first.version and start <= last and first <= end:
+            return f"Range {first}-{last} overlaps IP pool '{name}' ({start}-{end})"
+    return None
+
+def _bitmap(pool: IPPool) -> AddressBitmap:
+    return AddressBitmap(pool.size, pool.bitmap, pool.next_free)
+
+def _store(pool: IPPool, bitmap: AddressBitmap, delta: int):
+    pool.bitmap = bytes(bitmap.data)
+    pool.next_free = bitmap.hint
+    pool.allocated = (pool.allocated or 0) + delta
+
+def address_at(pool: IPPool, offset: int) -> str:
+    """The address at a bitmap offset of a pool"""
+    return str(ipaddress.ip_address(pool.range_start) + offset)
+
+def offset_of(pool: IPPool, address: str) -> int:
+    """
+    The bitmap offset of an address of a pool
+
+    Raises:
+        ValueError: If the address is malformed or outside the pool's range
+    """
+    try:
+        value = ipaddress.ip_address(str(address).strip())
+    except ValueError:
+        raise ValueError(f"Invalid IP address: {address}")
+    start = ipaddress.ip_address(pool.range_start)
+    if value.version != start.version or not start <= value <= ipaddress.ip_address(pool.range_end):
+        raise ValueError(f"{address} is outside IP pool '{pool.name}' ({pool.range_start}-{pool.range_end})")
+    return int(value) - int(start)
+
+def first_free(pool: IPPool) -> Optional[str]:
+    """The lowest free address of a pool, without taking it"""
+    offsets = _bitmap(pool).next_free(1)
+    return address_at(pool, offsets[0]) if offsets else None
+
+def _record(db: Session, pool: IPPool, offsets: Sequence[int], owners: Sequence[Tuple]) -> List[IPAllocation]:
+    allocations = [
+        IPAllocation(pool_id=pool.id, offset=offset, address=address_at(pool, offset),
+                     owner_type=owner_type, owner_id=owner_id, note=note)
+        for offset, (owner_type, owner_id, note) in zip(offsets, owners)
+    ]
+    db.add_all(allocations)
+    return allocations
+
+def get_pool(db: Session, pool_id, for_update: bool = False) -> Optional[IPPool]:
+    """
+    Look up a pool by ID, locking its row until commit when asked
+
+    Returns:
+        IPPool: The pool, or None if the ID is unknown
+    """
+    try:
+        pool_id = int(pool_id)
+    except (TypeError, ValueError):
+        return None
+    query = db.query(IPPool).filter(IPPool.id == pool_id)
+    if for_update:
+        query = query.with_for_update()
+    return query.first()
+
+def pool_to_dict(pool: IPPool) -> Dict:
+    network = parse_cidr(pool.cidr)
+    return {
+        "id": pool.id,
+        "name": pool.name,
+        "description": pool.description,
+        "cidr": pool.cidr,
+        "netmask": str(network.netmask),
+        "gateway": pool.gateway,
+        "range_start": pool.range_start,
+        "range_end": pool.range_end,
+        "size": pool.size,
+        "allocated": pool.allocated,
+        "free": pool.size - pool.allocated,
+        "vni_workorder_id": pool.vni_workorder_id,
+        "created_at": pool.created_at.isoformat() if pool.created_at else None,
+        "updated_at": pool.updated_at.isoformat() if pool.updated_at else None,
+    }
+
+def allocation_to_dict(allocation: IPAllocation) -> Dict:
+    return {
+        "address": allocation.address,
+        "pool_id": allocation.pool_id,
+        "owner_type": allocation.owner_type,
+        "owner_id": allocation.owner_id,
+        "note": allocation.note,
+        "created_at": allocation.created_at.isoformat() if allocation.created_at else None,
+    }
+
+def _new_pool(name: str, cidr: str, gateway: Optional[str], range_start: Optional[str], range_end: Optional[str],
+              description: Optional[str], vni_workorder_id: Optional[int]) -> Tuple[IPPool, Optional[int]]:
+    """Build an unsaved pool, its gateway bit already set; returns (pool, gateway offset or None)"""
+    network, first, last, size = _check_range(cidr, gateway, range_start, range_end)
+    bitmap = AddressBitmap(size)
+    gateway = gateway.strip() if gateway else None
+    gateway_offset = None
+    if gateway and first <= ipaddress.ip_address(gateway) <= last:
+        gateway_offset = int(ipaddress.ip_address(gateway)) - int(first)
+        bitmap.take(gateway_offset)
+    pool = IPPool(
+        name=name,
+        description=description,
+        cidr=str(network),
+        gateway=gateway,
+        range_start=str(first),
+        range_end=str(last),
+        size=size,
+        allocated=0 if gateway_offset is None else 1,
+        bitmap=bytes(bitmap.data),
+        next_free=0,
+        vni_workorder_id=vni_workorder_id,
+    )
+    return pool, gateway_offset
+
+def create_pool(db: Session, name: str, cidr: str, gateway: Optional[str] = None,
+                range_start: Optional[str] = None, range_end: Optional[str] = None,
+                description: Optional[str] = None, vni_workorder_id: Optional[int] = None) -> IPPool:
+    """
+    Add a pool covering range_start..range_end of a subnet (every usable host by default)
+
+    The gateway, when it lies in the range, is reserved straight away. The
+    caller commits.
+
+    Raises:
+        ValueError: If the addressing is invalid
+        IPAMConflict: If the name is taken or the range overlaps another pool
+    """
+    if not name:
+        raise ValueError("Pool name is required")
+    pool, gateway_offset = _new_pool(name, cidr, gateway, range_start, range_end, description, vni_workorder_id)
+    if db.query(IPPool.id).filter(IPPool.name == name).first():
+        raise IPAMConflict(f"IP pool '{name}' already exists")
+    _check_overlap(db, ipaddress.ip_address(pool.range_start), ipaddress.ip_address(pool.range_end))
+    db.add(pool)
+    db.flush()
+    if gateway_offset is not None:
+        _record(db, pool, [gateway_offset], [(RESERVED, None, GATEWAY_NOTE)])
+    return pool
+
+def vni_pool_name(vni_workorder) -> str:
+    return f"{vni_workorder.vni_name} (VNI {vni_workorder.id})"
+
+def create_vni_pools(db: Session, vni_workorders: Sequence) -> List[IPPool]:
+    """
+    Create the pools of many freshly inserted VNI workorders with two bulk inserts
+
+    The ranges must already have been checked against manual_pool_ranges;
+    VNI pools cannot overlap each other because their subnets are disjoint.
+
+    Raises:
+        ValueError: If a workorder's addressing is invalid
+        IPAMConflict: If a pool name is taken
+    """
+    built = [
+        _new_pool(vni_pool_name(vni), vni.cidr, vni.gateway, vni.first_ip, vni.last_ip, vni.description, vni.id)
+        for vni in vni_workorders
+    ]
+    names = [pool.name for pool, _ in built]
+    taken = db.query(IPPool.name).filter(IPPool.name.in_(names)).first() if names else None
+    if taken:
+        raise IPAMConflict(f"IP pool '{taken[0]}' already exists")
+    db.add_all([pool for pool, _ in built])
+    db.flush()
+    db.add_all([
+        IPAllocation(pool_id=pool.id, offset=offset, address=address_at(pool, offset),
+                     owner_type=RESERVED, note=GATEWAY_NOTE)
+        for pool, offset in built if offset is not None
+    ])
+    return [pool for pool, _ in built]
+
+def allocate(db: Session, pool: IPPool, count: int, owner_type: str = RESERVED, owner_id: Optional[int] = None,
+             note: Optional[str] = None, contiguous: bool = False) -> List[IPAllocation]:
+    """
+    Take the next `count` free addresses of a pool, or the lowest free run of `count` when contiguous
+
+    All rows are added to the caller's transaction; nothing is taken unless
+    the whole request fits.
+
+    Raises:
+        ValueError: If count is not positive
+        IPAMConflict: If the pool does not have room
+    """
+    if count <= 0:
+        raise ValueError("count must be positive")
+    free = pool.size - pool.allocated
+    if count > free:
+        raise IPAMConflict(f"IP pool '{pool.name}' has {free} free addresses, {count} requested")
+    bitmap = _bitmap(pool)
+    if contiguous:
+        start = bitmap.find_run(count)
+        if start is None:
+            raise IPAMConflict(f"IP pool '{pool.name}' has no run of {count} consecutive free addresses")
+        offsets = list(range(start, start + count))
+        for offset in offsets:
+            bitmap.take(offset)
+    else:
+        offsets = bitmap.next_free(count)
+    allocations = _record(db, pool, offsets, [(owner_type, owner_id, note)] * count)
+    _store(pool, bitmap, count)
+    return allocations
+
+def claim(db: Session, pool: IPPool, addresses: Sequence[str], owners: Sequence[Tuple]) -> List[IPAllocation]:
+    """
+    Take specific addresses of a pool
+
+    Args:
+        owners: One (owner_type, owner_id, note) per address
+
+    Raises:
+        ValueError: If an address is malformed or outside the pool
+        IPAMConflict: If an address is already taken
+    """
+    bitmap = _bitmap(pool)
+    offsets = []
+    for address in addresses:
+        offset = offset_of(pool, address)
+        if bitmap.taken(offset):
+            holder = db.query(IPAllocation).filter(
+                IPAllocation.pool_id == pool.id, IPAllocation.offset == offset
+            ).first()
+            owner = f"{holder.owner_type} {holder.owner_id or holder.note or ''}".strip() if holder else "another owner"
+            raise IPAMConflict(f"{address} is already allocated to {owner}")
+        bitmap.take(offset)
+        offsets.append(offset)
+    allocations = _record(db, pool, offsets, owners)
+    _store(pool, bitmap, len(offsets))
+    return allocations
+
+def release(db: Session, pool: IPPool, allocations: Sequence[IPAllocation]) -> int:
+    """Return allocations of one pool to it and delete their rows; the caller commits"""
+    if not allocations:
+        return 0
+    bitmap = _bitmap(pool)
+    for allocation in allocations:
+        bitmap.release(allocation.offset)
+        db.delete(allocation)
+    _store(pool, bitmap, -len(allocations))
+    db.flush()  # deletes go out before any insert that reuses the offsets
+    return len(allocations)
+
+def release_owner(db: Session, owner_type: str, owner_id: int) -> int:
+    """
+    Release every address held by an owner, across pools
+
+    Returns:
+        int: Number of addresses released
+    """
+    allocations = db.query(IPAllocation).filter(
+        IPAllocation.owner_type == owner_type, IPAllocation.owner_id == owner_id
+    ).all()
+    by_pool: Dict[int, list] = {}
+    for allocation in allocations:
+        by_pool.setdefault(allocation.pool_id, []).append(allocation)
+    released = 0
+    for pool_id in sorted(by_pool):
+        pool = get_pool(db, pool_id, for_update=True)
+        if pool is None:
+            for allocation in by_pool[pool_id]:
+                db.delete(allocation)
+            continue
+        released += release(db, pool, by_pool[pool_id])
+    return released
+
+def drop_pool(db: Session, pool: IPPool):
+    """
+    Delete a pool whose only allocations are reservations
+
+    Raises:
+        IPAMConflict: If workorders still hold addresses from it
+    """
+    in_use = db.query(IPAllocation).filter(
+        IPAllocation.pool_id == pool.id, IPAllocation.owner_type != RESERVED
+    ).count()
+    if in_use:
+        raise IPAMConflict(f"IP pool '{pool.name}' still has {in_use} addresses allocated to workorders")
+    db.query(IPAllocation).filter(IPAllocation.pool_id == pool.id).delete(synchronize_session=False)
+    db.delete(pool)
+
+def reshape_pool(db: Session, pool: IPPool, cidr: str, gateway: Optional[str],
+                 range_start: Optional[str], range_end: Optional[str]):
+    """
+    Move a pool to new addressing, keeping its allocations at their addresses
+
+    The gateway reservation follows the gateway; every other allocation must
+    still fall inside the new range.
+
+    Raises:
+        ValueError: If the addressing is invalid
+        IPAMConflict: If the range overlaps another pool or would drop an allocation
+    """
+    network, first, last, size = _check_range(cidr, gateway, range_start, range_end)
+    _check_overlap(db, first, last, exclude_id=pool.id)
+    allocations = db.query(IPAllocation).filter(IPAllocation.pool_id == pool.id).all()
+    kept = []
+    for allocation in allocations:
+        if allocation.owner_type == RESERVED and allocation.note == GATEWAY_NOTE:
+            db.delete(allocation)
+            continue
+        address = ipaddress.ip_address(allocation.address)
+        if address.version != first.version or not first <= address <= last:
+            raise IPAMConflict(f"{allocation.address} is allocated and would fall outside {first}-{last}")
+        kept.append((allocation, int(address) - int(first)))
+    # renumber through negative offsets so no intermediate flush collides on (pool_id, offset)
+    for i, (allocation, _) in enumerate(kept):
+        allocation.offset = -1 - i
+    db.flush()
+    bitmap = AddressBitmap(size)
+    for allocation, offset in kept:
+        allocation.offset = offset
+        bitmap.take(offset)
+    pool.cidr = str(network)
+    pool.gateway = gateway.strip() if gateway else None
+    pool.range_start = str(first)
+    pool.range_end = str(last)
+    pool.size = size
+    pool.allocated = len(kept)
+    bitmap.hint = 0
+    if pool.gateway and first <= ipaddress.ip_address(pool.gateway) <= last:
+        offset = offset_of(pool, pool.gateway)
+        if not bitmap.taken(offset):
+            bitmap.take(offset)
+            _record(db, pool, [offset], [(RESERVED, None, GATEWAY_NOTE)])
+            pool.allocated += 1
+    _store(pool, bitmap, 0)
+
+def pool_id_of(ip_pool_id) -> Optional[int]:
+    """
+    IPAM pool ID named by a workorder's ip_pool_id, or None if it names none
+
+    Workorders from before IPAM carry vCenter IP pool IDs such as 'ippool-1'.
+    Those are not IPAM pools: they are passed to Terraform unchanged and take
+    no address here.
+    """
+    if ip_pool_id in (None, ""):
+        return None
+    try:
+        return int(ip_pool_id)
+    except (TypeError, ValueError):
+        return None
+
+def assign_workorders(db: Session, orders: Sequence) -> int:
+    """
+    Give every workorder with an IPAM ip_pool_id its address from the pool
+
+    A workorder that names its ip gets exactly that address; the others take
+    the pool's next free addresses, all in one pass per pool. netmask and
+    gateway default to the pool's. Legacy vCenter pool IDs are skipped (see
+    pool_id_of). The orders must already be flushed (they need IDs); the
+    caller commits.
+
+    Returns:
+        int: Number of addresses allocated
+
+    Raises:
+        ValueError: If a pool is unknown or a requested ip lies outside it
+        IPAMConflict: If a requested ip is taken or a pool runs out
+    """
+    by_pool: Dict[int, list] = {}
+    for order in orders:
+        pool_id = pool_id_of(order.ip_pool_id)
+        if pool_id is None:
+            continue
+        by_pool.setdefault(pool_id, []).append(order)
+
+    allocated = 0
+    for pool_id in sorted(by_pool):  # one lock order, so concurrent batches cannot deadlock
+        pool = get_pool(db, pool_id, for_update=True)
+        if pool is None:
+            raise ValueError(f"IP pool '{pool_id}' not found")
+        pinned = [order for order in by_pool[pool_id] if order.ip]
+        floating = [order for order in by_pool[pool_id] if not order.ip]
+        if pinned:
+            claim(db, pool, [order.ip for order in pinned], [("workorder", order.id, None) for order in pinned])
+        if floating:
+            free = pool.size - pool.allocated
+            if len(floating) > free:
+                raise IPAMConflict(f"IP pool '{pool.name}' has {free} free addresses, {len(floating)} requested")
+            bitmap = _bitmap(pool)
+            offsets = bitmap.next_free(len(floating))
+            allocations = _record(db, pool, offsets, [("workorder", order.id, None) for order in floating])
+            _store(pool, bitmap, len(offsets))
+            for order, allocation in zip(floating, allocations):
+                order.ip = allocation.address
+        netmask = str(parse_cidr(pool.cidr).netmask)
+        for order in by_pool[pool_id]:
+            order.netmask = order.netmask or netmask
+            order.gateway = order.gateway or pool.gateway
+        allocated += len(by_pool[pool_id])
+    return allocated
+
+def plan_vni_range(cidr: str, gateway: Optional[str], count: int) -> Tuple[str, str]:
+    """
+    Choose first_ip/last_ip for a VNI subnet: the lowest run of `count` usable addresses around the gateway
+
+    Raises:
+        ValueError: If the subnet is invalid or has no such run
+    """
+    if not isinstance(count, int) or count <= 0:
+        raise ValueError("number_of_ips must be a positive integer when first_ip and last_ip are omitted")
+    network = parse_cidr(cidr)
+    errors = check_addresses(network, gateway)
+    if errors:
+        raise ValueError("; ".join(errors))
+    first, last = _usable_range(network)
+    size = min(int(last) - int(first) + 1, settings.IPAM_MAX_POOL_SIZE)
+    bitmap = AddressBitmap(size)
+    if gateway:
+        offset = int(ipaddress.ip_address(gateway.strip())) - int(first)
+        if 0 <= offset < size:
+            bitmap.take(offset)
+    start = bitmap.find_run(count)
+    if start is None:
+        raise ValueError(f"{network} has no run of {count} free addresses")
+    return str(first + start), str(first + start + count - 1)
+
+def sync_vni_pool(db: Session, vni_workorder) -> Optional[IPPool]:
+    """
+    Keep the pool of a VNI workorder's first_ip..last_ip range in step with the workorder
+
+    A VNI workorder that claims its subnet has a pool; a rejected one has
+    none. Call after the workorder is flushed; the caller commits.
+
+    Raises:
+        ValueError: If the addressing is invalid
+        IPAMConflict: If the range overlaps another pool or workorders hold addresses that would be lost
+    """
+    pool = db.query(IPPool).filter(IPPool.vni_workorder_id == vni_workorder.id).with_for_update().first()
+    if vni_workorder.status in RELEASED_STATUSES:
+        if pool is not None:
+            drop_pool(db, pool)
+        return None
+    if pool is None:
+        return create_pool(
+            db,
+            name=vni_pool_name(vni_workorder),
+            cidr=vni_workorder.cidr,
+            gateway=vni_workorder.gateway,
+            range_start=vni_workorder.first_ip,
+            range_end=vni_workorder.last_ip,
+            description=vni_workorder.description,
+            vni_workorder_id=vni_workorder.id,
+        )
+    current = (pool.cidr, pool.gateway, pool.range_start, pool.range_end)
+    network, first, last, _ = _check_range(
+        vni_workorder.cidr, vni_workorder.gateway, vni_workorder.first_ip, vni_workorder.last_ip
+    )
+    if current != (str(network), vni_workorder.gateway, str(first), str(last)):
+        reshape_pool(db, pool, vni_workorder.cidr, vni_workorder.gateway, vni_workorder.first_ip, vni_workorder.last_ip)
+    return pool
+
+def drop_vni_pool(db: Session, vni_workorder_id: int):
+    """
+    Delete the pool of a VNI workorder that is being deleted
+
+    Raises:
+        IPAMConflict: If workorders still hold addresses from it
+    """
+    pool = db.query(IPPool).filter(IPPool.vni_workorder_id == vni_workorder_id).with_for_update().first()
+    if pool is not None:
+        drop_pool(db, pool)
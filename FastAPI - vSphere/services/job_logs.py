@@ -0,0 +1,234 @@
+"""
+Job Log Service
+Bounded live log buffers for running jobs, persisted in chunks and replayable as a stream
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.database import session_scope
+from models.workorder_job import JobLogChunk, WorkOrderJob
+
+logger = logging.getLogger(__name__)
+
+# Longer lines are cut so one runaway line cannot blow up a chunk
+MAX_LINE_LENGTH = 8192
+
+# How long a finished job's buffer stays in memory for late subscribers
+CLOSED_BUFFER_TTL = 300
+
+class LogBuffer:
+    """
+    Last `max_lines` lines of one job plus the lines not yet written to job_log_chunks
+
+    Lines are numbered from 1. Pending lines are flushed once they reach
+    `chunk_bytes`, half the buffer, or `flush_interval` seconds of age, so
+    every line that is no longer in memory is already in the database.
+    Lines whose write fails stay pending and are retried after
+    `flush_interval` seconds; while writes keep failing, at most `max_lines`
+    stay pending and older ones are dropped (`lost_through` is the last line
+    that will never be stored).
+    """
+
+    def __init__(self, job_id: int, max_lines: int, chunk_bytes: int, flush_interval: float):
+        self.job_id = job_id
+        self.max_lines = max(10, max_lines)
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.lines: deque = deque(maxlen=self.max_lines)  # (number, text)
+        self.last_number = 0
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self.lost_through = 0
+        self._condition = threading.Condition()
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._pending_first = 1
+        self._last_flush = time.monotonic()
+        self._retry_at = 0.0  # no flush attempt before this after a failed write
+        self._flush_lock = threading.Lock()  # one write at a time keeps chunks contiguous
+
+    def append(self, text: str):
+        """Add one line and wake up any waiting readers"""
+        if len(text) > MAX_LINE_LENGTH:
+            text = text[:MAX_LINE_LENGTH] + " [truncated]"
+        with self._condition:
+            self.last_number += 1
+            self.lines.append((self.last_number, text))
+            if not self._pending:
+                self._pending_first = self.last_number
+            self._pending.append(text)
+            self._pending_bytes += len(text) + 1
+            self._trim_pending()
+            self._condition.notify_all()
+            now = time.monotonic()
+            should_flush = now >= self._retry_at and (
+                self._pending_bytes >= self.chunk_bytes
+                or len(self._pending) >= self.max_lines // 2
+                or now - self._last_flush >= self.flush_interval
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Write pending lines as one job_log_chunks row, keeping them pending if the write fails"""
+        with self._flush_lock:
+            with self._condition:
+                if not self._pending:
+                    return
+                lines = self._pending
+                first_line, pending_bytes = self._pending_first, self._pending_bytes
+                self._pending = []
+                self._pending_bytes = 0
+                self._last_flush = time.monotonic()
+            try:
+                with session_scope() as db:
+                    db.add(JobLogChunk(
+                        job_id=self.job_id, first_line=first_line, line_count=len(lines), content="\n".join(lines)
+                    ))
+            except Exception as e:
+                logger.error(f"Failed to persist log chunk of job {self.job_id}, will retry: {str(e)}")
+                with self._condition:
+                    # lines appended meanwhile follow the failed ones, so the block stays contiguous
+                    self._pending = lines + self._pending
+                    self._pending_bytes += pending_bytes
+                    self._pending_first = first_line
+                    self._retry_at = time.monotonic() + self.flush_interval
+                    self._trim_pending()
+
+    def _trim_pending(self):
+        """Drop the oldest unstored lines, down to half the buffer, once more than `max_lines` are pending"""
+        if len(self._pending) <= self.max_lines:
+            return
+        dropped = len(self._pending) - self.max_lines // 2
+        self._pending_bytes -= sum(len(text) + 1 for text in self._pending[:dropped])
+        del self._pending[:dropped]
+        self._pending_first += dropped
+        self.lost_through = self._pending_first - 1
+        logger.error(f"Dropped {dropped} unstored log lines of job {self.job_id} (through line {self.lost_through})")
+
+    def close(self):
+        """Flush what is left and tell readers no more lines will come"""
+        self.flush()
+        with self._condition:
+            self.closed = True
+            self.closed_at = time.monotonic()
+            self._condition.notify_all()
+
+    def tail(self, count: int) -> str:
+        with self._condition:
+            return "\n".join(text for _, text in list(self.lines)[-count:])
+
+    def wait_after(self, after: int, timeout: float) -> Tuple[List[Tuple[int, str]], bool, int]:
+        """
+        Lines numbered above `after`, waiting up to `timeout` seconds for some to arrive
+
+        Returns:
+            tuple: (lines, closed, number of the oldest line still in memory)
+        """
+        with self._condition:
+            if self.last_number <= after and not self.closed:
+                self._condition.wait(timeout)
+            oldest = self.lines[0][0] if self.lines else self.last_number + 1
+            return [line for line in self.lines if line[0] > after], self.closed, oldest
+
+class JobLogStore:
+    """Registry of the live log buffers of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers: Dict[int, LogBuffer] = {}
+
+    def open(self, job_id: int) -> LogBuffer:
+        with self._lock:
+            self._expire()
+            buffer = LogBuffer(
+                job_id,
+                settings.JOB_LOG_BUFFER_LINES,
+                settings.JOB_LOG_CHUNK_BYTES,
+                settings.JOB_LOG_FLUSH_INTERVAL
+            )
+            self._buffers[job_id] = buffer
+            return buffer
+
+    def get(self, job_id: int) -> Optional[LogBuffer]:
+        with self._lock:
+            return self._buffers.get(job_id)
+
+    def _expire(self):
+        now = time.monotonic()
+        for job_id in [
+            job_id for job_id, buffer in self._buffers.items()
+            if buffer.closed and now - buffer.closed_at > CLOSED_BUFFER_TTL
+        ]:
+            del self._buffers[job_id]
+
+def persisted_lines(job_id: int, after: int = 0) -> Iterator[Tuple[int, str]]:
+    """
+    Stored log lines of a job numbered above `after`, read chunk by chunk
+
+    Read from the primary, so a chunk written moments ago is never missed.
+    """
+    with session_scope() as db:
+        chunks = db.query(
+            JobLogChunk.first_line, JobLogChunk.line_count, JobLogChunk.content
+        ).filter(
+            JobLogChunk.job_id == job_id,
+            JobLogChunk.first_line + JobLogChunk.line_count > after + 1
+        ).order_by(JobLogChunk.first_line).execution_options(yield_per=16)
+        for first_line, _, content in chunks:
+            for offset, text in enumerate(content.split("\n")):
+                if first_line + offset > after:
+                    yield first_line + offset, text
+
+def follow_job_log(job_id: int, after: int = 0, heartbeat: float = 15.0) -> Iterator[Optional[Tuple[int, str]]]:
+    """
+    Yield (line number, text) for a job's log from `after` on, following it while the job runs
+
+    Yields None as a heartbeat when nothing arrived for `heartbeat` seconds.
+    Stored chunks are replayed first; live lines then come from this process's
+    buffer, or by polling the stored chunks when the job runs elsewhere.
+    """
+    while True:
+        stored_through = after
+        for line in persisted_lines(job_id, after):
+            after = line[0]
+            yield line
+
+        buffer = job_logs.get(job_id)
+        if buffer is not None:
+            while True:
+                lines, closed, oldest = buffer.wait_after(after, heartbeat)
+                if oldest > after + 1:
+                    break  # fell behind the in-memory window; catch up from the database
+                for line in lines:
+                    after = line[0]
+                    yield line
+                if closed and not lines:
+                    return
+                if not lines:
+                    yield None
+            if after == stored_through:
+                # the missing lines are not stored: skip them if they never will be, else wait for the flush
+                gap_end = oldest - 1 if closed else buffer.lost_through
+                if gap_end > after:
+                    after = gap_end
+                else:
+                    time.sleep(min(settings.JOB_LOG_FLUSH_INTERVAL, heartbeat))
+                    yield None
+            continue
+
+        with session_scope() as db:
+            status = db.query(WorkOrderJob.status).filter(WorkOrderJob.id == job_id).scalar()
+        if status not in ("queued", "running"):
+            for line in persisted_lines(job_id, after):
+                yield line
+            return
+        time.sleep(min(settings.JOB_LOG_FLUSH_INTERVAL, heartbeat))
+        yield None
+
+job_logs = JobLogStore()
@@ -0,0 +1,53 @@
+"""
+Job Priority
+Scheduling key shared by the VNI and VM workorder job queues
+"""
+
+from datetime import datetime
+from typing import Optional
+
+# Priority classes, most urgent first; unknown priorities are scheduled as normal
+PRIORITY_RANKS = {"critical": 0, "high": 1, "normal": 2, "low": 3}
+
+EPOCH = datetime(1970, 1, 1)
+
+def queue_key(priority: Optional[str], deadline: Optional[datetime], queued_at: Optional[datetime],
+              job_id: int, aging_seconds: int) -> tuple:
+    """
+    Scheduling key of a queued job; smaller runs first
+
+    Jobs are ordered by aged priority class, then earliest deadline, then
+    queue time. Every `aging_seconds` a job has waited counts as one class
+    more urgent. Waiting is counted in whole aging periods from the epoch,
+    so the key never changes while the job is queued and the heap is never
+    re-keyed; two jobs queued either side of a period boundary are one class
+    apart. Jobs without a deadline go after those with one.
+
+    >>> from datetime import timedelta
+    >>> queued = datetime(2026, 1, 1, 12, 5, 1)
+    >>> due_soon = queue_key("normal", queued + timedelta(minutes=5), queued, 2, 900)
+    >>> due_later = queue_key("normal", queued + timedelta(days=7), queued - timedelta(seconds=1), 1, 900)
+    >>> due_soon < due_later < queue_key("normal", None, queued - timedelta(seconds=2), 0, 900)
+    True
+    >>> queue_key("critical", None, queued, 3, 900) < due_soon
+    True
+    >>> queue_key("low", None, queued - timedelta(minutes=45), 4, 900) < queue_key("critical", None, queued, 3, 900)
+    True
+    """
+    aging = max(1, aging_seconds)
+    queued = ((queued_at or datetime.utcnow()) - EPOCH).total_seconds()
+    rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS["normal"])
+    due = (deadline - EPOCH).total_seconds() if deadline else float("inf")
+    return rank + int(queued // aging), due, queued, job_id
+
+def parse_priority(value: Optional[str]) -> str:
+    """
+    Validate a workorder priority; an empty value is normal
+
+    Raises:
+        ValueError: If the priority is not one of PRIORITY_RANKS
+    """
+    priority = (value or "normal").strip().lower()
+    if priority not in PRIORITY_RANKS:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITY_RANKS)}")
+    return priority
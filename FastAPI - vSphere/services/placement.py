@@ -0,0 +1,303 @@
+"""
+Placement Service
+Scores hosts and datastores for workorders from cached inventory and rejects overcommitting targets
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.database import session_scope, read_session_scope
+from models.workorder import WorkOrder
+from services.vsphere.host_info import get_hosts_info
+from services.vsphere.datastore_info import get_datastores_info
+from services.vsphere.cluster_info import get_resource_pools_info
+
+logger = logging.getLogger(__name__)
+
+# Workorders in these states are committed to their target but not yet visible in quickStats
+PENDING_STATUSES = ("queued", "executing")
+
+class PlacementError(Exception):
+    """Raised when workorders do not fit their chosen host or datastore"""
+
+    def __init__(self, message: str, violations: List[Dict]):
+        super().__init__(message)
+        self.violations = violations
+
+class _Inventory:
+    """Snapshot of host and datastore capacity used for one placement decision"""
+
+    def __init__(self, hosts: List[Dict], datastores: List[Dict], pools: List[Dict], fetched_at: float):
+        self.fetched_at = fetched_at
+        self.datastores = {
+            ds["id"]: ds for ds in datastores
+            if ds.get("accessible") and ds.get("maintenance_mode") in (None, "normal")
+        }
+        self.datastore_ids_by_name = {ds["name"]: ds["id"] for ds in datastores}
+        self.hosts = {
+            host["id"]: host for host in hosts
+            if str(host.get("connection_state")) == "connected" and str(host.get("power_state")) == "poweredOn"
+        }
+        self.host_datastores = {
+            host_id: [ds["id"] for ds in host.get("accessible_datastores", []) if ds["id"] in self.datastores]
+            for host_id, host in self.hosts.items()
+        }
+        # Root resource pool of each cluster ('Resources'), the default target for a host in it
+        self.cluster_pools: Dict[str, str] = {}
+        for pool in pools:
+            if pool.get("parent") and (pool["parent"] not in self.cluster_pools or pool["name"] == "Resources"):
+                self.cluster_pools[pool["parent"]] = pool["id"]
+
+    def resolve_datastore(self, datastore_id: Optional[str]) -> Optional[str]:
+        if not datastore_id:
+            return None
+        return datastore_id if datastore_id in self.datastores else self.datastore_ids_by_name.get(datastore_id)
+
+class PlacementEngine:
+    """Capacity-aware host/datastore recommendations over a TTL-cached inventory"""
+
+    def __init__(self, ttl: int, cpu_demand_ratio: float, memory_headroom: float,
+                 datastore_max_usage: float, datastore_max_overcommit: float):
+        """
+        Initialize the engine
+
+        Args:
+            ttl: Seconds an inventory snapshot is reused
+            cpu_demand_ratio: Expected share of each vCPU's core clock a new VM will use
+            memory_headroom: Fraction of host memory kept free
+            datastore_max_usage: Highest used fraction a datastore may reach
+            datastore_max_overcommit: Highest (used + uncommitted) / capacity a datastore may reach
+        """
+        self.ttl = ttl
+        self.cpu_demand_ratio = cpu_demand_ratio
+        self.memory_headroom = memory_headroom
+        self.datastore_max_usage = datastore_max_usage
+        self.datastore_max_overcommit = datastore_max_overcommit
+        self._lock = threading.Lock()
+        self._inventory: Optional[_Inventory] = None
+        # held across check_fit and the commit of the 'queued' status, so two executions cannot claim the same capacity;
+        # the inventory is loaded before it is taken
+        self.reservation_lock = threading.Lock()
+
+    def inventory(self, refresh: bool = False) -> _Inventory:
+        """Get the cached inventory, reloading it from vCenter once it is older than the TTL"""
+        with self._lock:
+            inventory = self._inventory
+            if refresh or inventory is None or time.monotonic() - inventory.fetched_at > self.ttl:
+                inventory = _Inventory(get_hosts_info(), get_datastores_info(), get_resource_pools_info(), time.monotonic())
+                self._inventory = inventory
+            return inventory
+
+    def recommend(self, cpu: int, ram: float, disk: float, limit: int = 5,
+                  datacenter_name: Optional[str] = None) -> Dict:
+        """
+        Rank host/datastore pairs for one VM
+
+        Returns:
+            dict: recommendations (best first) and the inventory age
+        """
+        _validate_demand(cpu, ram, disk)
+        inventory = self.inventory()
+        free = self._free_capacity(inventory)
+        candidates = [
+            candidate
+            for host_id in inventory.hosts
+            for candidate in [self._best_fit(inventory, free, host_id, cpu, ram, disk, datacenter_name)]
+            if candidate is not None
+        ]
+        candidates.sort(key=lambda candidate: candidate["score"], reverse=True)
+        return {
+            "recommendations": candidates[:limit],
+            "inventory_age_seconds": round(time.monotonic() - inventory.fetched_at, 1),
+        }
+
+    def place_batch(self, requests: List[Dict], datacenter_name: Optional[str] = None) -> Dict:
+        """
+        Assign a whole batch of VMs, largest first, onto hosts and datastores
+
+        Each request takes the pair with the best score after the previous
+        assignments, so capacity consumed earlier in the batch is respected.
+
+        Args:
+            requests: Dicts with key, cpu, ram and disk
+
+        Returns:
+            dict: assignments keyed by request key, plus the keys that did not fit
+        """
+        for request in requests:
+            _validate_demand(request["cpu"], request["ram"], request["disk"])
+        inventory = self.inventory()
+        free = self._free_capacity(inventory)
+        ordered = sorted(requests, key=lambda request: (request["ram"], request["disk"], request["cpu"]), reverse=True)
+        assignments: Dict[str, Dict] = {}
+        unplaced: List[str] = []
+        for request in ordered:
+            best = None
+            for host_id in inventory.hosts:
+                candidate = self._best_fit(
+                    inventory, free, host_id, request["cpu"], request["ram"], request["disk"], datacenter_name
+                )
+                if candidate is not None and (best is None or candidate["score"] > best["score"]):
+                    best = candidate
+            if best is None:
+                unplaced.append(str(request["key"]))
+                continue
+            self._consume(inventory, free, best["host_id"], best["datastore_id"],
+                          request["cpu"], request["ram"], request["disk"])
+            assignments[str(request["key"])] = best
+        return {
+            "assignments": assignments,
+            "unplaced": unplaced,
+            "inventory_age_seconds": round(time.monotonic() - inventory.fetched_at, 1),
+        }
+
+    def check_fit(self, orders: List[WorkOrder], inventory: Optional[_Inventory] = None):
+        """
+        Reject workorders whose chosen host or datastore would be overcommitted
+
+        Demands of the given orders are summed per target on top of the
+        workorders already queued or executing there, read from the primary
+        database. Callers hold reservation_lock until the orders are queued,
+        and load the inventory before taking it so a vCenter refresh does not
+        block other executions.
+
+        Args:
+            orders: Workorders about to be queued
+            inventory: Inventory loaded by the caller; the cached one when None
+
+        Raises:
+            PlacementError: With one violation per overcommitted target
+        """
+        inventory = inventory or self.inventory()
+        free = self._free_capacity(inventory, exclude_ids={order.id for order in orders}, primary=True)
+        violations = []
+        for order in orders:
+            host_id = order.host_id
+            datastore_id = inventory.resolve_datastore(order.datastore_id)
+            if host_id and host_id not in inventory.hosts:
+                violations.append({"workorder_id": order.id, "target": host_id, "reason": "Host is not connected or powered on"})
+                continue
+            if order.datastore_id and datastore_id is None:
+                violations.append({"workorder_id": order.id, "target": order.datastore_id, "reason": "Datastore is not accessible"})
+                continue
+            reason = self._consume(inventory, free, host_id, datastore_id, order.cpu, order.ram, order.disk or 0)
+            if reason:
+                violations.append({"workorder_id": order.id, "target": host_id if "Host" in reason else datastore_id, "reason": reason})
+        if violations:
+            raise PlacementError("WorkOrders would overcommit their targets", violations)
+
+    def _free_capacity(self, inventory: _Inventory, exclude_ids=None, primary: bool = False) -> Dict:
+        """Capacity left per host and datastore after the workorders already in flight"""
+        free = {
+            "cpu": {host_id: host["cpu_free_mhz"] for host_id, host in inventory.hosts.items()},
+            "memory": {
+                host_id: host["memory_free_gb"] - host["memory_total_gb"] * self.memory_headroom
+                for host_id, host in inventory.hosts.items()
+            },
+            "disk": {
+                ds_id: ds["free_space_gb"] - ds["capacity_gb"] * (1 - self.datastore_max_usage)
+                for ds_id, ds in inventory.datastores.items()
+            },
+            "provisioned": {
+                ds_id: ds["capacity_gb"] * self.datastore_max_overcommit - (ds["used_space_gb"] + ds["uncommitted_gb"])
+                for ds_id, ds in inventory.datastores.items()
+            },
+        }
+        for order in _pending_orders(exclude_ids or set(), primary):
+            self._consume(inventory, free, order["host_id"], inventory.resolve_datastore(order["datastore_id"]),
+                          order["cpu"], order["ram"], order["disk"] or 0, force=True)
+        return free
+
+    def _cpu_demand(self, inventory: _Inventory, host_id: str, cpu: int) -> float:
+        host = inventory.hosts[host_id]
+        core_mhz = host["cpu_total_mhz"] / host["cpu_cores"] if host["cpu_cores"] else 0
+        return cpu * core_mhz * self.cpu_demand_ratio
+
+    def _consume(self, inventory: _Inventory, free: Dict, host_id: Optional[str], datastore_id: Optional[str],
+                 cpu: int, ram: float, disk: float, force: bool = False) -> Optional[str]:
+        """Take a VM's demand off the free capacity; returns why it does not fit, if it does not"""
+        reason = None
+        if host_id in inventory.hosts:
+            cpu_demand = self._cpu_demand(inventory, host_id, cpu)
+            if free["memory"][host_id] < ram:
+                reason = f"Host has {free['memory'][host_id]:.1f} GB memory available, {ram} GB requested"
+            elif free["cpu"][host_id] < cpu_demand:
+                reason = f"Host has {free['cpu'][host_id]:.0f} MHz CPU available, {cpu_demand:.0f} MHz expected"
+        if reason is None and datastore_id in inventory.datastores:
+            if free["disk"][datastore_id] < disk:
+                reason = f"Datastore has {free['disk'][datastore_id]:.1f} GB available, {disk} GB requested"
+            elif free["provisioned"][datastore_id] < disk:
+                reason = "Datastore would exceed its provisioning overcommit limit"
+        if reason is None or force:
+            if host_id in inventory.hosts:
+                free["memory"][host_id] -= ram
+                free["cpu"][host_id] -= self._cpu_demand(inventory, host_id, cpu)
+            if datastore_id in inventory.datastores:
+                free["disk"][datastore_id] -= disk
+                free["provisioned"][datastore_id] -= disk
+        return reason
+
+    def _best_fit(self, inventory: _Inventory, free: Dict, host_id: str, cpu: int, ram: float, disk: float,
+                  datacenter_name: Optional[str]) -> Optional[Dict]:
+        host = inventory.hosts[host_id]
+        if datacenter_name and host.get("datacenter") != datacenter_name:
+            return None
+        cpu_demand = self._cpu_demand(inventory, host_id, cpu)
+        memory_left = free["memory"][host_id] - ram
+        cpu_left = free["cpu"][host_id] - cpu_demand
+        if memory_left < 0 or cpu_left < 0:
+            return None
+
+        best_ds, best_ds_score = None, None
+        for ds_id in inventory.host_datastores[host_id]:
+            disk_left = free["disk"][ds_id] - disk
+            if disk_left < 0 or free["provisioned"][ds_id] < disk:
+                continue
+            ds_score = disk_left / inventory.datastores[ds_id]["capacity_gb"]
+            if best_ds_score is None or ds_score > best_ds_score:
+                best_ds, best_ds_score = ds_id, ds_score
+        if best_ds is None:
+            return None
+
+        host_score = 0.5 * memory_left / host["memory_total_gb"] + 0.5 * (
+            cpu_left / host["cpu_total_mhz"] if host["cpu_total_mhz"] else 0
+        )
+        return {
+            "host_id": host_id,
+            "host_name": host["name"],
+            "cluster": host.get("cluster"),
+            "datastore_id": best_ds,
+            "datastore_name": inventory.datastores[best_ds]["name"],
+            "resource_pool_id": inventory.cluster_pools.get(host.get("cluster")),
+            "memory_free_after_gb": round(memory_left, 2),
+            "cpu_free_after_mhz": round(cpu_left, 1),
+            "datastore_free_after_gb": round(free["disk"][best_ds] - disk, 2),
+            "score": round(0.7 * host_score + 0.3 * best_ds_score, 4),
+        }
+
+def _validate_demand(cpu, ram, disk):
+    if cpu <= 0 or ram <= 0 or disk < 0:
+        raise ValueError("cpu and ram must be positive and disk must not be negative")
+
+def _pending_orders(exclude_ids, primary: bool = False) -> List[Dict]:
+    """Targets and sizes of workorders queued or executing right now"""
+    with (session_scope() if primary else read_session_scope()) as db:
+        rows = db.query(
+            WorkOrder.id, WorkOrder.host_id, WorkOrder.datastore_id, WorkOrder.cpu, WorkOrder.ram, WorkOrder.disk
+        ).filter(WorkOrder.status.in_(PENDING_STATUSES)).all()
+    return [
+        {"host_id": host_id, "datastore_id": datastore_id, "cpu": cpu, "ram": ram, "disk": disk}
+        for order_id, host_id, datastore_id, cpu, ram, disk in rows
+        if order_id not in exclude_ids
+    ]
+
+placement_engine = PlacementEngine(
+    ttl=settings.PLACEMENT_CACHE_TTL,
+    cpu_demand_ratio=settings.PLACEMENT_CPU_DEMAND_RATIO,
+    memory_headroom=settings.PLACEMENT_MEMORY_HEADROOM,
+    datastore_max_usage=settings.PLACEMENT_DATASTORE_MAX_USAGE,
+    datastore_max_overcommit=settings.PLACEMENT_DATASTORE_MAX_OVERCOMMIT
+)
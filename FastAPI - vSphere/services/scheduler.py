@@ -0,0 +1,205 @@
+"""
+History Collection Scheduler
+Runs monitoring snapshots in-process on a per data class cadence
+"""
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from app.config import settings
+from app.database import CollectionRun, session_scope
+from services.insert_db import store_monitoring_data, store_inventory_data, store_system_metrics
+
+logger = logging.getLogger(__name__)
+
+# Collectors by data class; 'all' is only ever triggered manually
+COLLECTORS: Dict[str, Callable[[], Dict]] = {
+    "metrics": store_system_metrics,
+    "inventory": store_inventory_data,
+    "all": store_monitoring_data,
+}
+
+# Data classes whose runs write the same rows and must not run at the same time
+EXCLUSIVE_WITH: Dict[str, tuple] = {
+    "metrics": ("metrics", "all"),
+    "inventory": ("inventory", "all"),
+    "all": ("all", "metrics", "inventory"),
+}
+
+class CollectionScheduler:
+    """Background scheduler that snapshots vCenter data without overlapping runs"""
+
+    def __init__(self, intervals: Dict[str, int], jitter: float = 0.1):
+        """
+        Initialize the scheduler
+
+        Args:
+            intervals: Seconds between runs per data class (e.g. {"metrics": 60})
+            jitter: Random fraction of the interval added or removed per cycle
+        """
+        self.intervals = intervals
+        self.jitter = jitter
+        self._stop = threading.Event()
+        self._threads = []
+        self._state_lock = threading.Lock()
+        self._active_runs: Dict[str, int] = {}  # data_class -> run id in flight
+
+    def start(self):
+        """Start one loop thread per scheduled data class"""
+        if self._threads:
+            return
+        self._stop.clear()
+        for data_class, interval in self.intervals.items():
+            if interval <= 0:
+                continue
+            thread = threading.Thread(
+                target=self._loop,
+                args=(data_class, interval),
+                name=f"history-{data_class}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"History scheduler started: {self.intervals}")
+
+    def stop(self, timeout: float = 5.0):
+        """Signal the loops to exit and wait briefly for them"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def trigger(self, data_class: str, trigger: str = "manual") -> Dict:
+        """
+        Start a collection run now without waiting for it to finish
+
+        If a run of the same data class, or of one that stores the same rows
+        ('all' covers 'metrics' and 'inventory'), is already in flight, no new
+        run is started and the in-flight run is returned instead.
+
+        Returns:
+            Dict with run_id, data_class and status
+
+        Raises:
+            ValueError: If the data class is unknown
+        """
+        if data_class not in COLLECTORS:
+            raise ValueError(f"Invalid data_class. Must be one of: {', '.join(COLLECTORS)}")
+
+        with self._state_lock:
+            for active_class in EXCLUSIVE_WITH[data_class]:
+                active_id = self._active_runs.get(active_class)
+                if active_id is not None:
+                    return {"run_id": active_id, "data_class": active_class, "status": "running"}
+            run_id = self._create_run(data_class, trigger)
+            self._active_runs[data_class] = run_id
+
+        threading.Thread(
+            target=self._execute,
+            args=(data_class, run_id),
+            name=f"history-{data_class}-{run_id}",
+            daemon=True
+        ).start()
+        return {"run_id": run_id, "data_class": data_class, "status": "queued"}
+
+    def _loop(self, data_class: str, interval: int):
+        while not self._stop.wait(self._next_delay(interval)):
+            try:
+                self.trigger(data_class, trigger="schedule")
+            except Exception as e:
+                logger.error(f"Failed to schedule {data_class} collection: {str(e)}")
+
+    def _next_delay(self, interval: int) -> float:
+        spread = interval * self.jitter
+        return max(1.0, interval + random.uniform(-spread, spread))
+
+    def _execute(self, data_class: str, run_id: int):
+        started = time.perf_counter()
+        self._update_run(run_id, status="running", started_at=datetime.utcnow())
+        try:
+            result = COLLECTORS[data_class]()
+            self._update_run(
+                run_id,
+                status="succeeded",
+                finished_at=datetime.utcnow(),
+                duration_ms=(time.perf_counter() - started) * 1000,
+                records_stored=result.get("records_stored")
+            )
+        except Exception as e:
+            logger.error(f"History collection run {run_id} ({data_class}) failed: {str(e)}")
+            self._update_run(
+                run_id,
+                status="failed",
+                finished_at=datetime.utcnow(),
+                duration_ms=(time.perf_counter() - started) * 1000,
+                error=str(e)
+            )
+        finally:
+            with self._state_lock:
+                self._active_runs.pop(data_class, None)
+
+    def _create_run(self, data_class: str, trigger: str) -> int:
+        with session_scope() as db:
+            run = CollectionRun(data_class=data_class, trigger=trigger, status="queued")
+            db.add(run)
+            db.flush()
+            return run.id
+
+    def _update_run(self, run_id: int, **fields):
+        try:
+            with session_scope() as db:
+                db.query(CollectionRun).filter(CollectionRun.id == run_id).update(fields)
+        except Exception as e:
+            logger.error(f"Failed to record collection run {run_id}: {str(e)}")
+
+def get_collection_runs(data_class: Optional[str] = None, limit: int = 50):
+    """
+    Get the most recent collection runs
+
+    Args:
+        data_class (str): Optional data class to filter by
+        limit (int): Maximum number of runs to return
+
+    Returns:
+        list: Collection runs, newest first
+    """
+    with session_scope() as db:
+        query = db.query(CollectionRun)
+        if data_class:
+            query = query.filter(CollectionRun.data_class == data_class)
+        runs = query.order_by(CollectionRun.id.desc()).limit(limit).all()
+        return [_run_to_dict(run) for run in runs]
+
+def get_collection_run(run_id: int):
+    """
+    Get a single collection run by ID, or None if it does not exist
+    """
+    with session_scope() as db:
+        run = db.query(CollectionRun).filter(CollectionRun.id == run_id).first()
+        return _run_to_dict(run) if run else None
+
+def _run_to_dict(run: CollectionRun):
+    return {
+        "run_id": run.id,
+        "data_class": run.data_class,
+        "trigger": run.trigger,
+        "status": run.status,
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "duration_ms": run.duration_ms,
+        "records_stored": run.records_stored,
+        "error": run.error
+    }
+
+collection_scheduler = CollectionScheduler(
+    intervals={
+        "metrics": settings.HISTORY_METRICS_INTERVAL,
+        "inventory": settings.HISTORY_INVENTORY_INTERVAL,
+    },
+    jitter=settings.HISTORY_SCHEDULER_JITTER
+)
@@ -0,0 +1,687 @@
+"""
+Terraform Runner Service
+Provisions a workorder's VM by running terraform init/apply against the vSphere configuration
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+from app.metrics import metrics
+from models.workorder import WorkOrder
+
+logger = logging.getLogger(__name__)
+
+# Written into .terraform/ after a successful init; init is skipped while it matches
+INIT_MARKER = ".init-hash"
+
+# The plugin cache is not safe for concurrent writers. Only the first init of each configuration
+# fills it (and saves its .terraform for later workspaces), so only those inits take this lock
+_init_lock = threading.Lock()
+
+# Left behind by a terraform process that was killed while holding the local state lock
+STATE_LOCK_FILE = ".terraform.tfstate.lock.info"
+
+metrics.describe("terraform_phase_duration_seconds", "Duration of terraform init/apply per workorder execution")
+metrics.describe("terraform_init_skipped_total", "Executions that reused an up-to-date terraform init")
+
+class TerraformError(Exception):
+    """Raised when a terraform command exits non-zero; carries the log and timings collected so far"""
+
+    def __init__(self, message: str, log: str, timings: Optional[Dict] = None):
+        super().__init__(message)
+        self.log = log
+        self.timings = timings or {}
+        self.applied = []
+
+class ExecutionCancelled(TerraformError):
+    """Raised when an execution was cancelled or ran past its timeout; `reason` is 'cancelled' or 'timeout'"""
+
+    def __init__(self, message: str, log: str, timings: Optional[Dict] = None, reason: str = "cancelled"):
+        super().__init__(message, log, timings)
+        self.reason = reason
+
+class ExecutionControl:
+    """
+    Cancellation and wall-clock timeout of one execution
+
+    Each command runs in its own process group; `cancel` interrupts the
+    group (terraform then stops gracefully and writes its state) and kills
+    it if it is still alive `kill_grace` seconds later. A watchdog calls
+    `cancel("timeout")` once the deadline passes.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, kill_grace: Optional[float] = None,
+                 on_process: Optional[Callable[[Optional[int]], None]] = None):
+        self.timeout = timeout or None
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.kill_grace = settings.WORKORDER_KILL_GRACE if kill_grace is None else kill_grace
+        self.on_process = on_process
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._watchdog: Optional[threading.Timer] = None
+        if self.deadline is not None:
+            self._watchdog = threading.Timer(timeout, self.cancel, args=("timeout",))
+            self._watchdog.daemon = True
+            self._watchdog.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        Stop the execution; returns False if it was already stopping
+        """
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            process = self._process
+        if process is not None:
+            _terminate(process, self.kill_grace)
+        return True
+
+    def close(self):
+        """Stop the watchdog once the execution is over"""
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+
+    def attach(self, process: subprocess.Popen):
+        with self._lock:
+            self._process = process
+            stopping = self.reason is not None
+        if self.on_process:
+            self.on_process(process.pid)
+        if stopping:
+            _terminate(process, self.kill_grace)
+
+    def detach(self):
+        with self._lock:
+            self._process = None
+        if self.on_process:
+            self.on_process(None)
+
+    def message(self) -> str:
+        if self.reason == "timeout":
+            return f"Execution timed out after {self.timeout:.0f}s"
+        return "Execution cancelled"
+
+    def check(self, log: "ExecutionLog", timings: Optional[Dict] = None):
+        """Raise ExecutionCancelled if the execution has been stopped"""
+        if self.reason is not None:
+            log.emit(f"--- EXECUTION {'TIMED OUT' if self.reason == 'timeout' else 'CANCELLED'} ---")
+            raise ExecutionCancelled(self.message(), log.text(), timings, self.reason)
+
+def _signal_group(process: subprocess.Popen, force: bool):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL if force else signal.SIGINT)
+        elif force:
+            process.kill()
+        else:
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+def _terminate(process: subprocess.Popen, grace: float):
+    """Interrupt a process group now and kill it if it outlives `grace` seconds"""
+    if process.poll() is not None:
+        return
+    _signal_group(process, force=False)
+
+    def escalate():
+        try:
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Terraform process {process.pid} ignored the interrupt, killing its process group")
+            _signal_group(process, force=True)
+
+    threading.Thread(target=escalate, name=f"terraform-kill-{process.pid}", daemon=True).start()
+
+def reap_process_group(pid: int) -> bool:
+    """
+    Kill a terraform process group left behind by a previous service process
+
+    The PID is only signalled while it still belongs to terraform, so a
+    recycled PID is never touched. POSIX only.
+
+    Returns:
+        bool: True if a process group was killed
+    """
+    if os.name != "posix":
+        return False
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as cmdline:
+            if b"terraform" not in cmdline.read():
+                return False
+        os.killpg(pid, signal.SIGKILL)
+        return True
+    except (FileNotFoundError, ProcessLookupError, PermissionError, OSError):
+        return False
+
+def build_tfvars(order: WorkOrder) -> Dict:
+    """
+    Build the Terraform variable values for a workorder
+
+    Returns:
+        dict: Variables of the vsphere-vm module, written out as a .tfvars.json file
+    """
+    nics_value = order.nics or [{"network_id": order.network_id, "ip": order.ip}]
+
+    tfvars = {
+        "vm_name": order.name,
+        "datacenter_name": (getattr(order, 'datacenter_name', None) or 'Datacenter').strip(),
+        "os": order.os,
+    }
+    if order.template_id:
+        tfvars["template_id"] = order.template_id
+    else:
+        if order.hardware_version:
+            tfvars["hardware_version"] = order.hardware_version
+        if order.scsi_controller_type:
+            tfvars["scsi_controller_type"] = order.scsi_controller_type
+    # template clones are re-attached to the requested network as well; a nic's
+    # network_id is the port group name reported by GET /networks/
+    tfvars["nics"] = [
+        {
+            "network_name": nic.get("network_name") or nic.get("network_id") or order.network_id or "VM Network",
+            "ip": nic.get("ip") or "",
+        }
+        for nic in nics_value
+    ]
+    tfvars["cpu"] = order.cpu
+    tfvars["ram"] = order.ram
+    optional = {
+        "host_system_id": order.host_id,
+        "resource_pool_id": order.resource_pool_id,
+        "ip_pool_id": order.ip_pool_id,
+        "folder": order.folder_id,
+        "datastore_id": order.datastore_id,
+        "hostname": order.hostname,
+        "ip": order.ip,
+        "netmask": order.netmask,
+        "gateway": order.gateway,
+        "domain": order.domain,
+    }
+    tfvars.update({key: value for key, value in optional.items() if value})
+    return tfvars
+
+def find_terraform() -> str:
+    """
+    Locate the terraform binary
+
+    Raises:
+        Exception: If no binary can be found
+    """
+    terraform_bin = os.environ.get('TERRAFORM_PATH') or shutil.which('terraform') or r'D:\terraform\terraform.exe'
+    if not terraform_bin:
+        raise Exception("Terraform binary not found. Set TERRAFORM_PATH env variable or add terraform to PATH.")
+    return terraform_bin
+
+def terraform_env() -> Dict[str, str]:
+    """Environment for terraform commands, including the vSphere provider credentials"""
+    env = os.environ.copy()
+    env["TF_PLUGIN_CACHE_DIR"] = settings.TERRAFORM_PLUGIN_CACHE_DIR
+    env["TF_CLI_CONFIG_FILE"] = _cli_config_path()
+    env["TF_IN_AUTOMATION"] = "1"
+    env["TF_VAR_vsphere_user"] = settings.VCENTER_USER
+    env["TF_VAR_vsphere_password"] = settings.VCENTER_PASSWORD
+    env["TF_VAR_vsphere_server"] = settings.VCENTER_URL
+    return env
+
+def _cli_config_path() -> str:
+    return os.path.join(settings.TERRAFORM_PLUGIN_CACHE_DIR, "terraform.rc")
+
+def write_cli_config() -> str:
+    """
+    Write the Terraform CLI config used by every run
+
+    Providers are installed from the local filesystem mirror when it has them
+    and from the registry otherwise; either way they land in the shared plugin
+    cache, so a provider is unpacked at most once per host.
+
+    Returns:
+        str: Path of the CLI config file
+    """
+    cache_dir = settings.TERRAFORM_PLUGIN_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    lines = [f'plugin_cache_dir = {json.dumps(cache_dir)}', "", "provider_installation {"]
+    mirror = settings.TERRAFORM_PROVIDER_MIRROR
+    if mirror and os.path.isdir(mirror):
+        lines += ["  filesystem_mirror {", f"    path = {json.dumps(mirror)}", "  }"]
+    lines += ["  direct {}", "}", ""]
+    content = "\n".join(lines)
+
+    path = _cli_config_path()
+    if not os.path.exists(path) or open(path).read() != content:
+        with open(path, "w") as config_file:
+            config_file.write(content)
+    return path
+
+def prime_plugin_cache():
+    """
+    Fill the plugin cache once by running init in a scratch workspace
+
+    Meant to run in the background at startup so the first real execution
+    finds the vSphere provider already unpacked.
+    """
+    try:
+        write_cli_config()
+        workspace = prepare_workspace(os.path.join(settings.TERRAFORM_WORKSPACES_DIR, "_prime"))
+        started = time.perf_counter()
+        result = init_workspace(workspace)
+        logger.info(
+            f"Terraform plugin cache primed in {time.perf_counter() - started:.1f}s "
+            f"(skipped={result['skipped']})"
+        )
+    except Exception as e:
+        logger.error(f"Failed to prime terraform plugin cache: {str(e)}")
+
+def workspace_fingerprint(workspace: str) -> str:
+    """
+    Hash of everything init depends on: root *.tf, the lock file, module sources and the CLI config
+    """
+    digest = hashlib.sha256()
+    paths = glob.glob(os.path.join(workspace, "*.tf"))
+    paths.append(os.path.join(workspace, ".terraform.lock.hcl"))
+    for root, _, files in os.walk(os.path.join(workspace, "modules"), followlinks=True):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith(".tf"))
+    paths.append(_cli_config_path())
+    for path in sorted(paths):
+        if not os.path.exists(path):
+            continue
+        digest.update(os.path.relpath(path, workspace).encode())
+        with open(path, "rb") as source:
+            digest.update(hashlib.sha256(source.read()).digest())
+    return digest.hexdigest()
+
+class ExecutionLog:
+    """
+    Output of one execution: every line goes to `on_output`, only the last `tail_lines` are kept
+
+    The tail is what ends up in the job's `log` and the workorder's
+    `last_execution_log`; the full output is persisted in chunks by the job log buffer.
+    """
+
+    def __init__(self, on_output: Optional[Callable[[str], None]] = None, tail_lines: Optional[int] = None):
+        self.on_output = on_output
+        self.lines: deque = deque(maxlen=tail_lines or settings.JOB_LOG_TAIL_LINES)
+
+    def emit(self, line: str):
+        self.lines.append(line)
+        if self.on_output:
+            try:
+                self.on_output(line)
+            except Exception as e:
+                logger.error(f"Failed to forward execution output: {str(e)}")
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def last(self, count: int = 5) -> str:
+        return "\n".join(list(self.lines)[-count:])
+
+def stream_command(args: List[str], cwd: str, env: Dict[str, str], emit: Callable[[str], None],
+                   control: Optional[ExecutionControl] = None) -> int:
+    """
+    Run a command, passing each line of its combined stdout/stderr to `emit` as it is produced
+
+    The command gets its own process group so `control` can signal it together
+    with the provider plugins it spawns.
+
+    Returns:
+        int: The exit code
+    """
+    if os.name == "posix":
+        group = {"start_new_session": True}
+    else:
+        group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    process = subprocess.Popen(
+        args, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, bufsize=1, errors="replace", **group
+    )
+    if control:
+        control.attach(process)
+    try:
+        with process.stdout:
+            for line in process.stdout:
+                emit(line.rstrip("\n"))
+        return process.wait()
+    finally:
+        if control:
+            control.detach()
+
+def init_workspace(workspace: str, log: Optional[ExecutionLog] = None,
+                   control: Optional[ExecutionControl] = None) -> Dict:
+    """
+    Make a workspace's terraform init current, running init only when no earlier one can be reused
+
+    init is skipped while the workspace's own last init still matches its
+    fingerprint. A workspace without one gets a copy of the first init made
+    for the same configuration; only that first init runs terraform, under
+    the plugin cache lock.
+
+    Returns:
+        Dict with skipped and seconds
+
+    Raises:
+        TerraformError: If init fails
+        ExecutionCancelled: If `control` stops the execution
+    """
+    log = log or ExecutionLog()
+    marker = os.path.join(workspace, ".terraform", INIT_MARKER)
+    fingerprint = workspace_fingerprint(workspace)
+    if os.path.exists(marker) and open(marker).read() == fingerprint:
+        metrics.inc("terraform_init_skipped_total")
+        log.emit("--- TERRAFORM INIT SKIPPED (lock file and modules unchanged) ---")
+        return {"skipped": True, "seconds": 0.0}
+
+    saved = saved_init_path(fingerprint)
+    if _reuse_init(saved, workspace, log):
+        return {"skipped": True, "seconds": 0.0}
+    with _init_lock:
+        # another execution may have initialised this configuration while we waited
+        if _reuse_init(saved, workspace, log):
+            return {"skipped": True, "seconds": 0.0}
+        result = _run_init(workspace, log, control)
+        try:
+            _save_init(workspace, saved)
+        except OSError as e:
+            logger.warning(f"Failed to save terraform init for reuse: {str(e)}")
+    return result
+
+def saved_init_path(fingerprint: str) -> str:
+    """
+    Where the first init of a configuration is kept for later workspaces
+
+    It sits next to the workspaces, so the relative provider links terraform
+    writes into .terraform/ resolve the same from every copy.
+    """
+    return os.path.join(settings.TERRAFORM_WORKSPACES_DIR, f"_init-{fingerprint[:16]}")
+
+def _run_init(workspace: str, log: ExecutionLog, control: Optional[ExecutionControl]) -> Dict:
+    log.emit("--- TERRAFORM INIT ---")
+    started = time.perf_counter()
+    if control:
+        control.check(log)
+    returncode = stream_command(
+        [find_terraform(), "init", "-input=false", "-no-color"], workspace, terraform_env(), log.emit, control
+    )
+    seconds = time.perf_counter() - started
+    metrics.observe("terraform_phase_duration_seconds", seconds, labels={"phase": "init"})
+    if control:
+        control.check(log, {"init_seconds": seconds, "init_skipped": False})
+    if returncode != 0:
+        raise TerraformError(
+            f"Terraform init failed (exit code {returncode}): {log.last()}",
+            log.text(),
+            {"init_seconds": seconds, "init_skipped": False}
+        )
+
+    # init may rewrite the lock file, so fingerprint the workspace as it is now
+    _write_init_marker(workspace)
+    return {"skipped": False, "seconds": seconds}
+
+def _write_init_marker(workspace: str):
+    marker = os.path.join(workspace, ".terraform", INIT_MARKER)
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    with open(marker, "w") as marker_file:
+        marker_file.write(workspace_fingerprint(workspace))
+
+def _save_init(workspace: str, saved: str):
+    """Keep a copy of a workspace's fresh .terraform and lock file; published with one rename"""
+    staging = f"{saved}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.copytree(os.path.join(workspace, ".terraform"), os.path.join(staging, ".terraform"), symlinks=True)
+    lock_file = os.path.join(workspace, ".terraform.lock.hcl")
+    if os.path.exists(lock_file):
+        shutil.copy2(lock_file, staging)
+    try:
+        os.rename(staging, saved)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+def _reuse_init(saved: str, workspace: str, log: ExecutionLog) -> bool:
+    """Copy a saved init into a workspace; False when there is none or it cannot be copied"""
+    if not os.path.isdir(saved):
+        return False
+    target = os.path.join(workspace, ".terraform")
+    try:
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(os.path.join(saved, ".terraform"), target, symlinks=True)
+        lock_file = os.path.join(saved, ".terraform.lock.hcl")
+        if os.path.exists(lock_file):
+            shutil.copy2(lock_file, workspace)
+        _write_init_marker(workspace)
+    except OSError as e:
+        logger.warning(f"Failed to reuse terraform init {saved}: {str(e)}")
+        return False
+    metrics.inc("terraform_init_skipped_total")
+    log.emit(f"--- TERRAFORM INIT SKIPPED (copied from {os.path.basename(saved)}) ---")
+    return True
+
+def workspace_path(workorder_id: int) -> str:
+    """Working directory holding a workorder's root configuration and state"""
+    return os.path.join(settings.TERRAFORM_WORKSPACES_DIR, f"workorder-{workorder_id}")
+
+def group_workspace_path(group_key: str) -> str:
+    """Working directory of a grouped (for_each) batch apply"""
+    return os.path.join(settings.TERRAFORM_WORKSPACES_DIR, group_key)
+
+def list_workspaces() -> List[str]:
+    """Names of the workorder and batch workspaces on disk"""
+    if not os.path.isdir(settings.TERRAFORM_WORKSPACES_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(settings.TERRAFORM_WORKSPACES_DIR)
+        if name.startswith(("workorder-", "batch-"))
+        and os.path.isdir(os.path.join(settings.TERRAFORM_WORKSPACES_DIR, name))
+    )
+
+def workspace_has_resources(workspace: str) -> bool:
+    """True if the workspace state records any resource (or cannot be read, to stay on the safe side)"""
+    state_path = os.path.join(workspace, "terraform.tfstate")
+    if not os.path.exists(state_path):
+        return False
+    try:
+        with open(state_path) as state_file:
+            return bool(json.load(state_file).get("resources"))
+    except Exception:
+        return True
+
+def clean_workspace(workspace: str) -> List[str]:
+    """
+    Remove what an interrupted run leaves in a workspace: the stale state lock and crash logs
+
+    Only call this while no terraform process uses the workspace.
+
+    Returns:
+        list: Names of the removed files
+    """
+    removed = []
+    for name in (STATE_LOCK_FILE, "crash.log", "workorder.tfvars.json"):
+        path = os.path.join(workspace, name)
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+                removed.append(name)
+            except OSError as e:
+                logger.warning(f"Failed to remove {path}: {str(e)}")
+    return removed
+
+def prepare_workspace(workspace: str, config_dir: Optional[str] = None) -> str:
+    """
+    Create or refresh an isolated Terraform working directory
+
+    The root *.tf files (from `config_dir`, the top-level configuration by
+    default) are copied in so each workspace keeps its own terraform.tfstate,
+    while `modules/` points at the shared module source (a symlink, or a copy
+    where symlinks are not permitted).
+
+    Returns:
+        str: Path of the workspace
+    """
+    source_dir = settings.TERRAFORM_DIR
+    os.makedirs(workspace, exist_ok=True)
+
+    for source in glob.glob(os.path.join(config_dir or source_dir, "*.tf")):
+        shutil.copy2(source, os.path.join(workspace, os.path.basename(source)))
+    lock_file = os.path.join(source_dir, ".terraform.lock.hcl")
+    if os.path.exists(lock_file) and not os.path.exists(os.path.join(workspace, ".terraform.lock.hcl")):
+        shutil.copy2(lock_file, workspace)
+
+    modules_link = os.path.join(workspace, "modules")
+    modules_source = os.path.join(source_dir, "modules")
+    if not os.path.lexists(modules_link):
+        try:
+            os.symlink(modules_source, modules_link, target_is_directory=True)
+        except OSError:
+            shutil.copytree(modules_source, modules_link)
+    elif not os.path.islink(modules_link):
+        shutil.rmtree(modules_link)
+        shutil.copytree(modules_source, modules_link)
+    return workspace
+
+def run_workorder(workorder_id: int, tfvars: Dict, on_phase: Optional[Callable[[str], None]] = None,
+                  on_output: Optional[Callable[[str], None]] = None,
+                  control: Optional[ExecutionControl] = None) -> Dict:
+    """
+    Run terraform init and apply for one workorder in its own workspace
+
+    Args:
+        workorder_id: Workorder whose workspace (and state) to use
+        tfvars: Variable values from build_tfvars
+        on_phase: Optional callback invoked with 'init' and 'apply' as each step starts
+        on_output: Optional callback invoked with every output line as it is produced
+        control: Optional cancellation / timeout handle
+
+    Returns:
+        Dict with the tail of the execution log and init/apply timings
+
+    Raises:
+        TerraformError: If init or apply fails
+        ExecutionCancelled: If the execution was cancelled or timed out
+    """
+    return _run_in_workspace(workspace_path(workorder_id), None, tfvars, on_phase, on_output, control)
+
+def run_workorder_group(group_key: str, tfvars_by_workorder: Dict[int, Dict],
+                        on_phase: Optional[Callable[[str], None]] = None,
+                        on_output: Optional[Callable[[str], None]] = None,
+                        control: Optional[ExecutionControl] = None) -> Dict:
+    """
+    Provision several workorders with one `for_each` apply of the batch configuration
+
+    Args:
+        group_key: Name of the group's workspace (e.g. 'batch-3-0')
+        tfvars_by_workorder: Workorder ID -> variable values from build_tfvars
+        on_phase: Optional callback invoked with 'init' and 'apply' as each step starts
+        on_output: Optional callback invoked with every output line as it is produced
+        control: Optional cancellation / timeout handle
+
+    Returns:
+        Dict like run_workorder plus `applied`, the workorder IDs present in state afterwards.
+        On failure the raised TerraformError carries the same list as `applied`.
+    """
+    tfvars = {"vms": {f"workorder-{workorder_id}": values for workorder_id, values in tfvars_by_workorder.items()}}
+    workspace = group_workspace_path(group_key)
+    config_dir = os.path.join(settings.TERRAFORM_DIR, "batch")
+    try:
+        result = _run_in_workspace(workspace, config_dir, tfvars, on_phase, on_output, control)
+    except TerraformError as e:
+        e.applied = _applied_workorders(workspace)
+        raise
+    result["applied"] = _applied_workorders(workspace)
+    return result
+
+def _applied_workorders(workspace: str):
+    """Workorder IDs whose module instance is recorded in the workspace state"""
+    try:
+        result = subprocess.run(
+            [find_terraform(), "state", "list"],
+            cwd=workspace, capture_output=True, text=True, env=terraform_env()
+        )
+    except Exception:
+        return []
+    applied = set()
+    for address in result.stdout.splitlines():
+        if address.startswith('module.vm["workorder-') and address.endswith("vsphere_virtual_machine.vm"):
+            applied.add(int(address.split('"')[1].split("-", 1)[1]))
+    return sorted(applied)
+
+def _run_in_workspace(workspace: str, config_dir: Optional[str], tfvars: Dict,
+                      on_phase: Optional[Callable[[str], None]],
+                      on_output: Optional[Callable[[str], None]],
+                      control: Optional[ExecutionControl] = None) -> Dict:
+    log = ExecutionLog(on_output)
+    timings: Dict = {}
+    tfvars_content = json.dumps(tfvars, indent=2)
+    log.emit("--- TFVARS CONTENT ---")
+    for line in tfvars_content.split("\n"):
+        log.emit(line)
+
+    tfvars_path = None
+    try:
+        terraform_bin = find_terraform()
+        write_cli_config()
+        tf_dir = prepare_workspace(workspace, config_dir)
+        tfvars_path = os.path.join(tf_dir, "workorder.tfvars.json")
+        with open(tfvars_path, "w") as tfvars_file:
+            tfvars_file.write(tfvars_content)
+        env = terraform_env()
+        log.emit(f"--- WORKSPACE {tf_dir} ---")
+
+        if on_phase:
+            on_phase("init")
+        result_init = init_workspace(tf_dir, log, control)
+        timings["init_seconds"] = result_init["seconds"]
+        timings["init_skipped"] = result_init["skipped"]
+
+        if on_phase:
+            on_phase("apply")
+        log.emit("--- TERRAFORM APPLY ---")
+        started = time.perf_counter()
+        returncode = stream_command(
+            [terraform_bin, "apply", "-auto-approve", "-input=false", "-no-color", f"-var-file={tfvars_path}"],
+            tf_dir, env, log.emit, control
+        )
+        timings["apply_seconds"] = time.perf_counter() - started
+        metrics.observe("terraform_phase_duration_seconds", timings["apply_seconds"], labels={"phase": "apply"})
+        if control:
+            control.check(log, timings)
+        if returncode != 0:
+            raise TerraformError(f"Terraform apply failed (exit code {returncode}): {log.last()}", log.text(), timings)
+
+        return {"log": log.text(), "timings": timings}
+    except ExecutionCancelled as e:
+        e.timings = {**e.timings, **timings}
+        # the process group is gone by now; a forced kill may have left the state lock behind
+        if os.path.exists(os.path.join(workspace, STATE_LOCK_FILE)):
+            clean_workspace(workspace)
+        raise
+    except TerraformError as e:
+        e.timings = {**e.timings, **timings}
+        raise
+    except Exception as e:
+        log.emit("--- ERROR ---")
+        log.emit(str(e))
+        raise TerraformError(str(e), log.text(), timings)
+    finally:
+        # the variables hold the VM's addressing; they are rewritten on every run
+        if tfvars_path and os.path.exists(tfvars_path):
+            try:
+                os.remove(tfvars_path)
+            except OSError as e:
+                logger.warning(f"Failed to remove {tfvars_path}: {str(e)}")
@@ -0,0 +1,290 @@
+"""
+VNI Workorder Excel Export
+Ooredoo-styled VNI workbooks, streamed straight into the HTTP response
+"""
+
+import io
+import threading
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.spreadsheet_drawing import SpreadsheetDrawing
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._writer import WorksheetWriter
+from openpyxl.writer.excel import ExcelWriter
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import read_session_scope
+from app.metrics import metrics
+from models.vni_workorder import VNIWorkOrder
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+metrics.describe("vni_excel_cache_total", "Single VNI workorder Excel exports served from the cache (hit) or rendered (miss)")
+
+# Bytes of compressed workbook gathered before a chunk is sent
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Ooredoo theme (red and white), shared by every workbook
+RED_FILL = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+WHITE_FILL = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
+RED_FONT = Font(color="FF0000", bold=True, size=14)
+WHITE_FONT = Font(color="FFFFFF", bold=True, size=12)
+BLACK_FONT = Font(color="000000", size=11)
+BOLD_BLACK_FONT = Font(color="000000", bold=True, size=11)
+THIN_BORDER = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
+CENTER = Alignment(horizontal="center", vertical="center")
+LEFT = Alignment(horizontal="left", vertical="center")
+
+# name -> (font, fill, border, alignment); registered once per workbook so cells share one style record each
+STYLES = {
+    "vni_brand": (RED_FONT, None, None, LEFT),
+    "vni_title": (WHITE_FONT, RED_FILL, None, CENTER),
+    "vni_label": (WHITE_FONT, RED_FILL, THIN_BORDER, LEFT),
+    "vni_value": (BLACK_FONT, WHITE_FILL, THIN_BORDER, LEFT),
+    "vni_header": (WHITE_FONT, RED_FILL, THIN_BORDER, CENTER),
+    "vni_cell": (BLACK_FONT, WHITE_FILL, THIN_BORDER, CENTER),
+    "vni_cell_bold": (BOLD_BLACK_FONT, WHITE_FILL, THIN_BORDER, CENTER),
+}
+
+def _date(value: Optional[datetime]) -> str:
+    return value.strftime("%m/%d/%Y") if value else ""
+
+# (header, column, width, style); the first eleven are the single-workorder table, so the import reads both
+BULK_COLUMNS = [
+    ("Projet", VNIWorkOrder.project, 15, "vni_cell"),
+    ("t0-gw", VNIWorkOrder.t0_gw, 12, "vni_cell"),
+    ("t1-gw", VNIWorkOrder.t1_gw, 12, "vni_cell"),
+    ("Description", VNIWorkOrder.description, 15, "vni_cell"),
+    ("vni name", VNIWorkOrder.vni_name, 40, "vni_cell"),
+    ("CIDR", VNIWorkOrder.cidr, 15, "vni_cell"),
+    ("Masque", VNIWorkOrder.subnet_mask, 15, "vni_cell"),
+    ("gateway", VNIWorkOrder.gateway, 15, "vni_cell_bold"),
+    ("first Ip", VNIWorkOrder.first_ip, 12, "vni_cell"),
+    ("last IP", VNIWorkOrder.last_ip, 12, "vni_cell"),
+    ("number", VNIWorkOrder.number_of_ips, 8, "vni_cell"),
+    ("Owner", VNIWorkOrder.owner, 15, "vni_cell"),
+    ("Requested By", VNIWorkOrder.requested_by, 15, "vni_cell"),
+    ("Requested Date", VNIWorkOrder.requested_date, 15, "vni_cell"),
+    ("Dead Line", VNIWorkOrder.deadline, 12, "vni_cell"),
+    ("Status", VNIWorkOrder.status, 12, "vni_cell"),
+    ("ID", VNIWorkOrder.id, 8, "vni_cell"),
+]
+
+def add_named_styles(workbook: Workbook):
+    """Register the Ooredoo styles on a workbook"""
+    for name, (font, fill, border, alignment) in STYLES.items():
+        style = NamedStyle(name=name, font=font, alignment=alignment)
+        if fill is not None:
+            style.fill = fill
+        if border is not None:
+            style.border = border
+        workbook.add_named_style(style)
+
+class _ChunkSink:
+    """Write-only file object collecting the zip output until the response takes it"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+class _StreamedSheetsWriter(ExcelWriter):
+    """ExcelWriter for worksheets whose XML was already streamed into the archive"""
+
+    def write_worksheet(self, ws):
+        ws._drawing = SpreadsheetDrawing()
+        ws._drawing.charts = ws._charts
+        ws._drawing.images = ws._images
+        ws._rels = ws._writer._rels
+        self.manifest.append(ws)
+
+def stream_vni_workorders_xlsx(statuses: Optional[List[str]] = None, created_from: Optional[datetime] = None,
+                               created_to: Optional[datetime] = None, batch_size: int = 500) -> Iterator[bytes]:
+    """
+    Stream an .xlsx of many VNI workorders, one row each, oldest first
+
+    Rows come from a server-side cursor in batches of `batch_size` and go
+    through an openpyxl write-only sheet whose XML is written directly into
+    the deflate stream of its zip entry, not into a temporary file. The
+    compressed bytes are yielded every STREAM_CHUNK_BYTES, so memory stays
+    bounded and nothing touches the disk whatever the number of rows.
+
+    Yields:
+        bytes: Consecutive pieces of the workbook file
+    """
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED)
+    workbook = Workbook(write_only=True)
+    add_named_styles(workbook)
+    ws = workbook.create_sheet("VNI Workorders")
+    ws._id = 1  # fixes ws.path before the workbook writer numbers the sheets
+    last_column = get_column_letter(len(BULK_COLUMNS))
+    for index, (_, _, width, _) in enumerate(BULK_COLUMNS, 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+    ws.merged_cells.add(f"A1:{last_column}1")
+    ws.merged_cells.add(f"A2:{last_column}2")
+
+    entry = archive.open(ws.path[1:], "w")
+    ws._writer = WorksheetWriter(ws, out=entry)
+    ws._writer.write_top()
+    ws.append([_cell(ws, "ooredoo", "vni_brand")])
+    ws.append([_cell(ws, "Création VNI", "vni_title")])
+    ws.append([_cell(ws, header, "vni_header") for header, _, _, _ in BULK_COLUMNS])
+
+    stmt = select(*[column for _, column, _, _ in BULK_COLUMNS])
+    if statuses:
+        stmt = stmt.where(VNIWorkOrder.status.in_(statuses))
+    if created_from:
+        stmt = stmt.where(VNIWorkOrder.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(VNIWorkOrder.created_at < created_to)
+    stmt = stmt.order_by(VNIWorkOrder.created_at.asc(), VNIWorkOrder.id.asc())
+    # a write-only sheet serializes each row as it is appended, so one styled cell per column is reused
+    cells = [_cell(ws, None, style) for _, _, _, style in BULK_COLUMNS]
+    with read_session_scope() as db:
+        for row in db.execute(stmt.execution_options(yield_per=batch_size)):
+            for cell, value in zip(cells, row):
+                cell.value = _date(value) if isinstance(value, datetime) else value
+            ws.append(cells)
+            if sink.size >= STREAM_CHUNK_BYTES:
+                yield sink.drain()
+
+    ws.close()
+    entry.close()
+    _StreamedSheetsWriter(workbook, archive).save()
+    yield sink.drain()
+
+def _cell(ws, value, style: str) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+INFO_LABELS = ["Owner:", "Requested Date:", "Requested By:", "Virtual Machines:", "Dead Line :"]
+SINGLE_COLUMNS = BULK_COLUMNS[:11]
+
+class _SingleSheetTemplate:
+    """
+    The one-workorder sheet, laid out and styled once per process
+
+    Only the value cells change between renders, so every export reuses the
+    same workbook: fill in the values, save to memory. A lock serializes renders.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.workbook = Workbook()
+        add_named_styles(self.workbook)
+        ws = self.workbook.active
+        ws.title = "VNI Configuration"
+        last_column = get_column_letter(len(SINGLE_COLUMNS))
+        ws.merge_cells(f"A1:{last_column}1")
+        ws["A1"].value = "ooredoo"
+        ws["A1"].style = "vni_brand"
+        for row, label in enumerate(INFO_LABELS, 2):
+            ws[f"A{row}"].value = label
+            ws[f"A{row}"].style = "vni_label"
+            ws[f"B{row}"].style = "vni_value"
+        ws.merge_cells(f"A7:{last_column}7")
+        ws["A7"].value = "Création VNI"
+        ws["A7"].style = "vni_title"
+        for col, (header, _, width, style) in enumerate(SINGLE_COLUMNS, 1):
+            ws.cell(row=8, column=col, value=header).style = "vni_header"
+            ws.cell(row=9, column=col).style = style
+            ws.column_dimensions[get_column_letter(col)].width = width
+        self.worksheet = ws
+
+    def render(self, vni_workorder: VNIWorkOrder) -> bytes:
+        info_values = [
+            vni_workorder.owner,
+            _date(vni_workorder.requested_date),
+            vni_workorder.requested_by,
+            str(len(vni_workorder.virtual_machines)) if vni_workorder.virtual_machines else "0",
+            _date(vni_workorder.deadline),
+        ]
+        data_values = [getattr(vni_workorder, column.key) for _, column, _, _ in SINGLE_COLUMNS]
+        data_values[-1] = str(data_values[-1])
+        buffer = io.BytesIO()
+        with self.lock:
+            ws = self.worksheet
+            for row, value in enumerate(info_values, 2):
+                ws[f"B{row}"].value = value
+            for col, value in enumerate(data_values, 1):
+                ws.cell(row=9, column=col).value = value
+            self.workbook.save(buffer)
+        return buffer.getvalue()
+
+class ExcelCache:
+    """Rendered single-workorder exports, least recently used first out once over max_bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[datetime, str, bytes]]" = OrderedDict()  # id -> (updated_at, filename, data)
+        self._bytes = 0
+
+    def get(self, vni_workorder_id: int, updated_at: datetime) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(vni_workorder_id)
+            if entry is None or entry[0] != updated_at:
+                return None
+            self._entries.move_to_end(vni_workorder_id)
+            return entry[1], entry[2]
+
+    def put(self, vni_workorder_id: int, updated_at: datetime, filename: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(vni_workorder_id, None)
+            if old is not None:
+                self._bytes -= len(old[2])
+            self._entries[vni_workorder_id] = (updated_at, filename, data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+_template: Optional[_SingleSheetTemplate] = None
+_template_lock = threading.Lock()
+excel_cache = ExcelCache(settings.VNI_EXCEL_CACHE_BYTES)
+
+def cached_vni_workorder_xlsx(vni_workorder_id: int, updated_at: datetime) -> Optional[Tuple[str, bytes]]:
+    """Return (filename, bytes) of a previous export still matching updated_at, or None"""
+    cached = excel_cache.get(vni_workorder_id, updated_at)
+    metrics.inc("vni_excel_cache_total", labels={"result": "hit" if cached else "miss"})
+    return cached
+
+def render_vni_workorder_xlsx(vni_workorder: VNIWorkOrder) -> Tuple[str, bytes]:
+    """
+    Render the Ooredoo sheet of one VNI workorder in memory and cache it under (id, updated_at)
+
+    Returns:
+        tuple: (filename, .xlsx bytes)
+    """
+    global _template
+    with _template_lock:
+        if _template is None:
+            _template = _SingleSheetTemplate()
+    data = _template.render(vni_workorder)
+    filename = f"VNI_Configuration_{vni_workorder.vni_name}_{vni_workorder.id}.xlsx"
+    excel_cache.put(vni_workorder.id, vni_workorder.updated_at, filename, data)
+    return filename, data
@@ -0,0 +1,288 @@
+"""
+VNI Workorder Excel Import
+Streams Ooredoo VNI sheets (the layout written by the Excel export) into vni_workorders
+"""
+
+import ipaddress
+import logging
+import zipfile
+from datetime import date, datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from models.vni_workorder import VNIWorkOrder
+from services import ipam
+from services.cidr_index import cidr_index, parse_cidr, check_addresses, describe_conflicts
+
+logger = logging.getLogger(__name__)
+
+# normalized header text -> VNIWorkOrder field; the first names are the exports' own headers
+# owner and date columns (bulk export) win over the information block
+COLUMNS = {
+    "projet": "project", "project": "project",
+    "t0gw": "t0_gw",
+    "t1gw": "t1_gw",
+    "description": "description",
+    "vniname": "vni_name",
+    "cidr": "cidr",
+    "masque": "subnet_mask", "mask": "subnet_mask", "subnetmask": "subnet_mask",
+    "gateway": "gateway",
+    "firstip": "first_ip",
+    "lastip": "last_ip",
+    "number": "number_of_ips", "numberofips": "number_of_ips",
+    "priority": "priority",
+    "notes": "notes",
+    "owner": "owner",
+    "requestedby": "requested_by",
+    "requesteddate": "requested_date",
+    "deadline": "deadline",
+}
+
+# normalized label of the information block above the table -> field
+INFO_LABELS = {
+    "owner": "owner",
+    "requesteddate": "requested_date",
+    "requestedby": "requested_by",
+    "deadline": "deadline",
+}
+
+REQUIRED_FIELDS = ("project", "t0_gw", "t1_gw", "description", "vni_name", "cidr", "gateway")
+
+def _key(value) -> str:
+    return "".join(ch for ch in str(value).lower() if ch.isalnum())
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+def _date(value) -> Optional[datetime]:
+    """
+    Raises:
+        ValueError: If a text date is in none of the accepted formats
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in ("%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {text}")
+
+def iter_vni_rows(file: BinaryIO) -> Iterator[Tuple[str, int, Dict, Dict]]:
+    """
+    Stream the VNI rows of every sheet of a workbook
+
+    The workbook is opened read-only, so openpyxl parses rows lazily from
+    the zip stream and memory does not grow with the number of rows. In each
+    sheet, the labelled cells above the table (Owner:, Requested Date:, ...)
+    apply to every row, and the table starts after the row whose headers
+    include CIDR and vni name.
+
+    Yields:
+        tuple: (sheet title, row number, raw field values, sheet information block)
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            info: Dict = {}
+            columns: Optional[Dict[int, str]] = None
+            for row_number, row in enumerate(worksheet.iter_rows(values_only=True), 1):
+                if not any(_text(cell) for cell in row):
+                    continue
+                if columns is None:
+                    keys = [_key(cell) if cell is not None else "" for cell in row]
+                    if "cidr" in keys and "vniname" in keys:
+                        columns = {i: COLUMNS[key] for i, key in enumerate(keys) if key in COLUMNS}
+                    elif keys[0] in INFO_LABELS and len(row) > 1:
+                        info[INFO_LABELS[keys[0]]] = row[1]
+                    continue
+                fields = {field: row[i] for i, field in columns.items() if i < len(row)}
+                yield worksheet.title, row_number, fields, info
+    finally:
+        workbook.close()
+
+def build_vni_workorder(fields: Dict, info: Dict, defaults: Dict) -> Tuple[Optional[VNIWorkOrder], List[str]]:
+    """
+    Validate one sheet row and build its (unsaved) VNI workorder
+
+    Missing first/last IPs are planned by IPAM from number_of_ips, a missing
+    subnet mask comes from the CIDR and a missing number_of_ips from the range.
+
+    Returns:
+        tuple: (workorder or None, error messages)
+    """
+    values = {field: _text(value) for field, value in fields.items()}
+    errors = [f"{field} is required" for field in REQUIRED_FIELDS if not values.get(field)]
+    owner = values.get("owner") or _text(info.get("owner")) or defaults.get("owner")
+    requested_by = values.get("requested_by") or _text(info.get("requested_by")) or defaults.get("requested_by")
+    if not owner:
+        errors.append("owner is required (Owner: cell or owner field)")
+    if not requested_by:
+        errors.append("requested_by is required (Requested By: cell or requested_by field)")
+    dates = {}
+    for field in ("requested_date", "deadline"):
+        try:
+            dates[field] = _date(fields.get(field)) or _date(info.get(field)) or datetime.utcnow()
+        except ValueError as e:
+            errors.append(f"{field}: {str(e)}")
+    number_of_ips = None
+    if values.get("number_of_ips"):
+        try:
+            number_of_ips = int(values["number_of_ips"])
+        except ValueError:
+            errors.append(f"number_of_ips must be an integer, got {values['number_of_ips']}")
+    if errors:
+        return None, errors
+
+    try:
+        network = parse_cidr(values["cidr"])
+    except ValueError as e:
+        return None, [str(e)]
+    first_ip, last_ip = values.get("first_ip"), values.get("last_ip")
+    if not first_ip or not last_ip:
+        try:
+            first_ip, last_ip = ipam.plan_vni_range(values["cidr"], values["gateway"], number_of_ips)
+        except ValueError as e:
+            return None, [str(e)]
+    errors = check_addresses(network, values["gateway"], first_ip, last_ip)
+    if errors:
+        return None, errors
+    if number_of_ips is None:
+        number_of_ips = int(ipaddress.ip_address(last_ip)) - int(ipaddress.ip_address(first_ip)) + 1
+
+    return VNIWorkOrder(
+        owner=owner,
+        requested_date=dates["requested_date"],
+        requested_by=requested_by,
+        virtual_machines=[],
+        deadline=dates["deadline"],
+        project=values["project"],
+        t0_gw=values["t0_gw"],
+        t1_gw=values["t1_gw"],
+        description=values["description"],
+        vni_name=values["vni_name"],
+        cidr=values["cidr"],
+        subnet_mask=values.get("subnet_mask") or str(network.netmask),
+        gateway=values["gateway"],
+        first_ip=first_ip,
+        last_ip=last_ip,
+        number_of_ips=number_of_ips,
+        status="pending",
+        notes=values.get("notes"),
+        priority=values.get("priority") or "normal",
+    ), []
+
+def import_vni_workbook(db: Session, file: BinaryIO, defaults: Optional[Dict] = None) -> Dict:
+    """
+    Validate every row of an uploaded workbook and insert the valid ones in one transaction
+
+    A row is rejected when its addressing is invalid, its subnet overlaps an
+    existing VNI workorder or an earlier row of the upload, or its range
+    overlaps a manually created IP pool. The whole sheet is parsed and
+    validated first; the CIDR index lock is only taken for the conflict
+    checks, the inserts and the commit. Accepted rows are flushed in chunks
+    of VNI_IMPORT_CHUNK_SIZE and detached from the session, so the session
+    stays small however long the sheet is. Rows of the upload are indexed as
+    they are accepted and forgotten again if the transaction fails.
+
+    Args:
+        db: Session the rows are inserted and committed in
+        file: The .xlsx file object
+        defaults: owner / requested_by for sheets without those cells
+
+    Returns:
+        dict: rows, inserted, ids, error_count and per-row errors (at most VNI_IMPORT_MAX_ERRORS)
+
+    Raises:
+        ValueError: If the file is not a readable workbook
+        Exception: If the insert fails; nothing is committed
+    """
+    defaults = defaults or {}
+    parsed: List[Tuple[str, int, str, Optional[VNIWorkOrder], List[str]]] = []  # (sheet, row, vni_name, workorder, errors)
+    try:
+        for sheet, row_number, fields, info in iter_vni_rows(file):
+            order, row_errors = build_vni_workorder(fields, info, defaults)
+            parsed.append((sheet, row_number, _text(fields.get("vni_name")), order, row_errors))
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError(f"Could not read the workbook: {str(e)}")
+
+    rows = len(parsed)
+    ids: List[int] = []
+    errors: List[Dict] = []
+    error_count = 0
+    chunk: List[Tuple[int, VNIWorkOrder]] = []  # (temporary index key, workorder)
+    indexed: List[int] = []  # every key synced into the CIDR index, undone if the import fails
+    with cidr_index.lock:
+        manual_ranges = ipam.manual_pool_ranges(db)
+        try:
+            for position, (sheet, row_number, vni_name, order, row_errors) in enumerate(parsed, start=1):
+                if order is not None:
+                    conflicts = cidr_index.conflicts(parse_cidr(order.cidr))
+                    row_errors = [describe_conflict(conflict) for conflict in conflicts]
+                    overlap = ipam.find_overlap(
+                        manual_ranges, ipaddress.ip_address(order.first_ip), ipaddress.ip_address(order.last_ip)
+                    )
+                    if overlap:
+                        row_errors.append(overlap)
+                if row_errors:
+                    error_count += 1
+                    if len(errors) < settings.VNI_IMPORT_MAX_ERRORS:
+                        errors.append({"sheet": sheet, "row": row_number, "vni_name": vni_name, "errors": row_errors})
+                    continue
+                temporary_key = -position  # indexed under a negative key until the row has its ID
+                indexed.append(temporary_key)
+                cidr_index.sync(temporary_key, order.cidr, order.status)
+                chunk.append((temporary_key, order))
+                if len(chunk) >= settings.VNI_IMPORT_CHUNK_SIZE:
+                    ids.extend(_flush_chunk(db, chunk, indexed))
+            ids.extend(_flush_chunk(db, chunk, indexed))
+            db.commit()
+        except Exception:
+            db.rollback()
+            for key in indexed:
+                cidr_index.remove(key)
+            raise
+    logger.info(f"Imported {len(ids)} of {rows} VNI workorder rows ({error_count} rejected)")
+    return {"rows": rows, "inserted": len(ids), "ids": ids, "error_count": error_count, "errors": errors}
+
+def describe_conflict(conflict: Dict) -> str:
+    """Word an overlap, naming the earlier row of the upload when the other subnet is not saved yet"""
+    if conflict["vni_workorder_id"] < 0:
+        return f"CIDR overlaps {conflict['cidr']} of an earlier row of this upload"
+    return describe_conflicts([conflict])[0]
+
+def _flush_chunk(db: Session, chunk: List[Tuple[int, VNIWorkOrder]], indexed: List[int]) -> List[int]:
+    """Insert a chunk, give each row its IP pool, re-key the index and detach the objects"""
+    if not chunk:
+        return []
+    db.add_all([order for _, order in chunk])
+    db.flush()
+    ipam.create_vni_pools(db, [order for _, order in chunk])
+    db.flush()
+    ids = []
+    for key, order in chunk:
+        cidr_index.remove(key)
+        indexed.append(order.id)
+        cidr_index.sync(order.id, order.cidr, order.status)
+        ids.append(order.id)
+    db.expunge_all()
+    chunk.clear()
+    return ids
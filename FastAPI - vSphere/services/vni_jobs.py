@@ -0,0 +1,442 @@
+"""
+VNI Job Service
+Creates the NSX segments of VNI workorders on a background worker pool, one change per T1 gateway at a time
+"""
+
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import session_scope, read_session_scope
+from app.metrics import metrics
+from models.vni_job import VNIJob
+from models.vni_workorder import VNIWorkOrder
+from services.job_priority import queue_key
+from services.vsphere.vni_operations import VNIOperations, workorder_vni_config
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+metrics.describe("vni_jobs_total", "Finished VNI jobs by final status")
+metrics.describe("vni_job_duration_seconds", "Time from a VNI job starting to its segment being written")
+metrics.describe("vni_job_wait_seconds", "Time VNI jobs spent queued")
+metrics.describe("vni_job_queue_depth", "VNI jobs waiting for a worker")
+metrics.describe("vni_job_gateways_busy", "T1 gateways with an NSX change in progress")
+
+class VNIJobManager:
+    """
+    Fixed-size worker pool for VNI jobs, serialized per T1 gateway
+
+    Queued jobs are kept in a heap per gateway, ordered by queue_key. A free
+    worker claims the gateway whose next job is the most urgent, sends up to
+    NSX_BATCH_SIZE of its most urgent jobs to NSX in one hierarchical PATCH
+    and releases it, so different gateways are changed in parallel while two
+    changes to the same gateway never overlap.
+    """
+
+    def __init__(self, workers: int):
+        """
+        Initialize the manager
+
+        Args:
+            workers: Number of gateways changed at the same time
+        """
+        self.workers = max(1, workers)
+        self._cond = threading.Condition()
+        self._pending: Dict[str, list] = {}  # t1 gateway -> heap of (queue key, job id)
+        self._ready: list = []  # heap of (key of the gateway's next job, gateway); stale entries are skipped
+        self._busy: Dict[str, float] = {}  # gateways a worker is changing -> epoch seconds the change started
+        self._batch_seconds: Optional[float] = None  # moving average of one gateway change, for estimates
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        metrics.register_collector(self._collect_metrics)
+
+    def start(self):
+        """Re-queue jobs left over from a previous process and start the workers"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping = False
+            self._recover()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"vni-worker-{index}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        logger.info(f"VNI job workers started: {self.workers}")
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the workers to exit once their current gateway is done"""
+        with self._start_lock:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify_all()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def enqueue(self, db: Session, vni_workorders: List[VNIWorkOrder]) -> List[Dict]:
+        """
+        Create a queued job per VNI workorder and hand them to the workers
+
+        The job rows and the workorders' 'queued' status are committed together
+        on the caller's session before the jobs become visible to workers.
+
+        Returns:
+            list: The new jobs, in the order of vni_workorders
+        """
+        self.start()
+        jobs = [VNIJob(vni_workorder_id=order.id, t1_gw=order.t1_gw, status="queued") for order in vni_workorders]
+        db.add_all(jobs)
+        for order in vni_workorders:
+            order.status = "queued"
+            order.last_execution_log = f"Queued at {datetime.utcnow().isoformat()}"
+        db.flush()
+        result = [job_to_dict(job) for job in jobs]
+        items = [
+            (job.t1_gw, queue_key(
+                order.priority, order.deadline, job.created_at, job.id, settings.VNI_AGING_SECONDS
+            ), job.id)
+            for job, order in zip(jobs, vni_workorders)
+        ]
+        db.commit()
+        self._push(items)
+        return result
+
+    def _push(self, items: List[tuple]):
+        with self._cond:
+            for gateway, key, job_id in items:
+                pending = self._pending.setdefault(gateway, [])
+                heapq.heappush(pending, (key, job_id))
+                if gateway not in self._busy and pending[0][0] == key:
+                    heapq.heappush(self._ready, (key, gateway))
+            self._cond.notify_all()
+
+    def _take(self) -> Optional[tuple]:
+        """Wait for a gateway with queued jobs, claim the most urgent one and take its next batch"""
+        with self._cond:
+            while True:
+                while not self._ready and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return None
+                key, gateway = heapq.heappop(self._ready)
+                pending = self._pending.get(gateway)
+                # entries are not removed when a gateway is claimed or gets a more urgent job
+                if gateway not in self._busy and pending and pending[0][0] == key:
+                    break
+            batch_size = min(len(pending), max(1, settings.NSX_BATCH_SIZE))
+            job_ids = [heapq.heappop(pending)[1] for _ in range(batch_size)]
+            if not pending:
+                del self._pending[gateway]  # otherwise handed out again once this batch is done
+            self._busy[gateway] = time.time()
+            return gateway, job_ids
+
+    def _release(self, gateway: str, seconds: Optional[float] = None):
+        with self._cond:
+            self._busy.pop(gateway, None)
+            if seconds is not None:
+                self._observe(seconds)
+            pending = self._pending.get(gateway)
+            if pending:
+                heapq.heappush(self._ready, (pending[0][0], gateway))
+                self._cond.notify()
+
+    def _observe(self, seconds: float):
+        """Fold the duration of one gateway change into the moving average (caller holds the lock)"""
+        if self._batch_seconds is None:
+            self._batch_seconds = seconds
+        else:
+            self._batch_seconds += 0.2 * (seconds - self._batch_seconds)
+
+    def _worker(self):
+        while True:
+            claimed = self._take()
+            if claimed is None:
+                return
+            gateway, job_ids = claimed
+            started = time.perf_counter()
+            ran = False
+            try:
+                ran = self._run(job_ids)
+            except Exception as e:
+                logger.error(f"VNI jobs {job_ids} on {gateway} crashed: {str(e)}")
+            finally:
+                self._release(gateway, time.perf_counter() - started if ran else None)
+
+    def _run(self, job_ids: List[int]) -> bool:
+        """Validate and write a batch of jobs; returns whether any segment was sent to NSX"""
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        ops = VNIOperations()
+        configs: Dict[int, tuple] = {}  # job id -> (vni workorder id, config)
+        with session_scope() as db:
+            jobs = db.query(VNIJob).filter(VNIJob.id.in_(job_ids), VNIJob.status == "queued").order_by(VNIJob.id).all()
+            orders = {
+                order.id: order
+                for order in db.query(VNIWorkOrder).filter(VNIWorkOrder.id.in_([job.vni_workorder_id for job in jobs]))
+            }
+            for job in jobs:
+                order = orders.get(job.vni_workorder_id)
+                error = None
+                if order is None:
+                    error = "VNI workorder not found"
+                else:
+                    config = workorder_vni_config(order)
+                    validation_result = ops.validate_vni_config(config, exclude_id=order.id)
+                    if not validation_result["valid"]:
+                        error = f"Validation failed: {', '.join(validation_result['errors'])}"
+                if error:
+                    job.status = "failed"
+                    job.error = error
+                    job.finished_at = now
+                    if order is not None:
+                        order.status = "failed"
+                        order.last_execution_log = error
+                    metrics.inc("vni_jobs_total", labels={"status": "failed"})
+                    continue
+                job.status = "running"
+                job.started_at = now
+                order.status = "executing"
+                order.last_execution_log = f"Execution started at {now.isoformat()}"
+                metrics.observe("vni_job_wait_seconds", (now - job.created_at).total_seconds())
+                configs[job.id] = (order.id, config)
+            for job in jobs:
+                if job.id in configs:
+                    job.batch_size = len(configs)
+        if not configs:
+            return False
+
+        results = self._create(ops, configs)
+        for job_id, (vni_workorder_id, config) in configs.items():
+            vni_id, error = results[job_id]
+            self._finish(job_id, vni_workorder_id, config["vni_name"], vni_id, error, started)
+        return True
+
+    def _create(self, ops: VNIOperations, configs: Dict[int, tuple]) -> Dict[int, tuple]:
+        """
+        Write the segments, all in one NSX call when possible
+
+        NSX applies a hierarchical PATCH as one transaction, so one bad segment
+        fails the whole call; the segments are then written one by one to find it.
+
+        Returns:
+            dict: job id -> (segment id or None, error or None)
+        """
+        if len(configs) > 1:
+            result = ops.create_vnis([config for _, config in configs.values()])
+            if result["success"]:
+                return {job_id: (vni_id, None) for job_id, vni_id in zip(configs, result["vni_ids"])}
+            logger.warning(f"Batched VNI creation failed, retrying one by one: {result.get('error')}")
+        results = {}
+        for job_id, (_, config) in configs.items():
+            result = ops.create_vni(config)
+            results[job_id] = (result.get("vni_id"), None) if result["success"] else (None, result.get("message"))
+        return results
+
+    def _finish(self, job_id: int, vni_workorder_id: int, vni_name: str, vni_id: Optional[str],
+                error: Optional[str], started: float):
+        job_status = "failed" if error else "succeeded"
+        if error:
+            log = f"VNI creation failed: {error}"
+        else:
+            log = f"VNI '{vni_name}' created successfully at {datetime.utcnow().isoformat()}. VNI ID: {vni_id}"
+        try:
+            with session_scope() as db:
+                db.query(VNIJob).filter(VNIJob.id == job_id).update({
+                    "status": job_status,
+                    "segment_id": vni_id,
+                    "finished_at": datetime.utcnow(),
+                    "error": error,
+                })
+                db.query(VNIWorkOrder).filter(VNIWorkOrder.id == vni_workorder_id).update({
+                    "status": "failed" if error else "completed",
+                    "last_execution_log": log,
+                    "updated_at": datetime.utcnow(),
+                })
+        except Exception as e:
+            logger.error(f"Failed to record result of VNI job {job_id}: {str(e)}")
+        metrics.inc("vni_jobs_total", labels={"status": job_status})
+        metrics.observe("vni_job_duration_seconds", time.perf_counter() - started)
+        if error:
+            logger.error(f"VNI job {job_id} (VNI workorder {vni_workorder_id}) failed: {error}")
+
+    def _recover(self):
+        """
+        Re-queue the jobs a previous process left queued or running
+
+        Writing a segment is an idempotent PATCH, so an interrupted job is
+        simply run again.
+        """
+        try:
+            with session_scope() as db:
+                rows = db.query(VNIJob, VNIWorkOrder.priority, VNIWorkOrder.deadline).outerjoin(
+                    VNIWorkOrder, VNIWorkOrder.id == VNIJob.vni_workorder_id
+                ).filter(VNIJob.status.in_(ACTIVE_STATUSES)).order_by(VNIJob.id).all()
+                for job, _, _ in rows:
+                    if job.status == "running":
+                        job.status = "queued"
+                        job.started_at = None
+                        db.query(VNIWorkOrder).filter(VNIWorkOrder.id == job.vni_workorder_id).update({"status": "queued"})
+                items = [
+                    (job.t1_gw, queue_key(
+                        priority, deadline, job.created_at, job.id, settings.VNI_AGING_SECONDS
+                    ), job.id)
+                    for job, priority, deadline in rows
+                ]
+                # seed the duration estimate from recent executions; jobs of one batch share a start and finish
+                recent = db.query(VNIJob.started_at, VNIJob.finished_at).filter(
+                    VNIJob.started_at.isnot(None), VNIJob.finished_at.isnot(None)
+                ).order_by(VNIJob.id.desc()).limit(50).all()
+            if recent:
+                with self._cond:
+                    self._batch_seconds = sum((finished - started).total_seconds() for started, finished in recent) / len(recent)
+            if items:
+                logger.info(f"Re-queued {len(items)} VNI jobs")
+            self._push(items)
+        except Exception as e:
+            logger.error(f"Failed to recover VNI jobs: {str(e)}")
+
+    def queue_state(self, upcoming: int = 20) -> Dict:
+        """Queued jobs per gateway, the gateways being changed and the next jobs to start"""
+        schedule = self.schedule()
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queued": sum(len(pending) for pending in self._pending.values()),
+                "gateways_busy": sorted(self._busy),
+                "queued_by_gateway": {gateway: len(pending) for gateway, pending in sorted(self._pending.items())},
+                "average_batch_seconds": self._batch_seconds,
+                "upcoming": schedule[:upcoming],
+            }
+
+    def schedule(self) -> List[Dict]:
+        """
+        Predict the order and start time of every queued job
+
+        Replays the workers on a snapshot of the queues: each free worker takes
+        the available gateway with the most urgent next job and holds it for
+        the observed average change duration, and a gateway being changed now
+        is freed once that average has elapsed since it started. Start times
+        are None until a change has been observed.
+
+        Returns:
+            list: Dicts with job_id, t1_gw, position (1-based), batch and estimated_start, in start order
+        """
+        with self._cond:
+            queues = {gateway: sorted(pending) for gateway, pending in self._pending.items() if pending}
+            busy = dict(self._busy)
+            step = self._batch_seconds
+        now = time.time()
+        duration = step or 0.0
+        batch_size = max(1, settings.NSX_BATCH_SIZE)
+        heads = {gateway: queue[0][0] for gateway, queue in queues.items()}
+        free_at = {gateway: max(now, busy[gateway] + duration) if gateway in busy else now for gateway in queues}
+        workers = [max(now, started + duration) for started in busy.values()][:self.workers]
+        workers += [now] * (self.workers - len(workers))
+        heapq.heapify(workers)
+        taken = {gateway: 0 for gateway in queues}
+        order = []
+        batch = 0
+        while heads:
+            worker_free = heapq.heappop(workers)
+            start = max(worker_free, min(free_at[gateway] for gateway in heads))
+            gateway = min((g for g in heads if free_at[g] <= start), key=lambda g: heads[g])
+            first = taken[gateway]
+            entries = queues[gateway][first:first + batch_size]
+            batch += 1
+            for _, job_id in entries:
+                order.append({
+                    "job_id": job_id,
+                    "t1_gw": gateway,
+                    "position": len(order) + 1,
+                    "batch": batch,
+                    "estimated_start": datetime.utcfromtimestamp(start).isoformat() if step is not None else None,
+                })
+            taken[gateway] = first + len(entries)
+            if taken[gateway] < len(queues[gateway]):
+                heads[gateway] = queues[gateway][taken[gateway]][0]
+            else:
+                del heads[gateway]
+            free_at[gateway] = start + duration
+            heapq.heappush(workers, start + duration)
+        return order
+
+    def position(self, job_id: int) -> Optional[Dict]:
+        """
+        Queue position and estimated start of a queued job, or None if it is not queued in this process
+        """
+        schedule = self.schedule()
+        for entry in schedule:
+            if entry["job_id"] == job_id:
+                with self._cond:
+                    average = self._batch_seconds
+                wait = None
+                if entry["estimated_start"] is not None:
+                    wait = max(0.0, (datetime.fromisoformat(entry["estimated_start"]) - datetime.utcnow()).total_seconds())
+                return {
+                    **entry,
+                    "queued": len(schedule),
+                    "gateway_position": sum(1 for other in schedule[:entry["position"]] if other["t1_gw"] == entry["t1_gw"]),
+                    "estimated_wait_seconds": wait,
+                    "average_batch_seconds": average,
+                }
+        return None
+
+    def _collect_metrics(self, registry):
+        with self._cond:
+            registry.set_gauge("vni_job_queue_depth", sum(len(pending) for pending in self._pending.values()))
+            registry.set_gauge("vni_job_gateways_busy", len(self._busy))
+
+def get_job(job_id: int) -> Optional[Dict]:
+    """
+    Get a VNI job by ID, or None if it does not exist
+
+    Job reads go to the primary: they are polled right after a job is queued.
+    """
+    with session_scope() as db:
+        job = db.query(VNIJob).filter(VNIJob.id == job_id).first()
+        return job_to_dict(job) if job else None
+
+def get_latest_job(vni_workorder_id: int) -> Optional[Dict]:
+    """
+    Get the most recent job of a VNI workorder, or None if it was never executed
+    """
+    with session_scope() as db:
+        job = db.query(VNIJob).filter(VNIJob.vni_workorder_id == vni_workorder_id).order_by(VNIJob.id.desc()).first()
+        return job_to_dict(job) if job else None
+
+def get_vni_workorder_jobs(vni_workorder_id: int, limit: int = 20) -> List[Dict]:
+    """
+    Get the jobs of a VNI workorder, newest first
+    """
+    with read_session_scope() as db:
+        jobs = db.query(VNIJob).filter(
+            VNIJob.vni_workorder_id == vni_workorder_id
+        ).order_by(VNIJob.id.desc()).limit(limit).all()
+        return [job_to_dict(job) for job in jobs]
+
+def job_to_dict(job: VNIJob) -> Dict:
+    return {
+        "job_id": job.id,
+        "vni_workorder_id": job.vni_workorder_id,
+        "t1_gw": job.t1_gw,
+        "status": job.status,
+        "segment_id": job.segment_id,
+        "batch_size": job.batch_size,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "queued_seconds": ((job.started_at or job.finished_at or datetime.utcnow()) - job.created_at).total_seconds() if job.created_at else None,
+        "elapsed_seconds": ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds() if job.started_at else None,
+        "error": job.error,
+    }
+
+vni_jobs = VNIJobManager(workers=settings.VNI_WORKERS)
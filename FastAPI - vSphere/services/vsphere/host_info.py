@@ -55,6 +55,7 @@ def get_hosts_info():
                             'id': h._moId,
                             'name': h.name,
                             'cluster': cluster.name,
+                            'datacenter': dc.name,
                             'cpu_model': hw.cpuPkg[0].description,
                             'cpu_cores': cpu_cores,
                             'cpu_total_mhz': total_cpu_mhz,
@@ -0,0 +1,191 @@
+"""
+NSX-T Policy API Client
+Creates, reads and deletes overlay segments (VNIs) on NSX-T Manager
+"""
+
+import ipaddress
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+POLICY_INFRA = "/policy/api/v1/infra"
+
+# Responses worth retrying; every call made here is idempotent (GET/PATCH/DELETE on a fixed path)
+RETRY_STATUSES = (429, 502, 503, 504)
+RETRY_METHODS = frozenset(["GET", "PATCH", "PUT", "DELETE"])
+
+class NSXError(Exception):
+    """An NSX-T Manager call that failed after retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def segment_id(vni_workorder_id: int) -> str:
+    """Policy object ID of a VNI workorder's segment; keyed on the workorder so two VNIs never share one"""
+    return f"vni-{vni_workorder_id}"
+
+def segment_body(vni_config: Dict) -> Dict:
+    """
+    Build the Segment of a VNI configuration
+
+    The segment is keyed on `segment_id` and named after the VNI, attached to
+    its T1 gateway and gets the gateway address with the subnet prefix; the
+    project is kept as a tag.
+    """
+    network = ipaddress.ip_network(vni_config["cidr"].strip(), strict=False)
+    body = {
+        "resource_type": "Segment",
+        "id": vni_config["segment_id"],
+        "display_name": vni_config["vni_name"],
+        "description": vni_config.get("description") or "",
+        "connectivity_path": f"/infra/tier-1s/{vni_config['t1_gw']}",
+        "subnets": [{"gateway_address": f"{vni_config['gateway']}/{network.prefixlen}"}],
+        "tags": [{"scope": "project", "tag": vni_config["project"]}] if vni_config.get("project") else [],
+    }
+    if settings.NSX_TRANSPORT_ZONE_PATH:
+        body["transport_zone_path"] = settings.NSX_TRANSPORT_ZONE_PATH
+    return body
+
+class NSXClient:
+    """NSX-T Policy API client over one pooled keep-alive session, with retries and backoff"""
+
+    def __init__(self, base_url: str, user: str, password: str, verify_ssl: bool = False, timeout: float = 30.0,
+                 retries: int = 3, backoff: float = 0.5, pool_size: int = 10):
+        """
+        Initialize the client
+
+        Args:
+            base_url: NSX-T Manager URL, e.g. https://nsx.example.local
+            user / password: Basic auth credentials
+            verify_ssl: Verify the manager certificate
+            timeout: Seconds per request attempt
+            retries: Retries on connection errors and 429/502/503/504
+            backoff: Backoff factor; attempt n waits backoff * 2^(n-1) seconds (or Retry-After)
+            pool_size: Keep-alive connections kept to the manager
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = (user, password)
+        self.session.verify = verify_ssl
+        self.session.headers.update({"Accept": "application/json", "Content-Type": "application/json"})
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Raises:
+            NSXError: If the manager is unreachable or answers with an error
+        """
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise NSXError(f"NSX {method} {path} failed: {str(e)}")
+        if response.status_code >= 400 and not (method == "DELETE" and response.status_code == 404):
+            try:
+                detail = response.json().get("error_message") or response.text
+            except ValueError:
+                detail = response.text
+            raise NSXError(f"NSX {method} {path} returned {response.status_code}: {detail}", response.status_code)
+        return response
+
+    def get_segment(self, seg_id: str) -> Optional[Dict]:
+        """Return a segment, or None if it does not exist"""
+        try:
+            return self._request("GET", f"{POLICY_INFRA}/segments/{seg_id}").json()
+        except NSXError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    def iter_segments(self, page_size: int = 1000) -> Iterator[Dict]:
+        """Yield every segment, following the result cursor"""
+        cursor = None
+        while True:
+            params = {"page_size": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            page = self._request("GET", f"{POLICY_INFRA}/segments", params=params).json()
+            yield from page.get("results", [])
+            cursor = page.get("cursor")
+            if not cursor:
+                return
+
+    def put_segment(self, body: Dict) -> Dict:
+        """Create or update one segment, returning it as stored by the manager"""
+        self._request("PATCH", f"{POLICY_INFRA}/segments/{body['id']}", json=body)
+        return self.get_segment(body["id"]) or body
+
+    def put_segments(self, bodies: List[Dict], batch_size: Optional[int] = None) -> List[str]:
+        """
+        Create or update many segments with hierarchical PATCH /infra calls
+
+        Each call carries up to `batch_size` ChildSegment entries (NSX_BATCH_SIZE
+        by default) and is applied by the manager as one transaction.
+
+        Returns:
+            list: IDs of the segments written
+        """
+        batch_size = batch_size or settings.NSX_BATCH_SIZE
+        for start in range(0, len(bodies), batch_size):
+            batch = bodies[start:start + batch_size]
+            self._request("PATCH", POLICY_INFRA, json={
+                "resource_type": "Infra",
+                "children": [{"resource_type": "ChildSegment", "Segment": body} for body in batch],
+            })
+            logger.info(f"NSX hierarchical PATCH wrote {len(batch)} segments")
+        return [body["id"] for body in bodies]
+
+    def delete_segment(self, seg_id: str) -> bool:
+        """Delete a segment; returns False if it did not exist"""
+        return self._request("DELETE", f"{POLICY_INFRA}/segments/{seg_id}").status_code != 404
+
+    def close(self):
+        self.session.close()
+
+_client: Optional[NSXClient] = None
+_client_lock = threading.Lock()
+
+def get_nsx_client() -> NSXClient:
+    """
+    Process-wide NSX client, so every caller shares the same keep-alive pool
+
+    Raises:
+        ValueError: If NSX credentials are missing
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            settings.validate_nsx_config()
+            _client = NSXClient(
+                settings.NSX_URL,
+                settings.NSX_USER,
+                settings.NSX_PASSWORD,
+                verify_ssl=settings.NSX_VERIFY_SSL,
+                timeout=settings.NSX_TIMEOUT,
+                retries=settings.NSX_RETRIES,
+                backoff=settings.NSX_BACKOFF,
+                pool_size=settings.NSX_POOL_SIZE,
+            )
+        return _client
@@ -0,0 +1,233 @@
+import time
+from typing import Callable, Dict, Optional
+
+from pyVmomi import vim, vmodl
+from .connection import get_vsphere_connection
+
+TERMINAL_STATES = (vim.TaskInfo.State.success, vim.TaskInfo.State.error)
+
+def _find_datacenter(content, datacenter_name: str):
+    for entity in content.rootFolder.childEntity:
+        if isinstance(entity, vim.Datacenter) and entity.name == datacenter_name:
+            return entity
+    raise Exception(f"Datacenter '{datacenter_name}' not found")
+
+def _find_by_name(content, root, vim_type, name: str):
+    container = content.viewManager.CreateContainerView(root, [vim_type], True)
+    try:
+        for obj in container.view:
+            if obj.name == name:
+                return obj
+    finally:
+        container.Destroy()
+    return None
+
+def _managed_object(si, vim_type, moid: str):
+    return vim_type(moid, si._stub)
+
+def build_clone_spec(si, values: Dict):
+    """
+    Build the clone of a workorder's template as (template, folder, clone spec)
+
+    Args:
+        si: Connected service instance
+        values: Workorder variables as built by terraform_runner.build_tfvars
+
+    Raises:
+        Exception: If the template, datacenter, datastore or network cannot be resolved
+    """
+    content = si.RetrieveContent()
+    template = content.searchIndex.FindByUuid(None, values["template_id"], True, False)
+    if template is None:
+        raise Exception(f"Template '{values['template_id']}' not found")
+    datacenter = _find_datacenter(content, values["datacenter_name"])
+
+    relocate = vim.vm.RelocateSpec()
+    if values.get("resource_pool_id"):
+        relocate.pool = _managed_object(si, vim.ResourcePool, values["resource_pool_id"])
+    if values.get("host_system_id"):
+        relocate.host = _managed_object(si, vim.HostSystem, values["host_system_id"])
+    datastore_id = values.get("datastore_id")
+    if datastore_id:
+        if datastore_id.startswith("datastore-"):
+            relocate.datastore = _managed_object(si, vim.Datastore, datastore_id)
+        else:
+            relocate.datastore = _find_by_name(content, datacenter.datastoreFolder, vim.Datastore, datastore_id)
+            if relocate.datastore is None:
+                raise Exception(f"Datastore '{datastore_id}' not found")
+
+    config = vim.vm.ConfigSpec(numCPUs=values["cpu"], memoryMB=values["ram"] * 1024)
+    nics = values.get("nics") or []
+    network_name = nics[0].get("network_name") if nics else None
+    if network_name:
+        network = _find_by_name(content, datacenter.networkFolder, vim.Network, network_name)
+        if network is None:
+            raise Exception(f"Network '{network_name}' not found")
+        nic = next(
+            (device for device in template.config.hardware.device if isinstance(device, vim.vm.device.VirtualEthernetCard)),
+            None
+        )
+        if nic is not None:
+            if isinstance(network, vim.dvs.DistributedVirtualPortgroup):
+                nic.backing = vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo(
+                    port=vim.dvs.PortConnection(
+                        portgroupKey=network.key,
+                        switchUuid=network.config.distributedVirtualSwitch.uuid
+                    )
+                )
+            else:
+                nic.backing = vim.vm.device.VirtualEthernetCard.NetworkBackingInfo(
+                    network=network, deviceName=network.name
+                )
+            config.deviceChange = [
+                vim.vm.device.VirtualDeviceSpec(operation=vim.vm.device.VirtualDeviceSpec.Operation.edit, device=nic)
+            ]
+
+    # Linux guest customization, mirroring the linux_options block of the Terraform module
+    ip_settings = vim.vm.customization.IPSettings()
+    if values.get("ip"):
+        ip_settings.ip = vim.vm.customization.FixedIp(ipAddress=values["ip"])
+        ip_settings.subnetMask = values.get("netmask") or "255.255.255.0"
+        if values.get("gateway"):
+            ip_settings.gateway = [values["gateway"]]
+    else:
+        ip_settings.ip = vim.vm.customization.DhcpIpGenerator()
+    customization = vim.vm.customization.Specification(
+        identity=vim.vm.customization.LinuxPrep(
+            hostName=vim.vm.customization.FixedName(name=values.get("hostname") or values["vm_name"]),
+            domain=values.get("domain") or "local"
+        ),
+        globalIPSettings=vim.vm.customization.GlobalIPSettings(),
+        nicSettingMap=[vim.vm.customization.AdapterMapping(adapter=ip_settings)]
+    )
+
+    folder = _managed_object(si, vim.Folder, values["folder"]) if values.get("folder") else datacenter.vmFolder
+    spec = vim.vm.CloneSpec(location=relocate, config=config, customization=customization, powerOn=True, template=False)
+    return template, folder, spec
+
+def track_tasks(si, tasks: Dict, on_update: Optional[Callable] = None, timeout: Optional[float] = None,
+                should_cancel: Optional[Callable[[], Optional[str]]] = None) -> Dict:
+    """
+    Wait for many vSphere tasks at once through a single PropertyCollector
+
+    One filter covers every task's info.state / info.progress / info.error /
+    info.result, and WaitForUpdatesEx returns only what changed, so tracking
+    N tasks costs one long-poll round trip per batch of changes rather than
+    one poll per task.
+
+    Args:
+        si: Connected service instance
+        tasks: Key -> vim.Task
+        on_update: Optional callback(key, state, progress) on every change
+        timeout: Seconds after which unfinished tasks are cancelled and reported as failed
+        should_cancel: Optional callable polled between updates; a truthy return (used as
+            the error message) cancels the unfinished tasks
+
+    Returns:
+        dict: Key -> {"state", "progress", "error", "result"}
+    """
+    by_moid = {task._moId: key for key, task in tasks.items()}
+    status = {key: {"state": None, "progress": 0, "error": None, "result": None} for key in tasks}
+    if not tasks:
+        return status
+
+    collector = si.content.propertyCollector.CreatePropertyCollector()
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[vmodl.query.PropertyCollector.ObjectSpec(obj=task, skip=False) for task in tasks.values()],
+        propSet=[vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.Task, all=False, pathSet=["info.state", "info.progress", "info.error", "info.result"]
+        )]
+    )
+    collector.CreateFilter(filter_spec, True)
+    # a short long-poll keeps cancellation responsive when someone may ask for it
+    options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=5 if should_cancel else 30)
+    deadline = time.monotonic() + timeout if timeout else None
+    pending = set(tasks)
+    version = ""
+    try:
+        while pending:
+            stop_reason = should_cancel() if should_cancel else None
+            if not stop_reason and deadline is not None and time.monotonic() > deadline:
+                stop_reason = f"Timed out after {timeout:.0f}s"
+            if stop_reason:
+                for key in pending:
+                    try:
+                        tasks[key].CancelTask()
+                    except Exception:
+                        pass
+                    status[key]["state"] = vim.TaskInfo.State.error
+                    status[key]["error"] = stop_reason
+                break
+            update = collector.WaitForUpdatesEx(version, options)
+            if update is None:
+                continue
+            version = update.version
+            for filter_update in update.filterSet:
+                for object_update in filter_update.objectSet:
+                    key = by_moid.get(object_update.obj._moId)
+                    if key is None:
+                        continue
+                    for change in object_update.changeSet:
+                        field = change.name.split(".", 1)[1]
+                        if field == "error" and change.val is not None:
+                            status[key]["error"] = change.val.msg or str(change.val)
+                        elif field == "progress":
+                            status[key]["progress"] = change.val or status[key]["progress"]
+                        else:
+                            status[key][field] = change.val
+                    if status[key]["state"] in TERMINAL_STATES:
+                        pending.discard(key)
+                        if status[key]["state"] == vim.TaskInfo.State.success:
+                            status[key]["progress"] = 100
+                    if on_update:
+                        on_update(key, status[key]["state"], status[key]["progress"])
+    finally:
+        collector.DestroyPropertyCollector()
+    return status
+
+def clone_workorders(values_by_workorder: Dict[int, Dict], on_update: Optional[Callable] = None,
+                     timeout: Optional[float] = None,
+                     should_cancel: Optional[Callable[[], Optional[str]]] = None) -> Dict[int, Dict]:
+    """
+    Clone and customize the templates of several workorders concurrently
+
+    All CloneVM_Task calls are issued up front and then tracked together.
+
+    Args:
+        values_by_workorder: Workorder ID -> variables from terraform_runner.build_tfvars (template_id set)
+        on_update: Optional callback(workorder_id, state, progress)
+        timeout: Seconds before unfinished clones are cancelled
+        should_cancel: Optional callable as in track_tasks
+
+    Returns:
+        dict: Workorder ID -> {"status": "succeeded"|"failed", "vm_id", "error"}
+    """
+    try:
+        si = get_vsphere_connection()
+    except Exception as e:
+        return {workorder_id: {"status": "failed", "vm_id": None, "error": str(e)} for workorder_id in values_by_workorder}
+
+    results: Dict[int, Dict] = {}
+    tasks = {}
+    for workorder_id, values in values_by_workorder.items():
+        try:
+            template, folder, spec = build_clone_spec(si, values)
+            tasks[workorder_id] = template.CloneVM_Task(folder=folder, name=values["vm_name"], spec=spec)
+            if on_update:
+                on_update(workorder_id, "queued", 0)
+        except Exception as e:
+            results[workorder_id] = {"status": "failed", "vm_id": None, "error": f"Failed to start clone: {str(e)}"}
+
+    try:
+        tracked = track_tasks(si, tasks, on_update, timeout, should_cancel)
+    except Exception as e:
+        tracked = {key: {"state": vim.TaskInfo.State.error, "error": str(e), "result": None} for key in tasks}
+    for workorder_id, task_status in tracked.items():
+        succeeded = task_status["state"] == vim.TaskInfo.State.success
+        vm = task_status.get("result")
+        results[workorder_id] = {
+            "status": "succeeded" if succeeded else "failed",
+            "vm_id": vm._moId if succeeded and vm is not None else None,
+            "error": None if succeeded else (task_status["error"] or "Clone task failed"),
+        }
+    return results
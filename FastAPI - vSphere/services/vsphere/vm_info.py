@@ -1,4 +1,4 @@
-from pyVmomi import vim
+from pyVmomi import vim, vmodl
 from .connection import get_vsphere_connection
 from utils.safe_math import safe_div
 
@@ -235,4 +235,70 @@ def get_stopped_vms():
     Raises:
         Exception: If connection or data retrieval fails
     """
-    return get_vms_by_power_state('poweredOff') 
\ No newline at end of file
+    return get_vms_by_power_state('poweredOff') 
+
+# Properties read by get_vm_inventory; everything else stays on the server
+INVENTORY_PROPERTIES = [
+    "name", "config.uuid", "config.template", "config.hardware.numCPU",
+    "config.hardware.memoryMB", "config.hardware.device", "runtime.powerState",
+]
+
+def get_vm_inventory(page_size: int = 1000):
+    """
+    Get the identity and sizing of every VM with one paged PropertyCollector query
+
+    Unlike get_vms_info, which walks each VM's properties one round trip at a
+    time, only the listed properties are fetched, `page_size` VMs per call.
+    Templates are left out.
+
+    Returns:
+        list: Dicts with name, moid, uuid, power_state, num_cpu, memory_mb and disk_gb
+
+    Raises:
+        Exception: If connection or data retrieval fails
+    """
+    try:
+        si = get_vsphere_connection()
+        content = si.RetrieveContent()
+        container = content.viewManager.CreateContainerView(content.rootFolder, [vim.VirtualMachine], True)
+        try:
+            traversal = vmodl.query.PropertyCollector.TraversalSpec(
+                name="view", path="view", skip=False, type=vim.view.ContainerView
+            )
+            filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+                objectSet=[vmodl.query.PropertyCollector.ObjectSpec(obj=container, skip=True, selectSet=[traversal])],
+                propSet=[vmodl.query.PropertyCollector.PropertySpec(
+                    type=vim.VirtualMachine, all=False, pathSet=INVENTORY_PROPERTIES
+                )]
+            )
+            collector = content.propertyCollector
+            result = collector.RetrievePropertiesEx(
+                [filter_spec], vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+            )
+            vms = []
+            while result:
+                for obj in result.objects:
+                    props = {prop.name: prop.val for prop in obj.propSet}
+                    if props.get("config.template"):
+                        continue
+                    disks = [
+                        device for device in props.get("config.hardware.device") or []
+                        if isinstance(device, vim.vm.device.VirtualDisk)
+                    ]
+                    vms.append({
+                        "name": props.get("name"),
+                        "moid": obj.obj._moId,
+                        "uuid": props.get("config.uuid"),
+                        "power_state": str(props.get("runtime.powerState", "unknown")),
+                        "num_cpu": props.get("config.hardware.numCPU"),
+                        "memory_mb": props.get("config.hardware.memoryMB"),
+                        "disk_gb": safe_div(sum(disk.capacityInKB or 0 for disk in disks), 1024 ** 2),
+                    })
+                if not result.token:
+                    break
+                result = collector.ContinueRetrievePropertiesEx(result.token)
+            return vms
+        finally:
+            container.Destroy()
+    except Exception as e:
+        raise Exception(f"Failed to retrieve VM inventory: {str(e)}")
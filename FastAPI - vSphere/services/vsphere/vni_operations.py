@@ -1,33 +1,90 @@
 """
 VNI Operations Service
-Handles VNI creation, modification, and deletion in vSphere
+Handles VNI creation, modification, and deletion on NSX-T
 """
 
+import ipaddress
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from services.cidr_index import cidr_index, parse_cidr, check_addresses, describe_conflicts
+from services.vsphere.nsx_client import NSXClient, get_nsx_client, segment_body, segment_id
+
 logger = logging.getLogger(__name__)
 
+def workorder_vni_config(vni_workorder) -> Dict:
+    """The VNI configuration of a VNI workorder, as taken by create_vni and validate_vni_config"""
+    return {
+        "segment_id": segment_id(vni_workorder.id),
+        "vni_name": vni_workorder.vni_name,
+        "cidr": vni_workorder.cidr,
+        "gateway": vni_workorder.gateway,
+        "t0_gw": vni_workorder.t0_gw,
+        "t1_gw": vni_workorder.t1_gw,
+        "description": vni_workorder.description,
+        "project": vni_workorder.project,
+        "subnet_mask": vni_workorder.subnet_mask,
+        "first_ip": vni_workorder.first_ip,
+        "last_ip": vni_workorder.last_ip,
+        "number_of_ips": vni_workorder.number_of_ips
+    }
+
+def segment_to_vni(segment: Dict) -> Dict:
+    """Describe an NSX segment in the VNI terms used by the workorders"""
+    subnet = (segment.get("subnets") or [{}])[0]
+    gateway_address = subnet.get("gateway_address") or ""
+    connectivity_path = segment.get("connectivity_path") or ""
+    tags = {tag.get("scope"): tag.get("tag") for tag in segment.get("tags") or []}
+    return {
+        "vni_id": segment.get("id"),
+        "vni_name": segment.get("display_name") or segment.get("id"),
+        "status": "deleting" if segment.get("marked_for_delete") else "active",
+        "cidr": subnet.get("network"),
+        "gateway": gateway_address.split("/")[0] or None,
+        "t1_gw": connectivity_path.rsplit("/", 1)[-1] if "/tier-1s/" in connectivity_path else None,
+        "project": tags.get("project"),
+        "description": segment.get("description"),
+        "path": segment.get("path"),
+        "created_at": _epoch_ms(segment.get("_create_time")),
+        "last_modified": _epoch_ms(segment.get("_last_modified_time")),
+    }
+
+def _holds(cidr: Optional[str], address) -> bool:
+    try:
+        return address in parse_cidr(cidr)
+    except ValueError:
+        return False
+
+def _epoch_ms(value) -> Optional[str]:
+    return datetime.utcfromtimestamp(value / 1000).isoformat() if value else None
+
 class VNIOperations:
-    """Service class for VNI operations in vSphere"""
+    """Service class for VNI operations on NSX-T Manager"""
     
-    def __init__(self, vsphere_connection=None):
+    def __init__(self, nsx_client: Optional[NSXClient] = None):
         """
         Initialize VNI operations service
         
         Args:
-            vsphere_connection: vSphere connection object (to be implemented)
+            nsx_client: NSX client to use; defaults to the shared one built from NSX_* settings
         """
-        self.vsphere_connection = vsphere_connection
+        self._nsx = nsx_client
         self.logger = logging.getLogger(__name__)
     
+    @property
+    def nsx(self) -> NSXClient:
+        if self._nsx is None:
+            self._nsx = get_nsx_client()
+        return self._nsx
+    
     def create_vni(self, vni_config: Dict) -> Dict:
         """
-        Create a new VNI in vSphere
+        Create a new VNI (overlay segment) on NSX-T
         
         Args:
             vni_config: Dictionary containing VNI configuration
+                - segment_id: NSX segment ID (see workorder_vni_config)
                 - vni_name: Name of the VNI
                 - cidr: CIDR notation (e.g., "10.184.36.160/28")
                 - gateway: Gateway IP address
@@ -41,22 +98,16 @@ class VNIOperations:
         """
         try:
             self.logger.info(f"Creating VNI: {vni_config.get('vni_name')}")
+            segment = self.nsx.put_segment(segment_body(vni_config))
             
-            # TODO: Implement actual vSphere VNI creation
-            # This would involve:
-            # 1. Connecting to NSX-T Manager
-            # 2. Creating the VNI segment
-            # 3. Configuring the segment with the provided parameters
-            # 4. Attaching to the appropriate T0/T1 gateways
-            
-            # For now, we'll simulate the creation
             result = {
                 "success": True,
-                "vni_id": f"vni-{datetime.utcnow().timestamp()}",
+                "vni_id": segment.get("id"),
                 "vni_name": vni_config.get("vni_name"),
                 "status": "created",
                 "message": f"VNI '{vni_config.get('vni_name')}' created successfully",
                 "created_at": datetime.utcnow().isoformat(),
+                "path": segment.get("path"),
                 "config": vni_config
             }
             
@@ -68,12 +119,40 @@ class VNIOperations:
             return {
                 "success": False,
                 "error": str(e),
-                "message": f"Failed to create VNI '{vni_config.get('vni_name')}'"
+                "message": f"Failed to create VNI '{vni_config.get('vni_name')}': {str(e)}"
+            }
+    
+    def create_vnis(self, vni_configs: List[Dict]) -> Dict:
+        """
+        Create many VNIs with hierarchical PATCH calls of NSX_BATCH_SIZE segments
+        
+        Args:
+            vni_configs: VNI configurations, as for create_vni
+            
+        Returns:
+            Dict with success and the segment IDs, in the order of vni_configs
+        """
+        try:
+            self.logger.info(f"Creating {len(vni_configs)} VNIs")
+            vni_ids = self.nsx.put_segments([segment_body(config) for config in vni_configs])
+            return {
+                "success": True,
+                "vni_ids": vni_ids,
+                "status": "created",
+                "message": f"{len(vni_ids)} VNIs created successfully",
+                "created_at": datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            self.logger.error(f"Failed to create VNIs: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "message": f"Failed to create {len(vni_configs)} VNIs: {str(e)}"
             }
     
     def delete_vni(self, vni_id: str) -> Dict:
         """
-        Delete a VNI from vSphere
+        Delete a VNI segment from NSX-T
         
         Args:
             vni_id: ID of the VNI to delete
@@ -83,19 +162,13 @@ class VNIOperations:
         """
         try:
             self.logger.info(f"Deleting VNI: {vni_id}")
-            
-            # TODO: Implement actual vSphere VNI deletion
-            # This would involve:
-            # 1. Connecting to NSX-T Manager
-            # 2. Finding the VNI by ID or name
-            # 3. Deleting the VNI segment
-            # 4. Cleaning up any associated configurations
+            existed = self.nsx.delete_segment(vni_id)
             
             result = {
                 "success": True,
                 "vni_id": vni_id,
                 "status": "deleted",
-                "message": f"VNI '{vni_id}' deleted successfully",
+                "message": f"VNI '{vni_id}' deleted successfully" if existed else f"VNI '{vni_id}' did not exist",
                 "deleted_at": datetime.utcnow().isoformat()
             }
             
@@ -122,29 +195,14 @@ class VNIOperations:
         """
         try:
             self.logger.info(f"Getting VNI info: {vni_id}")
-            
-            # TODO: Implement actual vSphere VNI info retrieval
-            # This would involve:
-            # 1. Connecting to NSX-T Manager
-            # 2. Finding the VNI by ID or name
-            # 3. Retrieving VNI configuration and status
-            
-            # For now, we'll return mock data
-            result = {
-                "success": True,
-                "vni_id": vni_id,
-                "vni_name": f"VNI-{vni_id}",
-                "status": "active",
-                "cidr": "10.184.36.160/28",
-                "gateway": "10.184.36.174",
-                "t0_gw": "itaas-t0-gw",
-                "t1_gw": "itaas-t1-gw",
-                "description": "Mock VNI for testing",
-                "created_at": datetime.utcnow().isoformat(),
-                "last_modified": datetime.utcnow().isoformat()
-            }
-            
-            return result
+            segment = self.nsx.get_segment(vni_id)
+            if segment is None:
+                return {
+                    "success": False,
+                    "error": "not found",
+                    "message": f"VNI '{vni_id}' not found"
+                }
+            return {"success": True, **segment_to_vni(segment)}
             
         except Exception as e:
             self.logger.error(f"Failed to get VNI info: {str(e)}")
@@ -159,60 +217,43 @@ class VNIOperations:
         List all VNIs with optional filtering
         
         Args:
-            filters: Optional filters to apply (e.g., by project, status, etc.)
+            filters: Optional filters on the listed keys (e.g. project, t1_gw, status); a
+                list or tuple value matches any of its items. The `ip` key keeps the
+                VNIs whose subnet holds that address.
             
         Returns:
             List of VNI information dictionaries
         """
         try:
             self.logger.info("Listing VNIs")
-            
-            # TODO: Implement actual vSphere VNI listing
-            # This would involve:
-            # 1. Connecting to NSX-T Manager
-            # 2. Retrieving all VNI segments
-            # 3. Applying filters if provided
-            # 4. Returning formatted results
-            
-            # For now, we'll return mock data
-            mock_vnis = [
-                {
-                    "vni_id": "vni-001",
-                    "vni_name": "ITAAS-ERS-APP-TESTBED-10.184.36.160-28",
-                    "status": "active",
-                    "cidr": "10.184.36.160/28",
-                    "gateway": "10.184.36.174",
-                    "project": "Swap VOMS ERS TESTBED",
-                    "description": "ERS-APP"
-                },
-                {
-                    "vni_id": "vni-002",
-                    "vni_name": "ITAAS-ERS-DB-TESTBED-10.184.36.176-29",
-                    "status": "active",
-                    "cidr": "10.184.36.176/29",
-                    "gateway": "10.184.36.182",
-                    "project": "Swap VOMS ERS TESTBED",
-                    "description": "ERS-DB"
-                }
-            ]
-            
-            # Apply filters if provided
+            vnis = (segment_to_vni(segment) for segment in self.nsx.iter_segments())
+            filters = dict(filters or {})
+            address = filters.pop("ip", None)
+            if address:
+                address = ipaddress.ip_address(str(address).strip())
+                vnis = (vni for vni in vnis if _holds(vni.get("cidr"), address))
             if filters:
-                # TODO: Implement filtering logic
-                pass
-            
-            return mock_vnis
+                allowed = {
+                    key: set(value) if isinstance(value, (list, tuple, set)) else {value}
+                    for key, value in filters.items()
+                }
+                vnis = (vni for vni in vnis if all(vni.get(key) in values for key, values in allowed.items()))
+            return list(vnis)
             
         except Exception as e:
             self.logger.error(f"Failed to list VNIs: {str(e)}")
             return []
     
-    def validate_vni_config(self, vni_config: Dict) -> Dict:
+    def validate_vni_config(self, vni_config: Dict, exclude_id: Optional[int] = None) -> Dict:
         """
         Validate VNI configuration before creation
         
+        Checks the CIDR, that the gateway and first/last IPs lie inside it, and
+        that it does not overlap the subnet of another VNI workorder.
+        
         Args:
             vni_config: VNI configuration to validate
+            exclude_id: VNI workorder whose own subnet is ignored in the overlap check
             
         Returns:
             Dict containing validation result
@@ -231,22 +272,25 @@ class VNIOperations:
             cidr = vni_config.get("cidr")
             if cidr:
                 try:
-                    # Basic CIDR validation (can be enhanced)
-                    if "/" not in cidr:
-                        errors.append("Invalid CIDR format. Expected format: x.x.x.x/y")
-                    else:
-                        ip, mask = cidr.split("/")
-                        mask = int(mask)
-                        if mask < 0 or mask > 32:
-                            errors.append("Invalid subnet mask. Must be between 0 and 32")
-                except Exception:
-                    errors.append("Invalid CIDR format")
-            
-            # Gateway validation
-            gateway = vni_config.get("gateway")
-            if gateway and cidr:
-                # TODO: Implement gateway validation against CIDR
-                pass
+                    network = parse_cidr(cidr)
+                except ValueError as e:
+                    errors.append(str(e) if "/" not in cidr else f"Invalid CIDR: {str(e)}")
+                else:
+                    if str(network) != cidr.strip():
+                        warnings.append(f"CIDR has host bits set; using {network}")
+                    subnet_mask = vni_config.get("subnet_mask")
+                    if subnet_mask and subnet_mask.strip().lstrip("/") not in (
+                        str(network.prefixlen), str(network.netmask)
+                    ):
+                        warnings.append(f"subnet_mask {subnet_mask} does not match /{network.prefixlen}")
+
+                    # Gateway and address range must lie inside the subnet
+                    errors.extend(check_addresses(
+                        network, vni_config.get("gateway"), vni_config.get("first_ip"), vni_config.get("last_ip")
+                    ))
+
+                    # Overlap with the subnets of other VNI workorders
+                    errors.extend(describe_conflicts(cidr_index.conflicts(network, exclude_id)))
             
             # VNI name validation
             vni_name = vni_config.get("vni_name")
@@ -0,0 +1,652 @@
+"""
+Workorder Job Service
+Runs workorder executions on a background worker pool and tracks them as persisted jobs
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import session_scope, read_session_scope
+from app.metrics import metrics
+from models.workorder import WorkOrder
+from models.workorder_job import WorkOrderJob, WorkOrderBatch
+from services.job_logs import job_logs
+from services.job_priority import queue_key
+from services.vsphere.provisioning import clone_workorders
+from services.terraform_runner import (
+    build_tfvars, run_workorder, run_workorder_group, TerraformError, ExecutionCancelled, ExecutionControl,
+    reap_process_group, list_workspaces, workspace_has_resources, clean_workspace
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Sorts after every job key, so workers asked to stop exit once the queue is drained
+STOP_KEY = (float("inf"),)
+
+metrics.describe("workorder_jobs_total", "Finished workorder jobs by final status")
+metrics.describe("workorder_job_duration_seconds", "Wall-clock duration of workorder jobs")
+metrics.describe("workorder_job_queue_depth", "Workorder jobs waiting for a worker")
+
+class WorkOrderJobManager:
+    """
+    Fixed-size worker pool consuming queued workorder jobs
+
+    Queued units are kept in one heap ordered by queue_key, so a free worker
+    takes the most urgent workorder rather than the oldest; a unit of several
+    jobs ranks as its most urgent member. A batch releases its units in the
+    same order under its concurrency limit.
+    """
+
+    def __init__(self, workers: int):
+        """
+        Initialize the manager
+
+        Args:
+            workers: Number of jobs allowed to run at the same time
+        """
+        self.workers = max(1, workers)
+        self._heap: List[tuple] = []  # (queue key, sequence, (batch id, job ids)), or None to stop a worker
+        self._ready = threading.Condition()
+        self._sequence = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._batch_lock = threading.Lock()
+        self._batch_pending: Dict[int, deque] = {}  # batch id -> units not yet handed to workers
+        self._freed_units = set()  # (batch id, unit) whose slot was handed on when it was cancelled
+        self._claim_lock = threading.Lock()  # queued -> running/cancelled transitions
+        self._active: Dict[int, tuple] = {}  # running job id -> (control, batch id, unit)
+        self._surplus_workers = 0  # extra workers lent while cancelled jobs wind down
+        self._worker_ids = itertools.count()
+        metrics.register_collector(self._collect_metrics)
+
+    def start(self):
+        """Recover jobs left over from a previous process and start the workers"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._recover()
+            for _ in range(self.workers):
+                self._spawn_worker()
+        logger.info(f"Workorder job workers started: {self.workers}")
+
+    def _spawn_worker(self):
+        thread = threading.Thread(target=self._worker, name=f"workorder-worker-{next(self._worker_ids)}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Ask idle workers to exit; running jobs are left to finish"""
+        with self._start_lock:
+            threads = list(self._threads)
+            for _ in threads:
+                self._put(STOP_KEY, None)
+            for thread in threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def enqueue(self, db: Session, order: WorkOrder) -> Dict:
+        """
+        Create a queued job for a workorder and hand it to the workers
+
+        The job row and the workorder's 'queued' status are committed together
+        on the caller's session before the job becomes visible to workers.
+
+        Returns:
+            dict: The new job
+        """
+        self.start()
+        job = WorkOrderJob(workorder_id=order.id, status="queued")
+        db.add(job)
+        order.status = "queued"
+        db.flush()
+        key = _job_key(order.priority, order.deadline, job.created_at, job.id)
+        db.commit()
+        db.refresh(job)
+        self._put(key, (None, (job.id,)))
+        return job_to_dict(job)
+
+    def _put(self, key: tuple, item: Optional[tuple]):
+        with self._ready:
+            heapq.heappush(self._heap, (key, next(self._sequence), item))
+            self._ready.notify()
+
+    def _get(self) -> Optional[tuple]:
+        with self._ready:
+            while not self._heap:
+                self._ready.wait()
+            return heapq.heappop(self._heap)[2]
+
+    def enqueue_batch(self, db: Session, orders: List[WorkOrder], concurrency: int, group: bool = False) -> Dict:
+        """
+        Queue many workorders as one batch with at most `concurrency` units running at once
+
+        A unit is a single workorder, or with `group` a set of workorders in
+        the same datacenter (up to WORKORDER_BATCH_GROUP_SIZE) that are applied
+        together through the for_each batch configuration. Further units are
+        released as earlier ones finish.
+
+        Returns:
+            dict: The batch with its jobs
+        """
+        self.start()
+        concurrency = max(1, concurrency)
+        batch = WorkOrderBatch(total=len(orders), concurrency=concurrency, grouped=group)
+        db.add(batch)
+        db.flush()
+
+        if group:
+            by_datacenter: Dict[str, List[WorkOrder]] = {}
+            for order in orders:
+                by_datacenter.setdefault((order.datacenter_name or "").strip(), []).append(order)
+            size = max(1, settings.WORKORDER_BATCH_GROUP_SIZE)
+            chunks = [
+                members[i:i + size]
+                for members in by_datacenter.values()
+                for i in range(0, len(members), size)
+            ]
+        else:
+            chunks = [[order] for order in orders]
+
+        unit_jobs: List[List[WorkOrderJob]] = []
+        for index, chunk in enumerate(chunks):
+            group_key = f"batch-{batch.id}-{index}" if group else None
+            jobs = [
+                WorkOrderJob(workorder_id=order.id, batch_id=batch.id, group_key=group_key, status="queued")
+                for order in chunk
+            ]
+            db.add_all(jobs)
+            unit_jobs.append(jobs)
+            for order in chunk:
+                order.status = "queued"
+        db.flush()
+        units = [
+            (
+                min(_job_key(order.priority, order.deadline, job.created_at, job.id) for job, order in zip(jobs, chunk)),
+                tuple(job.id for job in jobs),
+            )
+            for jobs, chunk in zip(unit_jobs, chunks)
+        ]
+        db.commit()
+
+        self._release(batch.id, units, concurrency)
+        return get_batch(batch.id)
+
+    def _release(self, batch_id: int, units: List[tuple], concurrency: int):
+        """Hand a batch's (queue key, job ids) units to the workers, most urgent first, `concurrency` at a time"""
+        units = sorted(units)
+        with self._batch_lock:
+            self._batch_pending[batch_id] = deque(units[concurrency:])
+            for key, unit in units[:concurrency]:
+                self._put(key, (batch_id, unit))
+
+    def _unit_done(self, batch_id: Optional[int], unit: tuple):
+        if batch_id is None:
+            return
+        with self._batch_lock:
+            if (batch_id, unit) in self._freed_units:
+                self._freed_units.discard((batch_id, unit))
+                return
+            self._release_next(batch_id)
+
+    def _free_slot(self, batch_id: Optional[int], unit: tuple):
+        """Hand a cancelled unit's batch slot to the next unit before the cancelled one has wound down"""
+        if batch_id is None:
+            return
+        with self._batch_lock:
+            if (batch_id, unit) in self._freed_units:
+                return
+            self._freed_units.add((batch_id, unit))
+            self._release_next(batch_id)
+
+    def _release_next(self, batch_id: int):
+        pending = self._batch_pending.get(batch_id)
+        if pending:
+            key, unit = pending.popleft()
+            self._put(key, (batch_id, unit))
+        if pending is not None and not pending:
+            del self._batch_pending[batch_id]
+
+    def _lend_worker(self):
+        """Start an extra worker while a cancelled job still holds one; the first worker to go idle retires"""
+        with self._start_lock:
+            if not self._threads:
+                return
+            with self._batch_lock:
+                self._surplus_workers += 1
+            self._spawn_worker()
+
+    def _retire_surplus(self) -> bool:
+        with self._batch_lock:
+            if self._surplus_workers <= 0:
+                return False
+            self._surplus_workers -= 1
+        try:
+            self._threads.remove(threading.current_thread())
+        except ValueError:
+            pass
+        return True
+
+    def _worker(self):
+        while True:
+            item = self._get()
+            try:
+                if item is None:
+                    return
+                batch_id, job_ids = item
+                try:
+                    self._run(job_ids)
+                finally:
+                    self._unit_done(batch_id, job_ids)
+            except Exception as e:
+                logger.error(f"Workorder jobs {item[1]} crashed: {str(e)}")
+            if self._retire_surplus():
+                return
+
+    def cancel(self, workorder_id: int) -> Dict:
+        """
+        Cancel the active job of a workorder
+
+        A queued job is cancelled at once. A running job has its terraform
+        process group interrupted (and killed after WORKORDER_KILL_GRACE) or
+        its clone tasks cancelled; the jobs of a grouped apply share one
+        process, so the whole group stops. In both cases the batch slot and
+        the worker the job held are handed to queued work immediately.
+
+        Returns:
+            dict: The job, with `cancelling` true while a running job winds down
+
+        Raises:
+            ValueError: If the workorder has no active job or it runs in another service process
+        """
+        with self._claim_lock:
+            with session_scope() as db:
+                job = db.query(WorkOrderJob).filter(
+                    WorkOrderJob.workorder_id == workorder_id, WorkOrderJob.status.in_(ACTIVE_STATUSES)
+                ).order_by(WorkOrderJob.id.desc()).first()
+                if not job:
+                    raise ValueError("WorkOrder has no queued or running execution")
+                if job.status == "queued":
+                    job.status = "cancelled"
+                    job.error = "Cancelled before it started"
+                    job.finished_at = datetime.utcnow()
+                    db.query(WorkOrder).filter(WorkOrder.id == workorder_id).update({"status": "cancelled"})
+                    db.flush()
+                    metrics.inc("workorder_jobs_total", labels={"status": "cancelled"})
+                    return {**job_to_dict(job, include_log=False), "cancelling": False}
+                job_id = job.id
+                result = job_to_dict(job, include_log=False)
+
+        active = self._active.get(job_id)
+        if active is None:
+            raise ValueError("Execution is running in another service process and cannot be cancelled here")
+        control, batch_id, unit = active
+        if control.cancel("cancelled"):
+            self._free_slot(batch_id, unit)
+            self._lend_worker()
+        return {**result, "cancelling": True}
+
+    def _run(self, job_ids: tuple):
+        running: Dict[int, int] = {}  # job id -> workorder id
+        try:
+            # the control is registered under the same lock that marks the jobs running,
+            # so a cancel that sees a running job always finds its control
+            with self._claim_lock, session_scope() as db:
+                jobs = db.query(WorkOrderJob).filter(
+                    WorkOrderJob.id.in_(job_ids), WorkOrderJob.status == "queued"
+                ).order_by(WorkOrderJob.id).all()
+                if not jobs:
+                    return  # cancelled or already handled
+                orders = {
+                    order.id: order
+                    for order in db.query(WorkOrder).filter(WorkOrder.id.in_([job.workorder_id for job in jobs]))
+                }
+                now = datetime.utcnow()
+                tfvars_by_workorder: Dict[int, Dict] = {}
+                for job in jobs:
+                    order = orders.get(job.workorder_id)
+                    if not order:
+                        job.status = "failed"
+                        job.error = "WorkOrder not found"
+                        job.finished_at = now
+                        continue
+                    job.status = "running"
+                    job.started_at = now
+                    order.status = "executing"
+                    tfvars_by_workorder[order.id] = build_tfvars(order)
+                    running[job.id] = order.id
+                group_key = jobs[0].group_key
+                batch_id = jobs[0].batch_id
+                if not running:
+                    return
+                control = ExecutionControl(
+                    settings.WORKORDER_EXECUTION_TIMEOUT, on_process=lambda pid: self._set_pid(list(running), pid)
+                )
+                for job_id in running:
+                    self._active[job_id] = (control, batch_id, job_ids)
+        except Exception:
+            for job_id in running:
+                self._active.pop(job_id, None)
+            raise
+        buffers = {job_id: job_logs.open(job_id) for job_id in running}
+
+        def on_output(line: str):
+            for buffer in buffers.values():
+                buffer.append(line)
+
+        started = time.perf_counter()
+        on_phase = lambda phase: self._set_phase(list(running), phase)
+        try:
+            if settings.WORKORDER_PROVISIONER == "pyvmomi" and all(
+                values.get("template_id") for values in tfvars_by_workorder.values()
+            ):
+                self._run_clones(running, tfvars_by_workorder, buffers, started, control)
+                return
+
+            if group_key is None:
+                (job_id, workorder_id), = running.items()
+                try:
+                    result = run_workorder(
+                        workorder_id, tfvars_by_workorder[workorder_id],
+                        on_phase=on_phase, on_output=on_output, control=control
+                    )
+                    self._finish(job_id, workorder_id, "succeeded", "executed", result["log"], None, started, result["timings"])
+                except ExecutionCancelled as e:
+                    self._finish(job_id, workorder_id, *_stopped_statuses(e.reason), e.log, str(e), started, e.timings)
+                except TerraformError as e:
+                    self._finish(job_id, workorder_id, "failed", "failed", e.log, str(e), started, e.timings)
+                except Exception as e:
+                    self._finish(job_id, workorder_id, "failed", "failed", None, str(e), started)
+                return
+
+            try:
+                result = run_workorder_group(
+                    group_key, tfvars_by_workorder, on_phase=on_phase, on_output=on_output, control=control
+                )
+                log, error, timings, applied = result["log"], None, result["timings"], set(result["applied"])
+            except TerraformError as e:
+                log, error, timings, applied = e.log, str(e), e.timings, set(e.applied)
+            except Exception as e:
+                log, error, timings, applied = None, str(e), {}, set()
+            # VMs already in state stay executed even when the group was stopped part-way
+            unapplied = _stopped_statuses(control.reason) if control.cancelled else ("failed", "failed")
+            for job_id, workorder_id in running.items():
+                if workorder_id in applied:
+                    self._finish(job_id, workorder_id, "succeeded", "executed", log, None, started, timings)
+                else:
+                    self._finish(job_id, workorder_id, *unapplied, log,
+                                 error or "VM missing from state after apply", started, timings)
+        finally:
+            control.close()
+            for job_id in running:
+                self._active.pop(job_id, None)
+            # closed only after the final status is stored, so followers see it when the stream ends
+            for buffer in buffers.values():
+                buffer.close()
+
+    def _run_clones(self, running: Dict[int, int], tfvars_by_workorder: Dict[int, Dict],
+                    buffers: Dict, started: float, control: ExecutionControl):
+        """Provision template-based workorders with concurrent CloneVM_Task calls instead of Terraform"""
+        job_by_workorder = {workorder_id: job_id for job_id, workorder_id in running.items()}
+        self._set_phase(list(running), "clone")
+        for job_id, workorder_id in running.items():
+            buffers[job_id].append(
+                f"--- CLONE {tfvars_by_workorder[workorder_id]['vm_name']} "
+                f"FROM TEMPLATE {tfvars_by_workorder[workorder_id]['template_id']} ---"
+            )
+
+        def on_update(workorder_id: int, state: str, progress: int):
+            job_id = job_by_workorder[workorder_id]
+            buffers[job_id].append(f"clone {state}: {progress}%")
+            self._set_progress(job_id, progress)
+
+        results = clone_workorders(
+            tfvars_by_workorder, on_update, timeout=settings.WORKORDER_CLONE_TIMEOUT,
+            should_cancel=lambda: control.message() if control.cancelled else None
+        )
+        timings = {"apply_seconds": time.perf_counter() - started}
+        for job_id, workorder_id in running.items():
+            result = results.get(workorder_id) or {"status": "failed", "vm_id": None, "error": "Clone was not started"}
+            buffer = buffers[job_id]
+            if result["status"] == "succeeded":
+                buffer.append(f"--- CLONE SUCCEEDED: {result['vm_id']} ---")
+                self._finish(job_id, workorder_id, "succeeded", "executed", buffer.tail(settings.JOB_LOG_TAIL_LINES),
+                             None, started, timings, order_updates={"vm_id": result["vm_id"]})
+            else:
+                buffer.append(f"--- CLONE FAILED: {result['error']} ---")
+                statuses = _stopped_statuses(control.reason) if control.cancelled else ("failed", "failed")
+                self._finish(job_id, workorder_id, *statuses, buffer.tail(settings.JOB_LOG_TAIL_LINES),
+                             result["error"], started, timings)
+
+    def _set_pid(self, job_ids: List[int], pid: Optional[int]):
+        try:
+            with session_scope() as db:
+                db.query(WorkOrderJob).filter(WorkOrderJob.id.in_(job_ids)).update({"pid": pid})
+        except Exception as e:
+            logger.error(f"Failed to record process of workorder jobs {job_ids}: {str(e)}")
+
+    def _set_progress(self, job_id: int, progress: int):
+        try:
+            with session_scope() as db:
+                db.query(WorkOrderJob).filter(WorkOrderJob.id == job_id).update({"progress": progress})
+        except Exception as e:
+            logger.error(f"Failed to record progress of workorder job {job_id}: {str(e)}")
+
+    def _set_phase(self, job_ids: List[int], phase: str):
+        try:
+            with session_scope() as db:
+                db.query(WorkOrderJob).filter(WorkOrderJob.id.in_(job_ids)).update({"phase": phase})
+        except Exception as e:
+            logger.error(f"Failed to record phase of workorder jobs {job_ids}: {str(e)}")
+
+    def _finish(self, job_id: int, workorder_id: int, job_status: str, order_status: str,
+                log: Optional[str], error: Optional[str], started: float, timings: Optional[Dict] = None,
+                order_updates: Optional[Dict] = None):
+        duration = time.perf_counter() - started
+        timings = timings or {}
+        try:
+            with session_scope() as db:
+                db.query(WorkOrderJob).filter(WorkOrderJob.id == job_id).update({
+                    "status": job_status,
+                    "phase": None,
+                    "pid": None,
+                    "finished_at": datetime.utcnow(),
+                    "init_seconds": timings.get("init_seconds"),
+                    "init_skipped": timings.get("init_skipped"),
+                    "apply_seconds": timings.get("apply_seconds"),
+                    "log": log,
+                    "error": error,
+                })
+                updates = {"status": order_status, **(order_updates or {})}
+                if log is not None:
+                    updates["last_execution_log"] = log
+                db.query(WorkOrder).filter(WorkOrder.id == workorder_id).update(updates)
+        except Exception as e:
+            logger.error(f"Failed to record result of workorder job {job_id}: {str(e)}")
+        metrics.inc("workorder_jobs_total", labels={"status": job_status})
+        metrics.observe("workorder_job_duration_seconds", duration)
+        if error:
+            logger.error(f"Workorder job {job_id} (workorder {workorder_id}) {job_status}: {error}")
+
+    def _recover(self):
+        """
+        Fail jobs that were running when the previous process died and re-queue queued ones
+
+        Terraform process groups the dead process left running are killed and
+        workspaces are cleaned before anything is re-queued. Queued batch jobs
+        are re-queued under their batch's concurrency limit, keeping grouped
+        jobs together.
+        """
+        try:
+            with session_scope() as db:
+                stale = db.query(WorkOrderJob).filter(WorkOrderJob.status == "running").all()
+                for job in stale:
+                    if job.pid and reap_process_group(job.pid):
+                        logger.warning(f"Killed leftover terraform process {job.pid} of workorder job {job.id}")
+                    job.status = "failed"
+                    job.error = "Interrupted by service restart"
+                    job.finished_at = datetime.utcnow()
+                    job.pid = None
+                    db.query(WorkOrder).filter(WorkOrder.id == job.workorder_id).update({"status": "failed"})
+                queued = db.query(
+                    WorkOrderJob.id, WorkOrderJob.batch_id, WorkOrderJob.group_key, WorkOrderJob.created_at,
+                    WorkOrder.priority, WorkOrder.deadline
+                ).outerjoin(WorkOrder, WorkOrder.id == WorkOrderJob.workorder_id).filter(
+                    WorkOrderJob.status == "queued"
+                ).order_by(WorkOrderJob.id).all()
+                batch_ids = {row.batch_id for row in queued if row.batch_id is not None}
+                concurrency = dict(
+                    db.query(WorkOrderBatch.id, WorkOrderBatch.concurrency).filter(WorkOrderBatch.id.in_(batch_ids))
+                ) if batch_ids else {}
+                workorder_ids = {workorder_id for workorder_id, in db.query(WorkOrder.id)}
+                queued_groups = {row.group_key for row in queued if row.group_key}
+            self._reap_workspaces(workorder_ids, queued_groups)
+
+            batch_units: Dict[int, Dict] = {}
+            for job_id, batch_id, group_key, created_at, priority, deadline in queued:
+                key = _job_key(priority, deadline, created_at, job_id)
+                if batch_id is None:
+                    self._put(key, (None, (job_id,)))
+                    continue
+                units = batch_units.setdefault(batch_id, {})
+                units.setdefault(group_key or job_id, []).append((key, job_id))
+            for batch_id, units in batch_units.items():
+                self._release(batch_id, [
+                    (min(key for key, _ in members), tuple(job_id for _, job_id in members))
+                    for members in units.values()
+                ], concurrency.get(batch_id, 1))
+        except Exception as e:
+            logger.error(f"Failed to recover workorder jobs: {str(e)}")
+
+    def _reap_workspaces(self, workorder_ids: set, queued_groups: set):
+        """
+        Clean every workspace and delete those that manage nothing
+
+        A workspace is removed when its state holds no resources and neither
+        an existing workorder nor a queued group will use it again; workspaces
+        with resources are always kept so no VM loses its state.
+        """
+        for name in list_workspaces():
+            workspace = os.path.join(settings.TERRAFORM_WORKSPACES_DIR, name)
+            removed = clean_workspace(workspace)
+            if removed:
+                logger.info(f"Cleaned {', '.join(removed)} from workspace {name}")
+            if workspace_has_resources(workspace):
+                continue
+            if name.startswith("workorder-"):
+                suffix = name.split("-", 1)[1]
+                orphan = not suffix.isdigit() or int(suffix) not in workorder_ids
+            else:
+                orphan = name not in queued_groups
+            if orphan:
+                shutil.rmtree(workspace, ignore_errors=True)
+                logger.info(f"Removed unused workspace {name}")
+
+    def _collect_metrics(self, registry):
+        with self._ready:
+            depth = sum(1 for _, _, item in self._heap if item is not None)
+        registry.set_gauge("workorder_job_queue_depth", depth)
+
+def _job_key(priority: Optional[str], deadline: Optional[datetime], queued_at: Optional[datetime], job_id: int) -> tuple:
+    return queue_key(priority, deadline, queued_at, job_id, settings.WORKORDER_AGING_SECONDS)
+
+def _stopped_statuses(reason: Optional[str]) -> tuple:
+    """(job status, workorder status) of an execution that was cancelled or timed out"""
+    return ("cancelled", "cancelled") if reason == "cancelled" else ("failed", "failed")
+
+def get_job(job_id: int) -> Optional[Dict]:
+    """
+    Get a job by ID, or None if it does not exist
+
+    Job reads go to the primary: they are polled right after a job is queued.
+    """
+    with session_scope() as db:
+        job = db.query(WorkOrderJob).filter(WorkOrderJob.id == job_id).first()
+        return job_to_dict(job) if job else None
+
+def get_latest_job(workorder_id: int) -> Optional[Dict]:
+    """
+    Get the most recent job of a workorder, or None if it was never executed
+    """
+    with session_scope() as db:
+        job = db.query(WorkOrderJob).filter(
+            WorkOrderJob.workorder_id == workorder_id
+        ).order_by(WorkOrderJob.id.desc()).first()
+        return job_to_dict(job) if job else None
+
+def get_workorder_jobs(workorder_id: int, limit: int = 20) -> List[Dict]:
+    """
+    Get the jobs of a workorder, newest first
+    """
+    with read_session_scope() as db:
+        jobs = db.query(WorkOrderJob).filter(
+            WorkOrderJob.workorder_id == workorder_id
+        ).order_by(WorkOrderJob.id.desc()).limit(limit).all()
+        return [job_to_dict(job, include_log=False) for job in jobs]
+
+def get_batch(batch_id: int) -> Optional[Dict]:
+    """
+    Get a batch with aggregate progress and its jobs, or None if it does not exist
+    """
+    with session_scope() as db:
+        batch = db.query(WorkOrderBatch).filter(WorkOrderBatch.id == batch_id).first()
+        if not batch:
+            return None
+        jobs = db.query(WorkOrderJob).filter(WorkOrderJob.batch_id == batch_id).order_by(WorkOrderJob.id).all()
+        counts = {status: 0 for status in ("queued", "running", "succeeded", "failed", "cancelled")}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        finished = counts["succeeded"] + counts["failed"] + counts["cancelled"]
+        if finished < len(jobs):
+            status = "running" if counts["running"] or finished else "queued"
+        else:
+            status = "completed" if counts["succeeded"] == len(jobs) else "completed_with_errors"
+        return {
+            "batch_id": batch.id,
+            "created_at": batch.created_at.isoformat() if batch.created_at else None,
+            "total": batch.total,
+            "concurrency": batch.concurrency,
+            "grouped": batch.grouped,
+            "status": status,
+            "counts": counts,
+            "progress_percent": round(finished / len(jobs) * 100, 1) if jobs else 100.0,
+            "jobs": [job_to_dict(job, include_log=False) for job in jobs],
+        }
+
+def job_to_dict(job: WorkOrderJob, include_log: bool = True) -> Dict:
+    end = job.finished_at or (datetime.utcnow() if job.started_at else None)
+    result = {
+        "job_id": job.id,
+        "workorder_id": job.workorder_id,
+        "batch_id": job.batch_id,
+        "group_key": job.group_key,
+        "status": job.status,
+        "phase": job.phase,
+        "progress": job.progress,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "queued_seconds": ((job.started_at or job.finished_at or datetime.utcnow()) - job.created_at).total_seconds() if job.created_at else None,
+        "elapsed_seconds": (end - job.started_at).total_seconds() if job.started_at else None,
+        "init_seconds": job.init_seconds,
+        "init_skipped": job.init_skipped,
+        "apply_seconds": job.apply_seconds,
+        "error": job.error,
+    }
+    if include_log:
+        result["log"] = job.log
+    return result
+
+workorder_jobs = WorkOrderJobManager(workers=settings.WORKORDER_WORKERS)
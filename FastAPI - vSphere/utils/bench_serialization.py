@@ -0,0 +1,113 @@
+"""
+List Serialization Benchmark
+Times the workorder and VNI workorder list responses: hand-built dicts vs pydantic response models
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models.vni_workorder import VNIWorkOrder
+from models.workorder import WorkOrder
+from schemas.vni_workorder import VNIWorkOrderOut
+from schemas.workorder import WorkOrderOut
+
+def make_workorders(count: int) -> List[WorkOrder]:
+    start = datetime(2026, 1, 1)
+    return [
+        WorkOrder(
+            id=i, name=f"vm-{i}", os="ubuntu-22.04", host_version="8.0", cpu=4, ram=8, disk=80.0,
+            status="pending", created_at=start + timedelta(seconds=i), host_id="host-1", datastore_id="datastore-1",
+            disks=[{"size": 80, "provisioning": "thin"}], nics=[{"network_id": "network-1"}],
+            resource_pool_id="resgroup-1", ip=f"10.0.{i // 250}.{i % 250 + 1}", netmask="255.255.0.0",
+            gateway="10.0.0.254", domain="ooredoo.local", hostname=f"vm-{i}", datacenter_name="Ooredoo - Datacenter",
+            priority="normal", deadline=start + timedelta(days=7),
+        )
+        for i in range(count)
+    ]
+
+def make_vni_workorders(count: int) -> List[VNIWorkOrder]:
+    start = datetime(2026, 1, 1)
+    return [
+        VNIWorkOrder(
+            id=i, owner="network-team", requested_date=start, requested_by="ops", virtual_machines=["vm-1", "vm-2"],
+            deadline=start + timedelta(days=30), project="Ooredoo", t0_gw="T0-GW-01", t1_gw=f"T1-GW-{i % 8:02d}",
+            description=f"Segment {i}", vni_name=f"vni-{i}", cidr=f"10.{i // 256}.{i % 256}.0/24",
+            subnet_mask="255.255.255.0", gateway=f"10.{i // 256}.{i % 256}.1", first_ip=f"10.{i // 256}.{i % 256}.10",
+            last_ip=f"10.{i // 256}.{i % 256}.200", number_of_ips=191, status="pending",
+            created_at=start + timedelta(seconds=i), updated_at=start + timedelta(seconds=i), priority="normal",
+        )
+        for i in range(count)
+    ]
+
+def workorder_dict(o: WorkOrder) -> dict:
+    """The dict the list route built by hand before it had a response model"""
+    return {
+        "id": o.id, "name": o.name, "os": o.os, "host_version": o.host_version, "cpu": o.cpu, "ram": o.ram,
+        "disk": o.disk, "status": o.status, "created_at": o.created_at.isoformat(), "host_id": o.host_id,
+        "vm_id": o.vm_id, "datastore_id": o.datastore_id, "disks": o.disks, "nics": o.nics,
+        "resource_pool_id": o.resource_pool_id, "ip_pool_id": o.ip_pool_id, "template_id": o.template_id,
+        "hostname": o.hostname, "ip": o.ip, "netmask": o.netmask, "gateway": o.gateway, "domain": o.domain,
+        "hardware_version": o.hardware_version, "scsi_controller_type": o.scsi_controller_type,
+        "folder_id": o.folder_id, "network_id": o.network_id, "datacenter_name": o.datacenter_name,
+        "priority": o.priority, "deadline": o.deadline.isoformat() if o.deadline else None,
+    }
+
+def vni_workorder_dict(wo: VNIWorkOrder) -> dict:
+    """The dict the VNI list route built by hand before it had a response model"""
+    return {
+        "id": wo.id, "owner": wo.owner, "requested_date": wo.requested_date.isoformat(),
+        "requested_by": wo.requested_by, "virtual_machines": wo.virtual_machines,
+        "deadline": wo.deadline.isoformat(), "project": wo.project, "t0_gw": wo.t0_gw, "t1_gw": wo.t1_gw,
+        "description": wo.description, "vni_name": wo.vni_name, "cidr": wo.cidr, "subnet_mask": wo.subnet_mask,
+        "gateway": wo.gateway, "first_ip": wo.first_ip, "last_ip": wo.last_ip, "number_of_ips": wo.number_of_ips,
+        "status": wo.status, "created_at": wo.created_at.isoformat(), "updated_at": wo.updated_at.isoformat(),
+        "notes": wo.notes, "priority": wo.priority, "assigned_to": wo.assigned_to,
+    }
+
+def render_dicts(rows, to_dict) -> bytes:
+    """Before: build dicts, then FastAPI's jsonable_encoder walks them again"""
+    content = asyncio.run(serialize_response(response_content=[to_dict(row) for row in rows]))
+    return JSONResponse(content).body
+
+def render_model(rows, field) -> bytes:
+    """After: pydantic-core validates the rows from their attributes and serializes them once"""
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list serialization before and after response models")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("workorders", make_workorders(args.rows), workorder_dict, WorkOrderOut),
+        ("vni_workorders", make_vni_workorders(args.rows), vni_workorder_dict, VNIWorkOrderOut),
+    ]
+    print(f"{'list':<16}{'path':<16}{'seconds':>10}{'rows/s':>12}{'speedup':>10}")
+    for name, rows, to_dict, model in cases:
+        field = create_response_field(name="Response", type_=List[model])
+        assert render_dicts(rows, to_dict) == render_model(rows, field), f"{name}: response bodies differ"
+        before = best_of(args.repeat, lambda: render_dicts(rows, to_dict))
+        after = best_of(args.repeat, lambda: render_model(rows, field))
+        print(f"{name:<16}{'dict+encoder':<16}{before:>10.3f}{args.rows / before:>12,.0f}")
+        print(f"{name:<16}{'response_model':<16}{after:>10.3f}{args.rows / after:>12,.0f}{before / after:>9.1f}x")
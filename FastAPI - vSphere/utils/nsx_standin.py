@@ -0,0 +1,196 @@
+"""
+NSX-T Policy API Stand-in
+Local HTTP server emulating the segment endpoints used by services/vsphere/nsx_client.py
+"""
+
+import argparse
+import base64
+import ipaddress
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+SEGMENTS_PATH = "/policy/api/v1/infra/segments"
+INFRA_PATH = "/policy/api/v1/infra"
+
+class SegmentStore:
+    """In-memory segments, with the bookkeeping fields NSX adds"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.segments: Dict[str, Dict] = {}
+        self.requests = 0
+        self.infra_patches = 0
+
+    @staticmethod
+    def check(seg_id: str, body: Dict):
+        """Fill in each subnet's network; raises ValueError like NSX would reject the segment"""
+        for subnet in body.get("subnets") or []:
+            try:
+                interface = ipaddress.ip_interface(subnet["gateway_address"])
+            except (KeyError, ValueError):
+                raise ValueError(f"Invalid gateway_address in segment {seg_id}")
+            subnet["network"] = str(interface.network)
+
+    def patch(self, seg_id: str, body: Dict):
+        """Create or merge a segment that passed check()"""
+        now = int(time.time() * 1000)
+        with self.lock:
+            segment = self.segments.get(seg_id) or {
+                "id": seg_id,
+                "resource_type": "Segment",
+                "path": f"/infra/segments/{seg_id}",
+                "_create_time": now,
+                "_revision": -1,
+            }
+            segment.update({key: value for key, value in body.items() if key not in ("id", "path")})
+            segment["_last_modified_time"] = now
+            segment["_revision"] += 1
+            self.segments[seg_id] = segment
+
+def make_handler(store: SegmentStore, user: Optional[str], password: Optional[str], fail_rate: float, latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real manager
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: Optional[Dict] = None):
+            data = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if status == 503:
+                self.send_header("Retry-After", "0")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status: int, message: str):
+            self._send(status, {"httpStatus": str(status), "error_code": status, "error_message": message})
+
+        def _body(self) -> Dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _admit(self) -> bool:
+            with store.lock:
+                store.requests += 1
+            if user is not None:
+                expected = "Basic " + base64.b64encode(f"{user}:{password}".encode()).decode()
+                if self.headers.get("Authorization") != expected:
+                    self._body()
+                    self._error(403, "The credentials were incorrect or the account specified has been locked.")
+                    return False
+            if latency:
+                time.sleep(latency)
+            if fail_rate and random.random() < fail_rate:
+                self._body()
+                self._error(503, "Service unavailable (injected)")
+                return False
+            return True
+
+        def _segment_id(self, path: str) -> Optional[str]:
+            if path.startswith(SEGMENTS_PATH + "/"):
+                seg_id = path[len(SEGMENTS_PATH) + 1:]
+                return seg_id if seg_id and "/" not in seg_id else None
+            return None
+
+        def do_GET(self):
+            if not self._admit():
+                return
+            url = urlparse(self.path)
+            if url.path == SEGMENTS_PATH:
+                query = parse_qs(url.query)
+                page_size = int(query.get("page_size", ["1000"])[0])
+                start = int(query.get("cursor", ["0"])[0])
+                with store.lock:
+                    segments = sorted(store.segments.values(), key=lambda segment: segment["id"])
+                page = segments[start:start + page_size]
+                body = {"results": page, "result_count": len(segments)}
+                if start + page_size < len(segments):
+                    body["cursor"] = str(start + page_size)
+                return self._send(200, body)
+            seg_id = self._segment_id(url.path)
+            with store.lock:
+                segment = store.segments.get(seg_id) if seg_id else None
+            if segment is None:
+                return self._error(404, f"Segment {seg_id} not found")
+            self._send(200, segment)
+
+        def do_PATCH(self):
+            if not self._admit():
+                return
+            path = urlparse(self.path).path
+            body = self._body()
+            try:
+                if path == INFRA_PATH:
+                    children = body.get("children") or []
+                    # all children are checked first: the manager applies the whole tree or nothing
+                    for child in children:
+                        if child.get("resource_type") != "ChildSegment" or "Segment" not in child:
+                            raise ValueError(f"Unsupported child {child.get('resource_type')}")
+                        store.check(child["Segment"].get("id"), child["Segment"])
+                    for child in children:
+                        segment = child["Segment"]
+                        if child.get("marked_for_delete") or segment.get("marked_for_delete"):
+                            with store.lock:
+                                store.segments.pop(segment["id"], None)
+                        else:
+                            store.patch(segment["id"], segment)
+                    with store.lock:
+                        store.infra_patches += 1
+                    return self._send(200)
+                seg_id = self._segment_id(path)
+                if seg_id is None:
+                    return self._error(404, f"No such path {path}")
+                store.check(seg_id, body)
+                store.patch(seg_id, body)
+                self._send(200)
+            except ValueError as e:
+                self._error(400, str(e))
+
+        def do_DELETE(self):
+            if not self._admit():
+                return
+            seg_id = self._segment_id(urlparse(self.path).path)
+            with store.lock:
+                removed = store.segments.pop(seg_id, None) if seg_id else None
+            if removed is None:
+                return self._error(404, f"Segment {seg_id} not found")
+            self._send(200)
+
+    return Handler
+
+def serve(host: str = "127.0.0.1", port: int = 0, user: Optional[str] = None, password: Optional[str] = None,
+          fail_rate: float = 0.0, latency: float = 0.0):
+    """
+    Start the stand-in in a background thread
+
+    Returns:
+        tuple: (server, store); the URL is http://host:server.server_port
+    """
+    store = SegmentStore()
+    server = ThreadingHTTPServer((host, port), make_handler(store, user, password, fail_rate, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NSX-T Policy API stand-in (segments only)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    args = parser.parse_args()
+    server, _ = serve(args.host, args.port, args.user, args.password, args.fail_rate, args.latency)
+    print(f"NSX stand-in listening on http://{args.host}:{server.server_port} (user {args.user})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
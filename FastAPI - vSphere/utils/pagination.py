@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(timestamp, record_id):
+    """
+    Encode a (timestamp, id) keyset position into an opaque cursor string
+
+    Args:
+        timestamp (datetime | str): Sort timestamp of the last returned row
+        record_id (int): Primary key of the last returned row
+
+    Returns:
+        str: URL-safe cursor to pass back as ?cursor=
+    """
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    raw = json.dumps([timestamp, record_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (datetime, int)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def apply_keyset(query, timestamp_column, id_column, cursor: str = None, descending: bool = True):
+    """
+    Order a query by (timestamp, id) and seek past the given cursor
+
+    The row-value comparison lets PostgreSQL satisfy the seek straight from a
+    composite (timestamp, id) index, so deep pages cost the same as the first.
+    """
+    if cursor:
+        position = decode_cursor(cursor)
+        key = tuple_(timestamp_column, id_column)
+        query = query.filter(key < position if descending else key > position)
+    if descending:
+        return query.order_by(timestamp_column.desc(), id_column.desc())
+    return query.order_by(timestamp_column.asc(), id_column.asc())
+
+
+def next_cursor(rows, limit: int, timestamp_key: str = "timestamp"):
+    """
+    Build the cursor for the page after `rows`, or None on the last page
+
+    Args:
+        rows (list): Page of dict records, each carrying `id` and `timestamp_key`
+        limit (int): Page size that was requested
+    """
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last[timestamp_key], last["id"])
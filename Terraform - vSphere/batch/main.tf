@@ -0,0 +1,43 @@
+terraform {
+  required_providers {
+    vsphere = {
+      source  = "hashicorp/vsphere"
+      version = ">= 2.0.0"
+    }
+  }
+}
+
+provider "vsphere" {
+  user                 = var.vsphere_user
+  password             = var.vsphere_password
+  vsphere_server       = var.vsphere_server
+  allow_unverified_ssl = true
+}
+
+# One instance of the shared VM module per workorder in the group. The API
+# copies this configuration into workspaces/batch-<batch>-<group>/.
+module "vm" {
+  source   = "./modules/vsphere-vm"
+  for_each = var.vms
+
+  vm_name              = each.value.vm_name
+  os                   = each.value.os
+  cpu                  = each.value.cpu
+  ram                  = each.value.ram
+  host_system_id       = each.value.host_system_id
+  datastore_id         = each.value.datastore_id
+  nics                 = each.value.nics
+  resource_pool_id     = each.value.resource_pool_id
+  ip_pool_id           = each.value.ip_pool_id
+  template_id          = each.value.template_id
+  hostname             = each.value.hostname
+  ip                   = each.value.ip
+  netmask              = each.value.netmask
+  gateway              = each.value.gateway
+  domain               = each.value.domain
+  folder               = each.value.folder
+  hardware_version     = each.value.hardware_version
+  scsi_controller_type = each.value.scsi_controller_type
+  network_id           = each.value.network_id
+  datacenter_name      = each.value.datacenter_name
+}
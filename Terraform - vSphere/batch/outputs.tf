@@ -0,0 +1,9 @@
+output "vms" {
+  value = {
+    for key, vm in module.vm : key => {
+      vm_id          = vm.vm_id
+      vm_name        = vm.vm_name
+      vm_power_state = vm.vm_power_state
+    }
+  }
+}
@@ -0,0 +1,44 @@
+variable "vsphere_user" {
+  description = "vSphere username"
+  type        = string
+}
+
+variable "vsphere_password" {
+  description = "vSphere password"
+  type        = string
+  sensitive   = true
+}
+
+variable "vsphere_server" {
+  description = "vCenter server address"
+  type        = string
+}
+
+variable "vms" {
+  description = "VMs to provision, keyed by 'workorder-<id>'. Attributes match the vsphere-vm module variables."
+  type = map(object({
+    vm_name          = string
+    os               = string
+    cpu              = number
+    ram              = number
+    host_system_id   = string
+    resource_pool_id = string
+    datacenter_name  = string
+    datastore_id     = optional(string, "")
+    nics = optional(list(object({
+      ip           = string
+      network_name = string
+    })), [{ ip = "", network_name = "VM Network" }])
+    ip_pool_id           = optional(string, "")
+    template_id          = optional(string, "")
+    hostname             = optional(string, "")
+    ip                   = optional(string, "")
+    netmask              = optional(string, "")
+    gateway              = optional(string, "")
+    domain               = optional(string, "local")
+    folder               = optional(string, "")
+    hardware_version     = optional(string, "")
+    scsi_controller_type = optional(string, "")
+    network_id           = optional(string, "")
+  }))
+}
@@ -14,80 +14,44 @@ provider "vsphere" {
   allow_unverified_ssl = true
 }
 
-# ---
-# Add VM, network, and other resources here
-# --- 
-
-data "vsphere_datacenter" "dc" {
-  name = var.datacenter_name
-}
-
-data "vsphere_datastore" "selected" {
-  name          = var.datastore_id
-  datacenter_id = data.vsphere_datacenter.dc.id
-}
-
-data "vsphere_network" "network" {
-  name          = var.nics[0].network_name
-  datacenter_id = data.vsphere_datacenter.dc.id
-}
-
-locals {
-  resolved_datastore_id = startswith(var.datastore_id, "datastore-") ? var.datastore_id : data.vsphere_datastore.selected.id
-}
-
-resource "vsphere_virtual_machine" "vm" {
-  name             = var.vm_name
-  folder           = var.folder != "" ? var.folder : null
-  resource_pool_id = var.resource_pool_id
-  host_system_id   = var.host_system_id
-  datastore_id     = local.resolved_datastore_id
-  num_cpus         = var.cpu
-  memory           = var.ram * 1024
-  guest_id         = var.template_id != "" ? null : var.os
-  hardware_version = var.hardware_version != "" ? var.hardware_version : null
-  scsi_type        = var.scsi_controller_type != "" ? var.scsi_controller_type : null
-
-  disk {
-    label            = "disk0"
-    size             = 20
-    thin_provisioned = true
-  }
-
-  dynamic "clone" {
-    for_each = var.template_id != "" ? [1] : []
-    content {
-      template_uuid = var.template_id
-      customize {
-        linux_options {
-          host_name = var.hostname
-          domain    = var.domain
-        }
-        network_interface {
-          ipv4_address = var.ip
-          ipv4_netmask = var.netmask
-        }
-        ipv4_gateway = var.gateway
-      }
-    }
-  }
-
-  network_interface {
-    network_id   = data.vsphere_network.network.id
-    adapter_type = "vmxnet3"
-  }
-
-  lifecycle {
-    ignore_changes = [disk, network_interface]
-  }
+# The VM itself lives in the shared module; the API runs this root
+# configuration in a separate workspace directory per workorder.
+module "vm" {
+  source = "./modules/vsphere-vm"
+
+  vm_name              = var.vm_name
+  os                   = var.os
+  cpu                  = var.cpu
+  ram                  = var.ram
+  host_system_id       = var.host_system_id
+  datastore_id         = var.datastore_id
+  nics                 = var.nics
+  resource_pool_id     = var.resource_pool_id
+  ip_pool_id           = var.ip_pool_id
+  template_id          = var.template_id
+  hostname             = var.hostname
+  ip                   = var.ip
+  netmask              = var.netmask
+  gateway              = var.gateway
+  domain               = var.domain
+  folder               = var.folder
+  hardware_version     = var.hardware_version
+  scsi_controller_type = var.scsi_controller_type
+  network_id           = var.network_id
+  datacenter_name      = var.datacenter_name
+}
+
+moved {
+  from = vsphere_virtual_machine.vm
+  to   = module.vm.vsphere_virtual_machine.vm
 }
 
 output "vm_id" {
-  value = vsphere_virtual_machine.vm.id
+  value = module.vm.vm_id
 }
 output "vm_name" {
-  value = vsphere_virtual_machine.vm.name
+  value = module.vm.vm_name
 }
 output "vm_power_state" {
-  value = vsphere_virtual_machine.vm.power_state
-} 
\ No newline at end of file
+  value = module.vm.vm_power_state
+}
@@ -0,0 +1,9 @@
+output "vm_id" {
+  value = vsphere_virtual_machine.vm.id
+}
+output "vm_name" {
+  value = vsphere_virtual_machine.vm.name
+}
+output "vm_power_state" {
+  value = vsphere_virtual_machine.vm.power_state
+}
@@ -0,0 +1,8 @@
+terraform {
+  required_providers {
+    vsphere = {
+      source  = "hashicorp/vsphere"
+      version = ">= 2.0.0"
+    }
+  }
+}